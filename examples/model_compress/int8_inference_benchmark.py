@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+CPU latency and model size of the float model and the int8 model exported by QAT_Quantizer.
+"""
+
+import argparse
+import io
+import time
+
+import torch
+
+from nni.compression.torch import QAT_Quantizer
+from models.cifar10.vgg import VGG
+
+
+def measure_latency(model, x, warmup, iters):
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(x)
+        start = time.perf_counter()
+        for _ in range(iters):
+            model(x)
+    return (time.perf_counter() - start) / iters * 1000
+
+
+def restore_float_weights(model):
+    # the unwrapped model keeps both the trainable `old_weight` and the last quantized `weight`
+    for module in model.modules():
+        if hasattr(module, 'old_weight'):
+            weight = module.old_weight.data
+            delattr(module, 'old_weight')
+            delattr(module, 'weight')
+            module.weight = torch.nn.Parameter(weight)
+    return model
+
+
+def measure_size(model, x):
+    buffer = io.BytesIO()
+    with torch.no_grad():
+        torch.jit.save(torch.jit.trace(model, x), buffer)
+    return buffer.tell() / 2 ** 20
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Float vs int8 CPU inference benchmark')
+    parser.add_argument('--depth', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--calibration-steps', type=int, default=10)
+    parser.add_argument('--no-fold-bn', action='store_true', default=False)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--iters', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    model = VGG(depth=args.depth)
+    x = torch.randn(args.batch_size, 3, 32, 32)
+    config_list = [{
+        'quant_types': ['weight'],
+        'quant_bits': 8,
+        'op_types': ['Conv2d', 'Linear']
+    }]
+    quantizer = QAT_Quantizer(model, config_list)
+    quantizer.compress()
+    # simulate the quantization aware training, which also updates the statistics of batch normalizations
+    model.train()
+    with torch.no_grad():
+        for _ in range(args.calibration_steps):
+            model(torch.randn(args.batch_size, 3, 32, 32))
+    model.eval()
+
+    int8_model = quantizer.export_int8_model(x, fold_bn=not args.no_fold_bn)
+    quantizer._unwrap_model()
+    float_model = restore_float_weights(model).eval()
+
+    with torch.no_grad():
+        error = (float_model(x) - int8_model(x)).abs().max().item()
+    float_ms = measure_latency(float_model, x, args.warmup, args.iters)
+    int8_ms = measure_latency(int8_model, x, args.warmup, args.iters)
+    print('{:<8}{:>12}{:>12}'.format('model', 'latency(ms)', 'size(MB)'))
+    print('{:<8}{:>12.3f}{:>12.2f}'.format('float', float_ms, measure_size(float_model, x)))
+    print('{:<8}{:>12.3f}{:>12.2f}'.format('int8', int8_ms, measure_size(int8_model, x)))
+    print('speedup: {:.2f}, max abs error of outputs: {:.6f}'.format(float_ms / int8_ms, error))
@@ -0,0 +1,68 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+CPU latency of dense and sparse (sparsify_model) Linear and Conv2d modules pruned by LevelPruner
+under different sparsities.
+"""
+
+import argparse
+import copy
+import time
+
+import torch
+import torch.nn as nn
+
+from nni.compression.torch import LevelPruner
+from nni.compression.torch.speedup import sparsify_model
+
+
+def measure_latency(model, x, warmup, iters):
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(x)
+        start = time.perf_counter()
+        for _ in range(iters):
+            model(x)
+    return (time.perf_counter() - start) / iters * 1000
+
+
+def prune(model, sparsity):
+    pruner = LevelPruner(model, [{'sparsity': sparsity, 'op_types': ['default']}])
+    pruner.compress()
+    pruner._unwrap_model()
+    # apply the masks to the weights
+    for wrapper in pruner.get_modules_wrapper():
+        wrapper.module.weight.data.mul_(wrapper.weight_mask)
+    return model
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dense vs sparse CPU inference benchmark')
+    parser.add_argument('--sparsities', type=float, nargs='+', default=[0.5, 0.7, 0.8, 0.9, 0.95, 0.99])
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--features', type=int, default=4096)
+    parser.add_argument('--channels', type=int, default=256)
+    parser.add_argument('--input-size', type=int, default=14)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--iters', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    benchmarks = {
+        'Linear': (nn.Linear(args.features, args.features), torch.randn(args.batch_size, args.features)),
+        'Conv2d': (nn.Conv2d(args.channels, args.channels, 3, padding=1),
+                   torch.randn(args.batch_size, args.channels, args.input_size, args.input_size))
+    }
+    print('{:<8}{:>10}{:>12}{:>12}{:>10}'.format('module', 'sparsity', 'dense(ms)', 'sparse(ms)', 'speedup'))
+    for name, (module, x) in benchmarks.items():
+        model = nn.Sequential(module).eval()
+        for sparsity in args.sparsities:
+            dense_model = prune(copy.deepcopy(model), sparsity)
+            sparse_model = sparsify_model(copy.deepcopy(dense_model), min_sparsity=0.)
+            dense_ms = measure_latency(dense_model, x, args.warmup, args.iters)
+            sparse_ms = measure_latency(sparse_model, x, args.warmup, args.iters)
+            print('{:<8}{:>10.2f}{:>12.3f}{:>12.3f}{:>10.2f}'.format(name, sparsity, dense_ms, sparse_ms, dense_ms / sparse_ms))
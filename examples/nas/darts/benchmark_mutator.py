@@ -0,0 +1,49 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Micro-benchmark of mutator overhead on DARTS search space.
+Inputs are kept tiny so that the time is dominated by the selection and reduction of choices, rather than by ops.
+"""
+
+import time
+from argparse import ArgumentParser
+
+import torch
+
+from model import CNN
+from nni.nas.pytorch.darts import DartsMutator
+
+if __name__ == "__main__":
+    parser = ArgumentParser("darts_mutator_benchmark")
+    parser.add_argument("--layers", default=8, type=int)
+    parser.add_argument("--channels", default=4, type=int)
+    parser.add_argument("--input-size", default=8, type=int)
+    parser.add_argument("--batch-size", default=2, type=int)
+    parser.add_argument("--warmup", default=3, type=int)
+    parser.add_argument("--iters", default=20, type=int)
+    parser.add_argument("--backward", default=False, action="store_true")
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = CNN(args.input_size, 3, args.channels, 10, args.layers).to(device)
+    mutator = DartsMutator(model).to(device)
+    x = torch.randn(args.batch_size, 3, args.input_size, args.input_size, device=device)
+
+    def step():
+        mutator.reset()
+        logits = model(x)
+        if args.backward:
+            logits.sum().backward()
+
+    for _ in range(args.warmup):
+        step()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(args.iters):
+        step()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    elapsed = (time.perf_counter() - start) / args.iters
+    print("{} layers, {} iterations: {:.2f} ms per step".format(args.layers, args.iters, elapsed * 1000))
@@ -17,5 +17,5 @@ def accuracy(output, target, topk=(1,)):
     res = dict()
     for k in topk:
         correct_k = correct[:k].view(-1).float().sum(0)
-        res["acc{}".format(k)] = correct_k.mul_(1.0 / batch_size).item()
+        res["acc{}".format(k)] = correct_k.mul_(1.0 / batch_size)
     return res
\ No newline at end of file
@@ -64,4 +64,4 @@ class IteratorWrapper:
 def accuracy(output, target):
     batch_size = target.size(0)
     _, predicted = torch.max(output.data, 1)
-    return (predicted == target).sum().item() / batch_size
+    return (predicted == target).float().sum() / batch_size
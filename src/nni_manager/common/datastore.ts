@@ -66,6 +66,28 @@ interface ExportedDataFormat {
     id: string;
 }
 
+/**
+ * Position of a trial in export. Trials are exported in the order of the timestamp of their first final metric
+ * and their id, which is not changed by new trials, so that paging after a position never skips or repeats a trial.
+ */
+interface ExportCursor {
+    timestamp: number;
+    trialJobId: string;
+}
+
+/**
+ * Select trials to export, startTime and endTime bound the start time of trials in milliseconds.
+ * If limit is set, trials with final metrics are exported in pages, a page has at most limit trials after
+ * the cursor returned with the previous page.
+ */
+interface ExportFilter {
+    status?: TrialJobStatus[];
+    startTime?: number;
+    endTime?: number;
+    after?: string;
+    limit?: number;
+}
+
 abstract class DataStore {
     public abstract init(): Promise<void>;
     public abstract close(): Promise<void>;
@@ -78,7 +100,7 @@ abstract class DataStore {
     public abstract getTrialJob(trialJobId: string): Promise<TrialJobInfo>;
     public abstract storeMetricData(trialJobId: string, data: string): Promise<void>;
     public abstract getMetricData(trialJobId?: string, metricType?: MetricType): Promise<MetricDataRecord[]>;
-    public abstract exportTrialHpConfigs(): Promise<string>;
+    public abstract exportTrialHpConfigs(filter?: ExportFilter): Promise<string>;
     public abstract getImportedData(): Promise<string[]>;
 }
 
@@ -93,9 +115,13 @@ abstract class Database {
     public abstract queryTrialJobEvent(trialJobId?: string, event?: TrialJobEvent): Promise<TrialJobEventRecord[]>;
     public abstract storeMetricData(trialJobId: string, data: string): Promise<void>;
     public abstract queryMetricData(trialJobId?: string, type?: MetricType): Promise<MetricDataRecord[]>;
+    public abstract queryFinalMetricTrials(after: ExportCursor | undefined, limit: number): Promise<ExportCursor[]>;
+    public abstract queryTrialJobEventOfTrials(trialJobIds: string[]): Promise<TrialJobEventRecord[]>;
+    public abstract queryMetricDataOfTrials(trialJobIds: string[], type?: MetricType): Promise<MetricDataRecord[]>;
 }
 
 export {
     DataStore, Database, TrialJobEvent, MetricType, MetricData, TrialJobInfo,
-    ExperimentProfileRecord, TrialJobEventRecord, MetricDataRecord, HyperParameterFormat, ExportedDataFormat
+    ExperimentProfileRecord, TrialJobEventRecord, MetricDataRecord, HyperParameterFormat, ExportedDataFormat, ExportFilter,
+    ExportCursor
 };
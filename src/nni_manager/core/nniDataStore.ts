@@ -9,7 +9,7 @@ import { Deferred } from 'ts-deferred';
 import * as component from '../common/component';
 import { Database, DataStore, MetricData, MetricDataRecord, MetricType,
     TrialJobEvent, TrialJobEventRecord, TrialJobInfo, HyperParameterFormat,
-    ExportedDataFormat } from '../common/datastore';
+    ExportedDataFormat, ExportFilter, ExportCursor } from '../common/datastore';
 import { NNIError } from '../common/errors';
 import { getExperimentId, isNewExperiment } from '../common/experimentStartupInfo';
 import { getLogger, Logger } from '../common/log';
@@ -157,8 +157,78 @@ class NNIDataStore implements DataStore {
         return this.db.queryMetricData(trialJobId, metricType);
     }
 
-    public async exportTrialHpConfigs(): Promise<string> {
-        const jobs: TrialJobInfo[] = await this.listTrialJobs();
+    /**
+     * Export hyper-parameters and final metrics of trials as a JSON array.
+     * If the filter has a limit, a page is returned as {"trials": [...], "nextCursor": string | null},
+     * and the next page is the one after nextCursor. Only the trials of a page are queried from the database.
+     */
+    public async exportTrialHpConfigs(filter?: ExportFilter): Promise<string> {
+        if (filter === undefined || filter.limit === undefined) {
+            let jobs: TrialJobInfo[] = await this.listTrialJobs();
+            if (filter !== undefined) {
+                jobs = jobs.filter((job: TrialJobInfo) => this.isExported(job, filter));
+            }
+
+            return JSON.stringify(this.toExportedData(jobs));
+        }
+        const after: ExportCursor | undefined = filter.after === undefined ? undefined : this.parseExportCursor(filter.after);
+        const positions: ExportCursor[] = await this.db.queryFinalMetricTrials(after, filter.limit);
+        const trialJobIds: string[] = positions.map((position: ExportCursor) => position.trialJobId);
+        const map: Map<string, TrialJobInfo> = this.getTrialJobsByReplayEvents(await this.db.queryTrialJobEventOfTrials(trialJobIds));
+        const finalMetricsMap: Map<string, MetricDataRecord[]> =
+            await this.groupFinalMetricData(await this.db.queryMetricDataOfTrials(trialJobIds, 'FINAL'));
+        const jobs: TrialJobInfo[] = [];
+        for (const trialJobId of trialJobIds) {
+            const jobInfo: TrialJobInfo | undefined = map.get(trialJobId);
+            if (jobInfo === undefined) {
+                continue;
+            }
+            if (jobInfo.status === 'SUCCEEDED') {
+                jobInfo.finalMetricData = finalMetricsMap.get(trialJobId);
+            }
+            if (this.isExported(jobInfo, filter)) {
+                jobs.push(jobInfo);
+            }
+        }
+        const last: ExportCursor | undefined = positions[positions.length - 1];
+
+        return JSON.stringify({
+            trials: this.toExportedData(jobs),
+            // trials filtered out still count, so a page shorter than limit is the last one
+            nextCursor: last === undefined || positions.length < filter.limit ? null : `${last.timestamp}_${last.trialJobId}`
+        });
+    }
+
+    private parseExportCursor(cursor: string): ExportCursor {
+        const separator: number = cursor.indexOf('_');
+        if (separator < 0 || isNaN(Number(cursor.slice(0, separator)))) {
+            throw new Error(`Invalid export cursor: ${cursor}`);
+        }
+
+        return {
+            timestamp: Number(cursor.slice(0, separator)),
+            trialJobId: cursor.slice(separator + 1)
+        };
+    }
+
+    private isExported(job: TrialJobInfo, filter: ExportFilter): boolean {
+        if (!job.hyperParameters || !job.finalMetricData) {
+            return false;
+        }
+        if (filter.status !== undefined && !filter.status.includes(job.status)) {
+            return false;
+        }
+        if (filter.startTime !== undefined && (job.startTime === undefined || job.startTime < filter.startTime)) {
+            return false;
+        }
+        if (filter.endTime !== undefined && (job.startTime === undefined || job.startTime > filter.endTime)) {
+            return false;
+        }
+
+        return true;
+    }
+
+    private toExportedData(jobs: TrialJobInfo[]): ExportedDataFormat[] {
         const exportedData: ExportedDataFormat[] = [];
         for (const job of jobs) {
             if (job.hyperParameters && job.finalMetricData) {
@@ -197,7 +267,7 @@ class NNIDataStore implements DataStore {
             }
         }
 
-        return JSON.stringify(exportedData);
+        return exportedData;
     }
 
     public async getImportedData(): Promise<string[]> {
@@ -239,8 +309,11 @@ class NNIDataStore implements DataStore {
     }
 
     private async getFinalMetricData(trialJobId?: string): Promise<Map<string, MetricDataRecord[]>> {
+        return this.groupFinalMetricData(await this.getMetricData(trialJobId, 'FINAL'));
+    }
+
+    private async groupFinalMetricData(metrics: MetricDataRecord[]): Promise<Map<string, MetricDataRecord[]>> {
         const map: Map<string, MetricDataRecord[]> = new Map();
-        const metrics: MetricDataRecord[] = await this.getMetricData(trialJobId, 'FINAL');
 
         const multiPhase: boolean = await this.isMultiPhase();
 
@@ -248,7 +321,7 @@ class NNIDataStore implements DataStore {
             const existMetrics: MetricDataRecord[] | undefined = map.get(metric.trialJobId);
             if (existMetrics !== undefined) {
                 if (!multiPhase) {
-                    this.log.error(`Found multiple FINAL results for trial job ${trialJobId}, metrics: ${JSON.stringify(metrics)}`);
+                    this.log.error(`Found multiple FINAL results for trial job ${metric.trialJobId}, metrics: ${JSON.stringify(metrics)}`);
                 } else {
                     existMetrics.push(metric);
                 }
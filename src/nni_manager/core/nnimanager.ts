@@ -7,7 +7,7 @@ import * as assert from 'assert';
 import { ChildProcess, StdioOptions } from 'child_process';
 import { Deferred } from 'ts-deferred';
 import * as component from '../common/component';
-import { DataStore, MetricDataRecord, MetricType, TrialJobInfo } from '../common/datastore';
+import { DataStore, ExportFilter, MetricDataRecord, MetricType, TrialJobInfo } from '../common/datastore';
 import { NNIError } from '../common/errors';
 import { getExperimentId } from '../common/experimentStartupInfo';
 import { getLogger, Logger } from '../common/log';
@@ -108,8 +108,8 @@ class NNIManager implements Manager {
         return this.dataStore.storeTrialJobEvent('IMPORT_DATA', '', data);
     }
 
-    public async exportData(): Promise<string> {
-        return this.dataStore.exportTrialHpConfigs();
+    public async exportData(filter?: ExportFilter): Promise<string> {
+        return this.dataStore.exportTrialHpConfigs(filter);
     }
 
     public addCustomizedTrialJob(hyperParams: string): Promise<number> {
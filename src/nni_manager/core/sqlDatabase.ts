@@ -11,6 +11,7 @@ import { Deferred } from 'ts-deferred';
 
 import {
     Database,
+    ExportCursor,
     MetricDataRecord,
     MetricType,
     TrialJobEvent,
@@ -42,6 +43,9 @@ create table ExperimentProfile (
 create index ExperimentProfile_id on ExperimentProfile(id);
 `;
 
+// max number of trial ids in one query, as the number of variables in a statement is limited by sqlite
+const MAX_QUERY_TRIAL_IDS: number = 500;
+
 function loadExperimentProfile(row: any): ExperimentProfile {
     return {
         params: JSON.parse(row.params),
@@ -66,6 +70,13 @@ function loadTrialJobEvent(row: any): TrialJobEventRecord {
     };
 }
 
+function loadExportCursor(row: any): ExportCursor {
+    return {
+        timestamp: row.firstTimestamp,
+        trialJobId: row.trialJobId
+    };
+}
+
 function loadMetricData(row: any): MetricDataRecord {
     return {
         timestamp: row.timestamp,
@@ -237,6 +248,61 @@ class SqlDB implements Database {
         return deferred.promise;
     }
 
+    /**
+     * Query a page of trials with final metrics, ordered by the timestamp of their first final metric and id.
+     */
+    public queryFinalMetricTrials(after: ExportCursor | undefined, limit: number): Promise<ExportCursor[]> {
+        let sql: string = 'select trialJobId, min(timestamp) as firstTimestamp from MetricData where type=? group by trialJobId';
+        const args: any[] = ['FINAL'];
+        if (after !== undefined) {
+            sql += ' having min(timestamp)>? or (min(timestamp)=? and trialJobId>?)';
+            args.push(after.timestamp, after.timestamp, after.trialJobId);
+        }
+        sql += ' order by firstTimestamp, trialJobId limit ?';
+        args.push(limit);
+
+        this.log.trace(`queryFinalMetricTrials: SQL: ${sql}, args: ${JSON.stringify(args)}`);
+        const deferred: Deferred<ExportCursor[]> = new Deferred<ExportCursor[]>();
+        this.db.all(sql, args, (err: Error | null, rows: any[]) => {
+            this.resolve(deferred, err, rows, loadExportCursor);
+        });
+
+        return deferred.promise;
+    }
+
+    public queryTrialJobEventOfTrials(trialJobIds: string[]): Promise<TrialJobEventRecord[]> {
+        return this.queryOfTrials('TrialJobEvent', trialJobIds, loadTrialJobEvent);
+    }
+
+    public queryMetricDataOfTrials(trialJobIds: string[], metricType?: MetricType): Promise<MetricDataRecord[]> {
+        return this.queryOfTrials('MetricData', trialJobIds, loadMetricData, metricType);
+    }
+
+    private async queryOfTrials<T>(
+        table: string, trialJobIds: string[], rowLoader: (row: any) => T, metricType?: MetricType): Promise<T[]> {
+        const result: T[] = [];
+        for (let i: number = 0; i < trialJobIds.length; i += MAX_QUERY_TRIAL_IDS) {
+            const ids: string[] = trialJobIds.slice(i, i + MAX_QUERY_TRIAL_IDS);
+            // records of a trial are kept in the order they are stored
+            let sql: string = `select * from ${table} where trialJobId in (${ids.map(() => '?').join(',')})`;
+            const args: any[] = [...ids];
+            if (metricType !== undefined) {
+                sql += ' and type=?';
+                args.push(metricType);
+            }
+            sql += ' order by rowid';
+
+            this.log.trace(`queryOfTrials: SQL: ${sql}, args: ${JSON.stringify(args)}`);
+            const deferred: Deferred<T[]> = new Deferred<T[]>();
+            this.db.all(sql, args, (err: Error | null, rows: any[]) => {
+                this.resolve(deferred, err, rows, rowLoader);
+            });
+            result.push(...await deferred.promise);
+        }
+
+        return result;
+    }
+
     private resolve<T>(
         deferred: Deferred<T[]> | Deferred<void>,
         error: Error | null,
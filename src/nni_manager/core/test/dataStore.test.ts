@@ -7,10 +7,10 @@ import { expect } from 'chai';
 import { Container, Scope } from 'typescript-ioc';
 
 import * as component from '../../common/component';
-import { Database, DataStore, TrialJobInfo } from '../../common/datastore';
+import { Database, DataStore, ExportedDataFormat, ExportFilter, TrialJobInfo } from '../../common/datastore';
 import { setExperimentStartupInfo } from '../../common/experimentStartupInfo';
 import { ExperimentProfile, TrialJobStatistics } from '../../common/manager';
-import { TrialJobStatus } from '../../common/trainingService';
+import { TrialJobDetail, TrialJobStatus } from '../../common/trainingService';
 import { cleanupUnitTest, prepareUnitTest } from '../../common/utils';
 import { NNIDataStore } from '../nniDataStore';
 import { SqlDB } from '../sqlDatabase';
@@ -137,4 +137,67 @@ describe('Unit test for dataStore', () => {
         const statistics: TrialJobStatistics[] = await ds.getTrialJobStatistics();
         expect(statistics.length).to.equals(2, 'There should be 2 statistics');
     });
+
+    async function storeExportedTrial(trialJobId: string, index: number, status: TrialJobStatus): Promise<void> {
+        const hyperParameter: string = JSON.stringify({
+            parameter_id: index, parameter_source: 'algorithm', parameters: { lr: index }, parameter_index: 0
+        });
+        await ds.storeTrialJobEvent('WAITING', trialJobId, hyperParameter);
+        await ds.storeTrialJobEvent('RUNNING', trialJobId, undefined,
+                                    <TrialJobDetail><any>{ startTime: 1000 + index, url: '', form: { sequenceId: index } });
+        await ds.storeTrialJobEvent(status, trialJobId);
+        if (status === 'SUCCEEDED') {
+            await ds.storeMetricData(trialJobId, JSON.stringify({
+                trial_job_id: trialJobId, parameter_id: index, type: 'FINAL', value: JSON.stringify(index), sequence: 0
+            }));
+        }
+    }
+
+    async function exportPage(filter: ExportFilter, after?: string): Promise<[string[], string | null]> {
+        const page: any = JSON.parse(await ds.exportTrialHpConfigs(Object.assign({}, filter, { after: after, limit: 2 })));
+
+        return [page.trials.map((trial: ExportedDataFormat) => trial.id), page.nextCursor];
+    }
+
+    async function exportAllPages(filter: ExportFilter): Promise<string[]> {
+        const trialJobIds: string[] = [];
+        let cursor: string | null | undefined;
+        while (cursor !== null) {
+            const [ids, nextCursor] = await exportPage(filter, cursor);
+            trialJobIds.push(...ids);
+            cursor = nextCursor;
+        }
+
+        return trialJobIds;
+    }
+
+    it('test export trials by page', async () => {
+        // the trial of the previous test has no hyper-parameters in JSON, so it's not exported
+        for (let i: number = 0; i < 4; i++) {
+            await storeExportedTrial(`export${i}`, i, 'SUCCEEDED');
+        }
+        await storeExportedTrial('export4', 4, 'FAILED');
+        expect(await exportAllPages({})).to.deep.equal(['export0', 'export1', 'export2', 'export3']);
+
+        // a trial succeeded while paging is exported once, in the last page
+        const [firstPage, cursor] = await exportPage({});
+        await storeExportedTrial('export5', 5, 'SUCCEEDED');
+        const trialJobIds: string[] = [...firstPage];
+        let after: string | null = cursor;
+        while (after !== null) {
+            const [ids, nextCursor] = await exportPage({}, after);
+            trialJobIds.push(...ids);
+            after = nextCursor;
+        }
+        expect(trialJobIds).to.deep.equal(['export0', 'export1', 'export2', 'export3', 'export5']);
+    });
+
+    it('test export filters', async () => {
+        const filter: ExportFilter = { startTime: 1001, endTime: 1003 };
+        expect(await exportAllPages(filter)).to.deep.equal(['export1', 'export2', 'export3']);
+        const exported: ExportedDataFormat[] = JSON.parse(await ds.exportTrialHpConfigs(filter));
+        expect(exported.map((trial: ExportedDataFormat) => trial.id)).to.have.members(['export1', 'export2', 'export3']);
+        expect(await exportAllPages({ status: ['SUCCEEDED'], startTime: 1003 })).to.deep.equal(['export3', 'export5']);
+        expect(await exportAllPages({ status: ['FAILED'] })).to.deep.equal([]);
+    });
 });
@@ -7,11 +7,12 @@ import { Request, Response, Router } from 'express';
 import * as path from 'path';
 
 import * as component from '../common/component';
-import { DataStore, MetricDataRecord, TrialJobInfo } from '../common/datastore';
+import { DataStore, ExportFilter, MetricDataRecord, TrialJobInfo } from '../common/datastore';
 import { NNIError, NNIErrorNames } from '../common/errors';
 import { isNewExperiment, isReadonly } from '../common/experimentStartupInfo';
 import { getLogger, Logger } from '../common/log';
 import { ExperimentProfile, Manager, TrialJobStatistics } from '../common/manager';
+import { TrialJobStatus } from '../common/trainingService';
 import { ValidationSchemas } from './restValidationSchemas';
 import { NNIRestServer } from './nniRestServer';
 import { getVersion } from '../common/utils';
@@ -270,7 +271,17 @@ class NNIRestHandler {
 
     private exportData(router: Router): void {
         router.get('/export-data', (req: Request, res: Response) => {
-            this.nniManager.exportData().then((exportedData: string) => {
+            let filter: ExportFilter | undefined;
+            if (Object.keys(req.query).length > 0) {
+                filter = {
+                    status: req.query.status === undefined ? undefined : (<string>req.query.status).split(',') as TrialJobStatus[],
+                    startTime: req.query.start_time === undefined ? undefined : Number(req.query.start_time),
+                    endTime: req.query.end_time === undefined ? undefined : Number(req.query.end_time),
+                    after: req.query.after === undefined ? undefined : <string>req.query.after,
+                    limit: req.query.limit === undefined ? undefined : Number(req.query.limit)
+                };
+            }
+            this.nniManager.exportData(filter).then((exportedData: string) => {
                 res.send(exportedData);
             }).catch((err: Error) => {
                 this.handleError(err, res);
@@ -14,6 +14,7 @@ import * as component from '../../common/component';
 import { getBasePort, getExperimentId } from '../../common/experimentStartupInfo';
 import { RestServer } from '../../common/restServer';
 import { getExperimentRootDir, mkDirPSync } from '../../common/utils';
+import { decodeLogMessage } from './util';
 
 /**
  * Cluster Job Training service Rest server, provides rest API to support Cluster job metrics update
@@ -149,7 +150,7 @@ export abstract class ClusterJobRestServer extends RestServer {
                         autoClose: true
                     });
 
-                    writeStream.write(String.Format('{0}\n', req.body.msg));
+                    writeStream.write(String.Format('{0}\n', decodeLogMessage(req.body)));
                     writeStream.end();
                 }
                 res.send();
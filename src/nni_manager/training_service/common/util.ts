@@ -9,10 +9,22 @@ import * as fs from 'fs';
 import ignore from 'ignore';
 import * as path from 'path';
 import * as tar from 'tar';
+import * as zlib from 'zlib';
 import { String } from 'typescript-string-operations';
 import { validateFileName } from '../../common/utils';
 import { GPU_INFO_COLLECTOR_FORMAT_WINDOWS } from './gpuData';
 
+/**
+ * Get the text of a log message sent by trial tool, large log batches are sent gzipped and base64 encoded.
+ * @param logEntry the stdout log entry, with 'msg' and optional 'msgEncoding'
+ */
+export function decodeLogMessage(logEntry: any): string {
+    if (logEntry.msgEncoding === 'gzip+base64') {
+        return zlib.gunzipSync(Buffer.from(logEntry.msg, 'base64')).toString('utf8');
+    }
+    return logEntry.msg;
+}
+
 /**
  * List all files in directory except those ignored by .nniignore.
  * @param source
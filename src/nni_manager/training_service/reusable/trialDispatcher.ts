@@ -18,7 +18,7 @@ import { GPUSummary } from '../../training_service/common/gpuData';
 import { CONTAINER_INSTALL_NNI_SHELL_FORMAT } from '../common/containerJobData';
 import { TrialConfig } from '../common/trialConfig';
 import { TrialConfigMetadataKey } from '../common/trialConfigMetadataKey';
-import { validateCodeDir } from '../common/util';
+import { decodeLogMessage, validateCodeDir } from '../common/util';
 import { Command, CommandChannel } from './commandChannel';
 import { EnvironmentInformation, EnvironmentService, NodeInfomation, RunnerSettings } from './environment';
 import { MountedStorageService } from './storages/mountedStorageService';
@@ -548,7 +548,7 @@ class TrialDispatcher implements TrainingService {
                     autoClose: true
                 });
 
-                writeStream.write(String.Format('{0}\n', commandData["msg"]));
+                writeStream.write(String.Format('{0}\n', decodeLogMessage(commandData)));
                 writeStream.end();
             }
         } catch (err) {
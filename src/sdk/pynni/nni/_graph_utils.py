@@ -5,7 +5,8 @@
 import logging
 import queue
 import re
-from collections import defaultdict
+import weakref
+from collections import defaultdict, OrderedDict
 import torch
 from torch.utils.tensorboard._pytorch_graph import NodePy, NodePyIO, NodePyOP, GraphPy
 CLASSTYPE_KIND = 'ClassType'
@@ -15,8 +16,93 @@ CAT_KIND = 'aten::cat'
 _logger = logging.getLogger(__name__)
 
 
-def build_module_graph(model, dummy_input):
-    return TorchModuleGraph(model, dummy_input)
+# Cache of TorchModuleGraph. The graphs of a model are weakly keyed by the model, and they don't reference
+# the model, so they are released together with the model. The graph of a traced model references the traced
+# model, so it's weakly cached, i.e., released when it's no longer used.
+_MODULE_GRAPH_CACHE_SIZE = 8
+_module_graph_cache = weakref.WeakKeyDictionary()
+_traced_graph_cache = weakref.WeakValueDictionary()
+
+
+def _model_signature(model):
+    """
+    Signature of the model structure, i.e., the names and types of modules and the shapes of parameters and buffers.
+    """
+    modules = tuple((name, type(module).__name__) for name, module in model.named_modules())
+    tensors = tuple((name, tuple(tensor.shape)) for name, tensor in model.state_dict().items())
+    return modules, tensors
+
+
+def _input_signature(dummy_input):
+    if isinstance(dummy_input, torch.Tensor):
+        return ('tensor', tuple(dummy_input.shape), str(dummy_input.dtype), str(dummy_input.device))
+    if isinstance(dummy_input, (list, tuple)):
+        return tuple(_input_signature(x) for x in dummy_input)
+    if isinstance(dummy_input, dict):
+        return tuple((k, _input_signature(v)) for k, v in sorted(dummy_input.items()))
+    return (type(dummy_input).__name__, repr(dummy_input))
+
+
+def build_module_graph(model=None, dummy_input=None, traced_model=None):
+    """
+    Build the TorchModuleGraph of a model, or get it from the cache if the same model with the same structure
+    has been traced with the same input signature (or the same traced model has been built), so that
+    the compression utilities analyzing the same model share one trace. The graph should be treated as read-only.
+    Call ``invalidate_module_graph`` after the modules of the model are replaced in place or if the forward
+    of the model depends on states other than its modules.
+    The cache doesn't keep models alive, up to ``_MODULE_GRAPH_CACHE_SIZE`` graphs of each model are cached.
+
+    Parameters
+    ----------
+    model : pytorch model
+        The model to build graph for
+    dummy_input : pytorch tensor
+        The dummy input for ```jit.trace```
+    traced_model : torch._C.torch.jit.TopLevelTracedModule
+        An alredy traced model, if it is not None, the graph is built based on it
+
+    Returns
+    -------
+    TorchModuleGraph
+        the graph of the model
+    """
+    if traced_model is not None:
+        graph = _traced_graph_cache.get(id(traced_model))
+        # a cached graph keeps its traced model alive, so the id is not reused while the entry exists
+        if graph is None or graph.trace is not traced_model:
+            graph = TorchModuleGraph(traced_model=traced_model)
+            _traced_graph_cache[id(traced_model)] = graph
+        return graph
+    assert model is not None and dummy_input is not None, 'Please provide model & dummy_input or the traced_model'
+    graphs = _module_graph_cache.setdefault(model, OrderedDict())
+    key = (_model_signature(model), _input_signature(dummy_input))
+    if key in graphs:
+        graphs.move_to_end(key)
+        return graphs[key]
+    graph = TorchModuleGraph(model, dummy_input)
+    graphs[key] = graph
+    while len(graphs) > _MODULE_GRAPH_CACHE_SIZE:
+        graphs.popitem(last=False)
+    return graph
+
+
+def invalidate_module_graph(model=None):
+    """
+    Remove the cached graphs of a model (or a traced model) built by ``build_module_graph``.
+
+    Parameters
+    ----------
+    model : pytorch model
+        The model whose graphs are removed, all the cached graphs are removed if it is None
+    """
+    if model is None:
+        _module_graph_cache.clear()
+        _traced_graph_cache.clear()
+        return
+    _module_graph_cache.pop(model, None)
+    graph = _traced_graph_cache.get(id(model))
+    if graph is not None and graph.trace is model:
+        del _traced_graph_cache[id(model)]
 
 
 def build_graph(model, dummy_input, verbose=False):
@@ -57,12 +143,23 @@ class TorchGraph:
             # it's ok if the graph is already unpacked
             torch._C._jit_pass_inline(self.trace.graph)
         elif model is not None and dummy_input is not None:
-            self.bound_model = model
+            # the trace doesn't reference the model, neither does the graph, so that cached graphs
+            # don't keep models alive
+            self._bound_model_ref = weakref.ref(model)
             self._trace(model, dummy_input)
         else:
             raise Exception(
                 'Please provide model & dummy_input or the traced_model as inputs')
 
+    @property
+    def bound_model(self):
+        """
+        The model the graph is traced from, ``None`` if the graph is built from a traced model
+        or the model has been garbage collected.
+        """
+        bound_model_ref = getattr(self, '_bound_model_ref', None)
+        return bound_model_ref() if bound_model_ref is not None else None
+
     def _trace(self, model, dummy_input):
         with torch.onnx.set_training(model, False):
             self.trace = torch.jit.trace(model, dummy_input)
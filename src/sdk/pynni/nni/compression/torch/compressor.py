@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import copy
 import types
 import logging
 import torch
@@ -278,18 +279,39 @@ class PrunerModuleWrapper(torch.nn.Module):
         self.config = config
         self.pruner = pruner
 
-        # register buffer for mask
-        self.register_buffer("weight_mask", torch.ones(self.module.weight.shape))
+        # register buffer for mask, masks are stored as bool tensors
+        self.register_buffer("weight_mask", torch.ones(self.module.weight.shape, dtype=torch.bool))
         if hasattr(self.module, 'bias') and self.module.bias is not None:
-            self.register_buffer("bias_mask", torch.ones(self.module.bias.shape))
+            self.register_buffer("bias_mask", torch.ones(self.module.bias.shape, dtype=torch.bool))
         else:
             self.register_buffer("bias_mask", None)
+        # state of the weights and masks when the masks were applied last time
+        self._masked_state = None
+
+    def __setattr__(self, name, value):
+        # masks calculated by maskers are converted to the compact bool format
+        if name in ['weight_mask', 'bias_mask'] and isinstance(value, torch.Tensor) and value.dtype != torch.bool:
+            value = value.detach().bool()
+        super().__setattr__(name, value)
+
+    def _get_masked_state(self):
+        state = []
+        for tensor in [self.module.weight, self.weight_mask, getattr(self.module, 'bias', None), self.bias_mask]:
+            if tensor is not None:
+                state.append((tensor.data_ptr(), tensor._version))
+        return tuple(state)
 
     def forward(self, *inputs):
-        # apply mask to weight, bias
-        self.module.weight.data = self.module.weight.data.mul_(self.weight_mask)
-        if hasattr(self.module, 'bias') and self.module.bias is not None:
-            self.module.bias.data = self.module.bias.data.mul_(self.bias_mask)
+        # In training mode the weights are updated between forwards, possibly through `.data` which
+        # is not tracked, so the masks are always applied. Otherwise the masks are applied only when
+        # the weights or the masks have changed since the last time.
+        masked_state = None if self.training else self._get_masked_state()
+        if masked_state is None or masked_state != self._masked_state:
+            # apply mask to weight, bias
+            self.module.weight.data = self.module.weight.data.mul_(self.weight_mask)
+            if hasattr(self.module, 'bias') and self.module.bias is not None:
+                self.module.bias.data = self.module.bias.data.mul_(self.bias_mask)
+            self._masked_state = masked_state
         return self.module(*inputs)
 
 class Pruner(Compressor):
@@ -353,9 +375,10 @@ class Pruner(Compressor):
         wrapper.to(layer.module.weight.device)
         return wrapper
 
-    def export_model(self, model_path, mask_path=None, onnx_path=None, input_shape=None, device=None):
+    def export_model(self, model_path, mask_path=None, onnx_path=None, input_shape=None, device=None,
+                     sparse_model_path=None, sparse_min_sparsity=0.95):
         """
-        Export pruned model weights, masks and onnx model(optional)
+        Export pruned model weights, masks, onnx model(optional) and sparse model(optional)
 
         Parameters
         ----------
@@ -370,6 +393,11 @@ class Pruner(Compressor):
         device : torch.device
             device of the model, used to place the dummy input tensor for exporting onnx file.
             the tensor is placed on cpu if ```device``` is None
+        sparse_model_path : str
+            (optional) path to save the model on cpu, whose fine-grained pruned Linear and Conv2d modules are
+            replaced by modules with weights in sparse format, see ``nni.compression.torch.speedup.sparsify_model``
+        sparse_min_sparsity : float
+            only the modules with sparsity no less than it are replaced in the sparse model
         """
         assert model_path is not None, 'model_path must be specified'
         mask_dict = {}
@@ -401,6 +429,11 @@ class Pruner(Compressor):
             input_data = torch.Tensor(*input_shape)
             torch.onnx.export(self.bound_model, input_data.to(device), onnx_path)
             _logger.info('Model in onnx with input shape %s saved to %s', input_data.shape, onnx_path)
+        if sparse_model_path is not None:
+            from .speedup.sparse_modules import sparsify_model
+            sparse_model = sparsify_model(copy.deepcopy(self.bound_model).cpu(), min_sparsity=sparse_min_sparsity)
+            torch.save(sparse_model, sparse_model_path)
+            _logger.info('Sparse model saved to %s', sparse_model_path)
 
         self._wrap_model()
 
@@ -37,7 +37,7 @@ class AutoCompressPruner(Pruner):
                  start_temperature=100, stop_temperature=20, cool_down_rate=0.9, perturbation_magnitude=0.35,
                  # ADMM related
                  admm_num_iterations=30, admm_training_epochs=5, row=1e-4,
-                 experiment_data_dir='./'):
+                 experiment_data_dir='./', n_workers=1):
         """
         Parameters
         ----------
@@ -114,6 +114,8 @@ class AutoCompressPruner(Pruner):
             Penalty parameters for ADMM training
         experiment_data_dir : string
             PATH to store temporary experiment data
+        n_workers : int
+            Number of worker processes used by SimulatedAnnealingPruner to evaluate perturbations concurrently
         """
         # original model
         self._model_to_prune = model
@@ -130,6 +132,7 @@ class AutoCompressPruner(Pruner):
         self._stop_temperature = stop_temperature
         self._cool_down_rate = cool_down_rate
         self._perturbation_magnitude = perturbation_magnitude
+        self._n_workers = n_workers
 
         # hyper parameters for ADMM algorithm
         self._admm_num_iterations = admm_num_iterations
@@ -203,7 +206,8 @@ class AutoCompressPruner(Pruner):
                 stop_temperature=self._stop_temperature,
                 cool_down_rate=self._cool_down_rate,
                 perturbation_magnitude=self._perturbation_magnitude,
-                experiment_data_dir=self._experiment_data_dir)
+                experiment_data_dir=self._experiment_data_dir,
+                n_workers=self._n_workers)
             config_list = SApruner.compress(return_config_list=True)
             _logger.info("Generated config_list : %s", config_list)
 
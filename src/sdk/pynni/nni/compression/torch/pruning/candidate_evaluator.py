@@ -0,0 +1,197 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+import logging
+import multiprocessing
+
+import torch
+
+from .constants_pruner import PRUNER_DICT
+
+_logger = logging.getLogger(__name__)
+
+# The evaluator inherited by forked workers, so that the model is not pickled.
+_worker_evaluator = None
+
+
+def _init_worker(num_threads):
+    torch.set_num_threads(num_threads)
+
+
+def _evaluate_worker(config_list):
+    return _worker_evaluator.evaluate(config_list, use_cache=False)
+
+
+def canonicalize_config_list(config_list):
+    """
+    Get a hashable key of a config_list which does not depend on the order of configs, op names or keys.
+
+    Parameters
+    ----------
+    config_list : list
+        config_list for the base pruner
+
+    Returns
+    -------
+    str
+        canonical form of the config_list
+    """
+    configs = []
+    for config in config_list:
+        config = dict(config)
+        for key in ['op_names', 'op_types']:
+            if key in config:
+                config[key] = sorted(config[key])
+        if 'sparsity' in config:
+            config['sparsity'] = round(float(config['sparsity']), 8)
+        configs.append(json.dumps(config, sort_keys=True))
+    return json.dumps(sorted(configs))
+
+
+class CandidateEvaluator:
+    """
+    Evaluate pruning candidates (config_lists) on one shared model.
+    Instead of cloning the model for every candidate, the base pruner wraps the shared model,
+    the evaluator runs on the masked model, then the model is unwrapped and its state is restored
+    from a snapshot taken once. Results are cached by the canonical config_list.
+    """
+
+    def __init__(self, model, evaluator, base_algo='l1', fine_tuner=None, n_workers=1):
+        """
+        Parameters
+        ----------
+        model : torch.nn.Module
+            The shared model to evaluate the candidates on, it should not be wrapped by any pruner
+        evaluator : function
+            function to evaluate the pruned model, with `model` as the only parameter
+        base_algo : str
+            Base pruning algorithm. `level`, `l1` or `l2`
+        fine_tuner : function
+            (optional) function to fine tune the pruned model before evaluation, with `model` as the only parameter
+        n_workers : int
+            Number of processes forked to evaluate candidates in `evaluate_many` concurrently.
+            Each of them evaluates on its private copy of the model, so the model should be on CPU.
+        """
+        self.model = model
+        self.evaluator = evaluator
+        self.base_algo = base_algo
+        self.fine_tuner = fine_tuner
+        self.n_workers = n_workers
+        self.cache = {}
+        self._pool = None
+        self._snapshot = None
+        self.update_snapshot()
+
+    def update_snapshot(self):
+        """
+        Take a new snapshot of the model state, call it after the weights of the shared model are changed.
+        The cached results and the worker processes are discarded because they are based on the old weights.
+        """
+        self._snapshot = {k: v.detach().clone() for k, v in self.model.state_dict().items()}
+        self.cache = {}
+        self.close()
+
+    def restore(self):
+        """
+        Restore the state of the shared model from the snapshot in place.
+        """
+        with torch.no_grad():
+            for k, v in self.model.state_dict(keep_vars=True).items():
+                v.data.copy_(self._snapshot[k])
+
+    def evaluate(self, config_list, callback=None, use_cache=True):
+        """
+        Evaluate a candidate on the shared model.
+
+        Parameters
+        ----------
+        config_list : list
+            config_list for the base pruner
+        callback : function
+            (optional) called with the base pruner and the evaluation result before the model is restored,
+            e.g. to export the masks and weights of the candidate.
+            Cached results are returned without calling it.
+        use_cache : bool
+            whether to look up and update the cache
+
+        Returns
+        -------
+        float
+            evaluation result of the candidate
+        """
+        key = canonicalize_config_list(config_list)
+        if use_cache and key in self.cache:
+            _logger.debug('Evaluation result of config_list found in cache: %s', self.cache[key])
+            return self.cache[key]
+
+        pruner = PRUNER_DICT[self.base_algo](self.model, config_list)
+        try:
+            model_masked = pruner.compress()
+            if self.fine_tuner is not None:
+                self.fine_tuner(model_masked)
+            result = self.evaluator(model_masked)
+            if callback is not None:
+                callback(pruner, result)
+        finally:
+            pruner._unwrap_model()
+            self.restore()
+
+        if use_cache:
+            self.cache[key] = result
+        return result
+
+    def evaluate_many(self, config_lists):
+        """
+        Evaluate several candidates, concurrently in worker processes if `n_workers` is larger than 1.
+
+        Parameters
+        ----------
+        config_lists : list
+            list of config_lists for the base pruner
+
+        Returns
+        -------
+        list
+            evaluation results of the candidates, in the same order as `config_lists`
+        """
+        keys = [canonicalize_config_list(config_list) for config_list in config_lists]
+        todo = {}
+        for key, config_list in zip(keys, config_lists):
+            if key not in self.cache and key not in todo:
+                todo[key] = config_list
+
+        if self.n_workers <= 1 or len(todo) <= 1:
+            for config_list in todo.values():
+                self.evaluate(config_list)
+        else:
+            pool = self._get_pool()
+            for key, result in zip(todo.keys(), pool.map(_evaluate_worker, list(todo.values()))):
+                self.cache[key] = result
+
+        return [self.cache[key] for key in keys]
+
+    def _get_pool(self):
+        global _worker_evaluator
+        if self._pool is None:
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                raise RuntimeError('Concurrent candidate evaluation requires the fork start method.')
+            if any(param.is_cuda for param in self.model.parameters()):
+                raise RuntimeError('Concurrent candidate evaluation does not support models on GPU.')
+            _worker_evaluator = self
+            try:
+                num_threads = max(1, torch.get_num_threads() // self.n_workers)
+                self._pool = multiprocessing.get_context('fork').Pool(
+                    self.n_workers, initializer=_init_worker, initargs=(num_threads,))
+            finally:
+                _worker_evaluator = None
+        return self._pool
+
+    def close(self):
+        """
+        Terminate the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
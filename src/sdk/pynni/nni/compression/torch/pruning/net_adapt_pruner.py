@@ -13,7 +13,7 @@ from nni.utils import OptimizeMode
 from ..compressor import Pruner
 from ..utils.config_validation import CompressorSchema
 from ..utils.num_param_counter import get_total_num_weights
-from .constants_pruner import PRUNER_DICT
+from .candidate_evaluator import CandidateEvaluator
 
 
 _logger = logging.getLogger(__name__)
@@ -255,6 +255,11 @@ class NetAdaptPruner(Pruner):
         delta_num_weights_per_iteration = \
             int(get_total_num_weights(self._model_to_prune, ['Conv2d', 'Linear']) * self._sparsity_per_iteration)
 
+        # candidates are fine tuned and evaluated by swapping masks on the shared model, instead of copying it.
+        # the cache is not used, because the masks and fine tuned weights of the best candidate are also needed.
+        candidate_evaluator = CandidateEvaluator(
+            self._model_to_prune, self._evaluator, self._base_algo, fine_tuner=self._short_term_fine_tuner)
+
         # stop condition
         while current_sparsity < self._sparsity:
             _logger.info('Pruning iteration: %d', pruning_iteration)
@@ -283,34 +288,31 @@ class NetAdaptPruner(Pruner):
                 config_list = self._update_config_list(self._config_list_generated, wrapper.name, target_op_sparsity)
                 _logger.debug("config_list used : %s", config_list)
 
-                pruner = PRUNER_DICT[self._base_algo](copy.deepcopy(self._model_to_prune), config_list)
-                model_masked = pruner.compress()
-
-                # Short-term fine tune the pruned model
-                self._short_term_fine_tuner(model_masked)
-
-                performance = self._evaluator(model_masked)
-                _logger.info("Layer : %s, evaluation result after short-term fine tuning : %s", wrapper.name, performance)
-
-                if not best_op \
-                    or (self._optimize_mode is OptimizeMode.Maximize and performance > best_op['performance']) \
-                    or (self._optimize_mode is OptimizeMode.Minimize and performance < best_op['performance']):
-                    _logger.debug("updating best layer to %s...", wrapper.name)
-                    # find weight mask of this layer
-                    for w in pruner.get_modules_wrapper():
-                        if w.name == wrapper.name:
-                            masks = {'weight_mask': w.weight_mask,
-                                     'bias_mask': w.bias_mask}
-                            break
-                    best_op = {
-                        'op_name': wrapper.name,
-                        'sparsity': target_op_sparsity,
-                        'performance': performance,
-                        'masks': masks
-                    }
-
-                    # save model weights
-                    pruner.export_model(self._tmp_model_path)
+                def update_best_op(pruner, performance, op_name=wrapper.name, sparsity=target_op_sparsity):
+                    _logger.info("Layer : %s, evaluation result after short-term fine tuning : %s", op_name, performance)
+
+                    if not best_op \
+                        or (self._optimize_mode is OptimizeMode.Maximize and performance > best_op['performance']) \
+                        or (self._optimize_mode is OptimizeMode.Minimize and performance < best_op['performance']):
+                        _logger.debug("updating best layer to %s...", op_name)
+                        # find weight mask of this layer
+                        for w in pruner.get_modules_wrapper():
+                            if w.name == op_name:
+                                masks = {'weight_mask': w.weight_mask,
+                                         'bias_mask': w.bias_mask}
+                                break
+                        best_op.update({
+                            'op_name': op_name,
+                            'sparsity': sparsity,
+                            'performance': performance,
+                            'masks': masks
+                        })
+
+                        # save model weights
+                        pruner.export_model(self._tmp_model_path)
+
+                # Short-term fine tune and evaluate the pruned model
+                candidate_evaluator.evaluate(config_list, callback=update_best_op, use_cache=False)
 
             if not best_op:
                 # decrease pruning step
@@ -325,6 +327,7 @@ class NetAdaptPruner(Pruner):
 
             # update weights parameters
             self._model_to_prune.load_state_dict(torch.load(self._tmp_model_path))
+            candidate_evaluator.update_snapshot()
 
             # update mask of the chosen op
             for wrapper in self.get_modules_wrapper():
@@ -15,6 +15,7 @@ from nni.utils import OptimizeMode
 from ..compressor import Pruner
 from ..utils.config_validation import CompressorSchema
 from .constants_pruner import PRUNER_DICT
+from .candidate_evaluator import CandidateEvaluator
 
 
 _logger = logging.getLogger(__name__)
@@ -33,7 +34,8 @@ class SimulatedAnnealingPruner(Pruner):
     """
 
     def __init__(self, model, config_list, evaluator, optimize_mode='maximize', base_algo='l1',
-                 start_temperature=100, stop_temperature=20, cool_down_rate=0.9, perturbation_magnitude=0.35, experiment_data_dir='./'):
+                 start_temperature=100, stop_temperature=20, cool_down_rate=0.9, perturbation_magnitude=0.35,
+                 experiment_data_dir='./', n_workers=1):
         """
         Parameters
         ----------
@@ -77,6 +79,9 @@ class SimulatedAnnealingPruner(Pruner):
         experiment_data_dir : string
             PATH to save experiment data,
             including the config_list generated for the base pruning algorithm, the performance of the pruned model and the pruning history.
+        n_workers : int
+            Number of perturbations generated and evaluated concurrently in forked worker processes, by default 1.
+            The perturbations of a batch are then accepted or rejected in order. Only supported for models on CPU.
         """
         # original model
         self._model_to_prune = copy.deepcopy(model)
@@ -93,6 +98,7 @@ class SimulatedAnnealingPruner(Pruner):
         self._stop_temperature = stop_temperature
         self._cool_down_rate = cool_down_rate
         self._perturbation_magnitude = perturbation_magnitude
+        self._n_workers = n_workers
 
         # overall pruning rate
         self._sparsity = config_list[0]['sparsity']
@@ -256,6 +262,44 @@ class SimulatedAnnealingPruner(Pruner):
                 _logger.info("Sparsities perturbated:%s", sparsities)
                 return sparsities
 
+    def _try_accept(self, sparsities_perturbated, config_list, evaluation_result):
+        """
+        Record the evaluation result of a perturbation, and decide whether to accept it.
+
+        Returns
+        -------
+        bool
+            whether the perturbation is accepted
+        """
+        self._search_history.append(
+            {'sparsity': self._sparsity, 'performance': evaluation_result, 'config_list': config_list})
+
+        if self._optimize_mode is OptimizeMode.Minimize:
+            evaluation_result *= -1
+
+        # if better evaluation result, then accept the perturbation
+        if evaluation_result > self._current_performance:
+            self._current_performance = evaluation_result
+            self._sparsities = sparsities_perturbated
+
+            # save best performance and best params
+            if evaluation_result > self._best_performance:
+                _logger.info('updating best model...')
+                self._best_performance = evaluation_result
+                self._best_config_list = config_list
+            return True
+
+        # if not, accept with probability e^(-deltaE/current_temperature)
+        delta_E = np.abs(evaluation_result -
+                         self._current_performance)
+        probability = math.exp(-1 * delta_E /
+                               self._current_temperature)
+        if np.random.uniform(0, 1) < probability:
+            self._current_performance = evaluation_result
+            self._sparsities = sparsities_perturbated
+            return True
+        return False
+
     def calc_mask(self, wrapper, **kwargs):
         return None
 
@@ -274,59 +318,44 @@ class SimulatedAnnealingPruner(Pruner):
         pruning_iteration = 0
         self._init_sparsities()
 
+        # candidates are evaluated by swapping masks on the shared model, instead of copying it
+        candidate_evaluator = CandidateEvaluator(
+            self._model_to_prune, self._evaluator, self._base_algo, n_workers=self._n_workers)
+
         # stop condition
         self._current_temperature = self._start_temperature
-        while self._current_temperature > self._stop_temperature:
-            _logger.info('Pruning iteration: %d', pruning_iteration)
-            _logger.info('Current temperature: %d, Stop temperature: %d',
-                         self._current_temperature, self._stop_temperature)
-            while True:
-                # generate perturbation
-                sparsities_perturbated = self._generate_perturbations()
-                config_list = self._sparsities_2_config_list(
-                    sparsities_perturbated)
-                _logger.info(
-                    "config_list for Pruner generated: %s", config_list)
-
-                # fast evaluation
-                pruner = PRUNER_DICT[self._base_algo](copy.deepcopy(self._model_to_prune), config_list)
-                model_masked = pruner.compress()
-                evaluation_result = self._evaluator(model_masked)
-
-                self._search_history.append(
-                    {'sparsity': self._sparsity, 'performance': evaluation_result, 'config_list': config_list})
-
-                if self._optimize_mode is OptimizeMode.Minimize:
-                    evaluation_result *= -1
-
-                # if better evaluation result, then accept the perturbation
-                if evaluation_result > self._current_performance:
-                    self._current_performance = evaluation_result
-                    self._sparsities = sparsities_perturbated
-
-                    # save best performance and best params
-                    if evaluation_result > self._best_performance:
-                        _logger.info('updating best model...')
-                        self._best_performance = evaluation_result
-                        self._best_config_list = config_list
-
-                        # save the overall best masked model
-                        self.bound_model = model_masked
-                    break
-                # if not, accept with probability e^(-deltaE/current_temperature)
-                else:
-                    delta_E = np.abs(evaluation_result -
-                                     self._current_performance)
-                    probability = math.exp(-1 * delta_E /
-                                           self._current_temperature)
-                    if np.random.uniform(0, 1) < probability:
-                        self._current_performance = evaluation_result
-                        self._sparsities = sparsities_perturbated
-                        break
-
-            # cool down
-            self._current_temperature *= self._cool_down_rate
-            pruning_iteration += 1
+        try:
+            while self._current_temperature > self._stop_temperature:
+                _logger.info('Pruning iteration: %d', pruning_iteration)
+                _logger.info('Current temperature: %d, Stop temperature: %d',
+                             self._current_temperature, self._stop_temperature)
+                accepted = False
+                while not accepted:
+                    # generate perturbations
+                    perturbations = [self._generate_perturbations() for _ in range(max(1, self._n_workers))]
+                    config_lists = [self._sparsities_2_config_list(sparsities) for sparsities in perturbations]
+                    for config_list in config_lists:
+                        _logger.info(
+                            "config_list for Pruner generated: %s", config_list)
+
+                    # fast evaluation
+                    evaluation_results = candidate_evaluator.evaluate_many(config_lists)
+
+                    for sparsities_perturbated, config_list, evaluation_result in \
+                            zip(perturbations, config_lists, evaluation_results):
+                        if self._try_accept(sparsities_perturbated, config_list, evaluation_result):
+                            accepted = True
+                            break
+
+                # cool down
+                self._current_temperature *= self._cool_down_rate
+                pruning_iteration += 1
+        finally:
+            candidate_evaluator.close()
+
+        # the overall best masked model
+        if self._best_config_list:
+            self.bound_model = PRUNER_DICT[self._base_algo](self._model_to_prune, self._best_config_list).compress()
 
         _logger.info('----------Compression finished--------------')
         _logger.info('Best performance: %s', self._best_performance)
@@ -82,6 +82,30 @@ class StructuredWeightMasker(WeightMasker):
         """
         raise NotImplementedError('{} get_mask is not implemented'.format(self.__class__.__name__))
 
+    def _prune_filters(self, base_mask, scores, num_prune, largest=False):
+        """
+        Mask the filters with the smallest (or largest) scores.
+        Parameters
+        ----------
+        base_mask: dict
+            The basic mask to update in place
+        scores: tensor
+            One score per filter
+        num_prune: int
+            Num of filters to prune
+        largest: bool
+            Prune the filters with the largest scores instead of the smallest ones
+        Returns
+        -------
+        dict
+            dictionary for storing masks
+        """
+        prune_indices = torch.topk(scores, num_prune, largest=largest)[1].to(base_mask['weight_mask'].device)
+        base_mask['weight_mask'][prune_indices] = 0.
+        if base_mask['bias_mask'] is not None:
+            base_mask['bias_mask'][prune_indices] = 0.
+        return base_mask
+
 class L1FilterPrunerMasker(StructuredWeightMasker):
     """
     A structured pruning algorithm that prunes the filters of smallest magnitude
@@ -123,49 +147,32 @@ class FPGMPrunerMasker(StructuredWeightMasker):
     "Filter Pruning via Geometric Median for Deep Convolutional Neural Networks Acceleration",
     https://arxiv.org/pdf/1811.00250.pdf
     """
-    def get_mask(self, base_mask, weight, num_prune, wrapper, wrapper_idx):
-        min_gm_idx = self._get_min_gm_kernel_idx(weight, num_prune)
-        for idx in min_gm_idx:
-            base_mask['weight_mask'][idx] = 0.
-            if base_mask['bias_mask'] is not None:
-                base_mask['bias_mask'][idx] = 0.
-        return base_mask
-
-    def _get_min_gm_kernel_idx(self, weight, n):
-        assert len(weight.size()) in [3, 4]
+    def __init__(self, model, pruner, chunk_size=1024):
+        super().__init__(model, pruner)
+        self.chunk_size = chunk_size
 
-        dist_list = []
-        for out_i in range(weight.size(0)):
-            dist_sum = self._get_distance_sum(weight, out_i)
-            dist_list.append((dist_sum, out_i))
-        min_gm_kernels = sorted(dist_list, key=lambda x: x[0])[:n]
-        return [x[1] for x in min_gm_kernels]
+    def get_mask(self, base_mask, weight, num_prune, wrapper, wrapper_idx):
+        return self._prune_filters(base_mask, self._get_distance_sums(weight), num_prune)
 
-    def _get_distance_sum(self, weight, out_idx):
+    def _get_distance_sums(self, weight):
         """
-        Calculate the total distance between a specified filter (by out_idex and in_idx) and
-        all other filters.
+        Calculate the total distance between each filter and all other filters.
+        The pairwise distances are computed by ``torch.cdist`` in chunks of ``chunk_size`` filters,
+        so that the memory is bounded by ``chunk_size * filters``.
         Parameters
         ----------
         weight: Tensor
             convolutional filter weight
-        out_idx: int
-            output channel index of specified filter, this method calculates the total distance
-            between this specified filter and all other filters.
         Returns
         -------
-        float32
-            The total distance
+        Tensor
+            The total distance of each filter
         """
         logger.debug('weight size: %s', weight.size())
         assert len(weight.size()) in [3, 4], 'unsupported weight shape'
 
         w = weight.view(weight.size(0), -1)
-        anchor_w = w[out_idx].unsqueeze(0).expand(w.size(0), w.size(1))
-        x = w - anchor_w
-        x = (x * x).sum(-1)
-        x = torch.sqrt(x)
-        return x.sum()
+        return torch.cat([torch.cdist(chunk, w).sum(dim=1) for chunk in torch.split(w, self.chunk_size)])
 
 class TaylorFOWeightFilterPrunerMasker(StructuredWeightMasker):
     """
@@ -189,12 +196,7 @@ class TaylorFOWeightFilterPrunerMasker(StructuredWeightMasker):
         if wrapper.contribution is None:
             return None
 
-        prune_indices = torch.argsort(wrapper.contribution)[:num_prune]
-        for idx in prune_indices:
-            base_mask['weight_mask'][idx] = 0.
-            if base_mask['bias_mask'] is not None:
-                base_mask['bias_mask'][idx] = 0.
-        return base_mask
+        return self._prune_filters(base_mask, wrapper.contribution, num_prune)
 
     def calc_contributions(self):
         """
@@ -215,6 +217,11 @@ class TaylorFOWeightFilterPrunerMasker(StructuredWeightMasker):
 
 
 class ActivationFilterPrunerMasker(StructuredWeightMasker):
+    """
+    Base class of maskers ranking filters by their output activations. Instead of keeping the activations,
+    forward hooks update running per-channel statistics on the device of the layer, so that memory
+    cost is O(channels) per layer regardless of ``statistics_batch_num``.
+    """
     def __init__(self, model, pruner, statistics_batch_num=1, activation='relu'):
         super().__init__(model, pruner)
         self.statistics_batch_num = statistics_batch_num
@@ -229,21 +236,49 @@ class ActivationFilterPrunerMasker(StructuredWeightMasker):
             self.pruner.activation = None
 
     def _add_activation_collector(self, pruner):
-        def collector(collected_activation):
+        def collector(statistics):
             def hook(module_, input_, output):
-                collected_activation.append(pruner.activation(output.detach().cpu()))
+                activation = pruner.activation(output.detach())
+                # reduce over all dimensions except channel
+                dims = [0] + list(range(2, activation.dim()))
+                value = self._channel_statistics(activation, dims)
+                statistics['value'] = value if statistics['value'] is None else statistics['value'] + value
+                statistics['count'] += activation.numel() // activation.size(1)
+                statistics['batch_num'] += 1
             return hook
         pruner.collected_activation = {}
         pruner._fwd_hook_id += 1
         pruner._fwd_hook_handles[pruner._fwd_hook_id] = []
 
         for wrapper_idx, wrapper in enumerate(pruner.get_modules_wrapper()):
-            pruner.collected_activation[wrapper_idx] = []
+            pruner.collected_activation[wrapper_idx] = {'batch_num': 0, 'count': 0, 'value': None}
             handle = wrapper.register_forward_hook(collector(pruner.collected_activation[wrapper_idx]))
 
             pruner._fwd_hook_handles[pruner._fwd_hook_id].append(handle)
         return pruner._fwd_hook_id
 
+    def _channel_statistics(self, activation, dims):
+        """
+        Reduce a batch of activations to per-channel statistics, which are summed over batches.
+
+        Parameters
+        ----------
+        activation : torch.Tensor
+            Layer's output activation of one batch
+        dims : list
+            Dimensions to reduce
+
+        Returns
+        -------
+        torch.Tensor
+            Per-channel statistics of the batch
+        """
+        raise NotImplementedError('{} _channel_statistics is not implemented'.format(self.__class__.__name__))
+
+    def _remove_collector_if_done(self, statistics):
+        if statistics['batch_num'] >= self.statistics_batch_num and self.pruner.hook_id in self.pruner._fwd_hook_handles:
+            self.pruner.remove_activation_collector(self.pruner.hook_id)
+
 class ActivationAPoZRankFilterPrunerMasker(ActivationFilterPrunerMasker):
     """
     A structured pruning algorithm that prunes the filters with the
@@ -254,38 +289,34 @@ class ActivationAPoZRankFilterPrunerMasker(ActivationFilterPrunerMasker):
     """
     def get_mask(self, base_mask, weight, num_prune, wrapper, wrapper_idx):
         assert wrapper_idx is not None
-        activations = self.pruner.collected_activation[wrapper_idx]
-        if len(activations) < self.statistics_batch_num:
+        statistics = self.pruner.collected_activation[wrapper_idx]
+        if statistics['batch_num'] < self.statistics_batch_num:
             return None
-        apoz = self._calc_apoz(activations)
-        prune_indices = torch.argsort(apoz, descending=True)[:num_prune]
-        for idx in prune_indices:
-            base_mask['weight_mask'][idx] = 0.
-            if base_mask['bias_mask'] is not None:
-                base_mask['bias_mask'][idx] = 0.
+        apoz = self._calc_apoz(statistics)
+        base_mask = self._prune_filters(base_mask, apoz, num_prune, largest=True)
+
+        self._remove_collector_if_done(statistics)
+
         return base_mask
 
-        if len(activations) >= self.statistics_batch_num and self.pruner.hook_id in self.pruner._fwd_hook_handles:
-            self.pruner.remove_activation_collector(self.pruner.hook_id)
+    def _channel_statistics(self, activation, dims):
+        return torch.eq(activation, 0).sum(dim=dims)
 
-    def _calc_apoz(self, activations):
+    def _calc_apoz(self, statistics):
         """
         Calculate APoZ(average percentage of zeros) of activations.
 
         Parameters
         ----------
-        activations : list
-            Layer's output activations
+        statistics : dict
+            Running statistics of layer's output activations, with per-channel zero counts in ``value``
 
         Returns
         -------
         torch.Tensor
             Filter's APoZ(average percentage of zeros) of the activations
         """
-        activations = torch.cat(activations, 0)
-        _eq_zero = torch.eq(activations, torch.zeros_like(activations))
-        _apoz = torch.sum(_eq_zero, dim=(0, 2, 3)) / torch.numel(_eq_zero[:, 0, :, :])
-        return _apoz
+        return statistics['value'].float() / statistics['count']
 
 class ActivationMeanRankFilterPrunerMasker(ActivationFilterPrunerMasker):
     """
@@ -297,38 +328,35 @@ class ActivationMeanRankFilterPrunerMasker(ActivationFilterPrunerMasker):
     """
     def get_mask(self, base_mask, weight, num_prune, wrapper, wrapper_idx):
         assert wrapper_idx is not None
-        activations = self.pruner.collected_activation[wrapper_idx]
-        if len(activations) < self.statistics_batch_num:
+        statistics = self.pruner.collected_activation[wrapper_idx]
+        if statistics['batch_num'] < self.statistics_batch_num:
             return None
-        mean_activation = self._cal_mean_activation(activations)
-        prune_indices = torch.argsort(mean_activation)[:num_prune]
-        for idx in prune_indices:
-            base_mask['weight_mask'][idx] = 0.
-            if base_mask['bias_mask'] is not None:
-                base_mask['bias_mask'][idx] = 0.
-
-        if len(activations) >= self.statistics_batch_num and self.pruner.hook_id in self.pruner._fwd_hook_handles:
-            self.pruner.remove_activation_collector(self.pruner.hook_id)
+        mean_activation = self._cal_mean_activation(statistics)
+        base_mask = self._prune_filters(base_mask, mean_activation, num_prune)
+
+        self._remove_collector_if_done(statistics)
 
         return base_mask
 
-    def _cal_mean_activation(self, activations):
+    def _channel_statistics(self, activation, dims):
+        # accumulate in double to keep precision over many batches
+        return activation.sum(dim=dims, dtype=torch.float64)
+
+    def _cal_mean_activation(self, statistics):
         """
         Calculate mean value of activations.
 
         Parameters
         ----------
-        activations : list
-            Layer's output activations
+        statistics : dict
+            Running statistics of layer's output activations, with per-channel sums in ``value``
 
         Returns
         -------
         torch.Tensor
             Filter's mean value of the output activations
         """
-        activations = torch.cat(activations, 0)
-        mean_activation = torch.mean(activations, dim=(0, 2, 3))
-        return mean_activation
+        return (statistics['value'] / statistics['count']).float()
 
 class SlimPrunerMasker(WeightMasker):
     """
@@ -2,3 +2,4 @@
 # Licensed under the MIT license.
 
 from .quantizers import *
+from .int8_modules import *
@@ -0,0 +1,212 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import logging
+import torch
+import torch.nn.quantized as nnq
+from nni._graph_utils import build_module_graph, invalidate_module_graph
+from ..speedup.compressor import get_module_by_name
+from .quantizers import update_quantization_param
+
+__all__ = ['Int8Module', 'convert_to_int8']
+
+_logger = logging.getLogger(__name__)
+
+
+def get_qparams(rmin, rmax):
+    """
+    Get the 8 bits `scale` and `zero_point` of the quantized tensor of a real value range,
+    in the same way as ``QAT_Quantizer``.
+
+    Parameters
+    ----------
+    rmin : float or torch.Tensor
+        min value of real value
+    rmax : float or torch.Tensor
+        max value of real value
+
+    Returns
+    -------
+    float, int
+    """
+    scale, zero_point = update_quantization_param(8, torch.tensor(float(rmin)), torch.tensor(float(rmax)))
+    scale = float(scale)
+    if scale == 0:
+        # all the values are zeros
+        return 1., 0
+    return scale, int(zero_point)
+
+
+def fold_bn_into_conv(conv, bn):
+    """
+    Fold the batch normalization following a convolution into the weight and bias of the convolution in place.
+
+    Parameters
+    ----------
+    conv : torch.nn.Conv2d
+        the convolution module
+    bn : torch.nn.BatchNorm2d
+        the batch normalization module whose input is the output of the convolution
+    """
+    with torch.no_grad():
+        factor = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+        bias = conv.bias if conv.bias is not None else torch.zeros_like(bn.running_mean)
+        conv.weight.data = conv.weight.data * factor.view(-1, 1, 1, 1)
+        conv.bias = torch.nn.Parameter((bias - bn.running_mean) * factor + bn.bias)
+
+
+class Int8Module(torch.nn.Module):
+    """
+    Inference-only module computed by integer arithmetic on CPU. The float input is quantized,
+    the wrapped pytorch quantized module runs on it, and the output is dequantized,
+    so it can replace a float module in any model.
+    """
+    def __init__(self, qmodule, input_scale, input_zero_point):
+        """
+        Parameters
+        ----------
+        qmodule : torch.nn.Module
+            the pytorch quantized module, ``torch.nn.quantized.Conv2d`` or ``torch.nn.quantized.Linear``
+        input_scale : float
+            scale of the quantized input
+        input_zero_point : int
+            zero point of the quantized input
+        """
+        super().__init__()
+        self.qmodule = qmodule
+        self.input_scale = input_scale
+        self.input_zero_point = input_zero_point
+
+    def forward(self, x):
+        x = torch.quantize_per_tensor(x, self.input_scale, self.input_zero_point, torch.quint8)
+        # quantized convolution outputs in channels last memory format
+        return self.qmodule(x).dequantize().contiguous()
+
+    @classmethod
+    def from_float(cls, module, input_qparams, output_qparams):
+        """
+        Create the int8 module of a float module, the weight is quantized by its min and max values.
+
+        Parameters
+        ----------
+        module : torch.nn.Module
+            the float module, ``torch.nn.Conv2d`` or ``torch.nn.Linear``
+        input_qparams : tuple
+            scale and zero point of the quantized input
+        output_qparams : tuple
+            scale and zero point of the quantized output
+
+        Returns
+        -------
+        Int8Module
+        """
+        weight = module.weight.data.float()
+        bias = None if module.bias is None else module.bias.data.float()
+        if isinstance(module, torch.nn.Conv2d):
+            qmodule = nnq.Conv2d(module.in_channels, module.out_channels, module.kernel_size, module.stride,
+                                 module.padding, module.dilation, module.groups, module.bias is not None)
+        else:
+            qmodule = nnq.Linear(module.in_features, module.out_features, module.bias is not None)
+        scale, zero_point = get_qparams(weight.min(), weight.max())
+        # the quantized range [0, 255] of QAT_Quantizer is shifted to the range of qint8
+        qweight = torch.quantize_per_tensor(weight, scale, zero_point - 128, torch.qint8)
+        qmodule.set_weight_bias(qweight, bias)
+        qmodule.scale, qmodule.zero_point = output_qparams
+        return cls(qmodule, *input_qparams)
+
+
+def _fold_bn_in_model(model, names, dummy_input):
+    """
+    Fold the batch normalizations which only follow the given convolutions,
+    the folded batch normalizations are replaced by ``torch.nn.Identity``.
+
+    Returns
+    -------
+    list
+        names of the convolutions into which batch normalizations are folded
+    """
+    graph = build_module_graph(model, dummy_input)
+    folded = []
+    for name in names:
+        node = graph.name_to_node[name]
+        successors = graph.find_successors(name)
+        if node.op_type != 'Conv2d' or len(successors) != 1:
+            continue
+        bn_node = graph.name_to_node[successors[0]]
+        if bn_node.type != 'module' or bn_node.op_type != 'BatchNorm2d' \
+                or graph.find_predecessors(bn_node.unique_name) != [name]:
+            continue
+        _, conv = get_module_by_name(model, name)
+        super_module, bn = get_module_by_name(model, bn_node.name)
+        fold_bn_into_conv(conv, bn)
+        setattr(super_module, bn_node.name.split('.')[-1], torch.nn.Identity())
+        _logger.info('fold %s into %s', bn_node.name, name)
+        folded.append(name)
+    if folded:
+        invalidate_module_graph(model)
+    return folded
+
+
+def convert_to_int8(model, output_qparams, calibration_input, fold_bn=True):
+    """
+    Replace the ``Conv2d`` and ``Linear`` modules of a float model by ``Int8Module`` for CPU inference.
+    The model is modified in place. The quantization parameters of inputs, and of the outputs not given,
+    are calibrated by the min and max values on the calibration input.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        The float model on CPU, it should not be wrapped by a quantizer
+    output_qparams : dict
+        key: name of the module to convert, value: (scale, zero_point) of its output, or None to calibrate
+    calibration_input : torch.Tensor
+        a batch of representative inputs of the model
+    fold_bn : bool
+        whether to fold the batch normalizations following the converted convolutions into them
+
+    Returns
+    -------
+    torch.nn.Module
+        the model with int8 modules
+    """
+    model.eval()
+    output_qparams = dict(output_qparams)
+    if fold_bn:
+        # the output range learned before folding is no longer valid
+        for name in _fold_bn_in_model(model, list(output_qparams.keys()), calibration_input):
+            output_qparams[name] = None
+
+    ranges = {}
+    handles = []
+
+    def record(name, key, tensor):
+        rmin, rmax = tensor.min().item(), tensor.max().item()
+        if (name, key) in ranges:
+            rmin, rmax = min(rmin, ranges[(name, key)][0]), max(rmax, ranges[(name, key)][1])
+        ranges[(name, key)] = (rmin, rmax)
+
+    for name in output_qparams:
+        _, module = get_module_by_name(model, name)
+        handles.append(module.register_forward_pre_hook(
+            lambda module, inputs, name=name: record(name, 'input', inputs[0])))
+        handles.append(module.register_forward_hook(
+            lambda module, inputs, output, name=name: record(name, 'output', output)))
+    try:
+        with torch.no_grad():
+            model(calibration_input)
+    finally:
+        for handle in handles:
+            handle.remove()
+
+    for name, qparams in output_qparams.items():
+        super_module, module = get_module_by_name(model, name)
+        if (name, 'input') not in ranges:
+            _logger.warning('%s is not called on the calibration input, it is not converted', name)
+            continue
+        if qparams is None:
+            qparams = get_qparams(*ranges[(name, 'output')])
+        int8_module = Int8Module.from_float(module, get_qparams(*ranges[(name, 'input')]), qparams)
+        setattr(super_module, name.split('.')[-1], int8_module)
+        _logger.info('convert %s to int8, output scale: %f, zero point: %d', name, *qparams)
+    invalidate_module_graph(model)
+    return model
@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import copy
 import logging
 import torch
 from schema import Schema, And, Or, Optional
@@ -258,6 +259,70 @@ class QAT_Quantizer(Quantizer):
         """
         self.steps += 1
 
+    def export_int8_model(self, calibration_input, model_path=None, fold_bn=True):
+        """
+        Export a copy of the model in which the 8 bits quantized ``Conv2d`` and ``Linear`` modules are
+        replaced by modules computed by integer arithmetic with pytorch quantized backend on CPU.
+        The weights are quantized with the same scales and zero points as in training, the learned output
+        ranges are used if output quantization is configured for the module, and the rest of quantization
+        parameters are calibrated on the calibration input. The quantizer and its model are not changed.
+
+        Parameters
+        ----------
+        calibration_input : torch.Tensor
+            a batch of representative inputs of the model
+        model_path : str
+            (optional) path to save the int8 model traced by ``torch.jit.trace``, which can be loaded
+            by ``torch.jit.load`` without the definition of the model
+        fold_bn : bool
+            whether to fold the batch normalizations following the quantized convolutions into them
+
+        Returns
+        -------
+        torch.nn.Module
+            the int8 model on CPU
+        """
+        from .int8_modules import convert_to_int8, get_qparams
+
+        output_qparams = {}
+        for wrapper in self.get_modules_wrapper():
+            config = wrapper.config
+            if wrapper.type not in ['Conv2d', 'Linear'] or 'weight' not in config['quant_types'] \
+                    or any(get_bits_length(config, quant_type) != 8 for quant_type in config['quant_types']):
+                logger.warning('%s is not exported to int8, only 8 bits Conv2d and Linear are supported', wrapper.name)
+                continue
+            module = wrapper.module
+            if 'output' in config['quant_types'] and module.tracked_min.item() != module.tracked_max.item():
+                output_qparams[wrapper.name] = get_qparams(module.tracked_min, module.tracked_max)
+            else:
+                output_qparams[wrapper.name] = None
+
+        self._unwrap_model()
+        try:
+            # buffers computed in the forward of training, e.g. the quantized weight, can not be deep copied
+            for module in self.bound_model.modules():
+                for name, buffer in module._buffers.items():
+                    if buffer is not None and not buffer.is_leaf:
+                        module._buffers[name] = buffer.detach()
+            model = copy.deepcopy(self.bound_model).cpu()
+        finally:
+            self._wrap_model()
+        # restore the float weights from the trainable `old_weight`
+        for module in model.modules():
+            if hasattr(module, 'old_weight'):
+                weight = module.old_weight.data
+                delattr(module, 'old_weight')
+                delattr(module, 'weight')
+                module.weight = torch.nn.Parameter(weight)
+
+        calibration_input = calibration_input.cpu()
+        model = convert_to_int8(model, output_qparams, calibration_input, fold_bn)
+        if model_path is not None:
+            with torch.no_grad():
+                torch.jit.save(torch.jit.trace(model, calibration_input), model_path)
+            logger.info('Int8 model saved to %s', model_path)
+        return model
+
 
 class DoReFaQuantizer(Quantizer):
     """Quantizer using the DoReFa scheme, as defined in:
@@ -1 +1,2 @@
-from .compressor import ModelSpeedup
\ No newline at end of file
+from .compressor import ModelSpeedup
+from .sparse_modules import SparseLinear, SparseConv2d, sparsify_model
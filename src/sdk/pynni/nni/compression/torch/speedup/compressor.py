@@ -2,11 +2,12 @@
 # Licensed under the MIT license.
 
 import logging
+import time
 import torch
-from nni._graph_utils import build_module_graph
+from nni._graph_utils import build_module_graph, invalidate_module_graph
 from nni.compression.torch.utils.mask_conflict import fix_mask_conflict
 from .compress_modules import replace_module
-from .infer_shape import ModuleMasks, infer_from_mask, infer_from_inshape, infer_from_outshape
+from .infer_shape import CoarseMask, ModuleMasks, infer_from_mask, infer_from_inshape, infer_from_outshape
 
 _logger = logging.getLogger(__name__)
 
@@ -56,6 +57,37 @@ class ModelSpeedup:
         self.inferred_masks = dict() # key: module_name, value: ModuleMasks
         self.dummy_input = dummy_input
         self.torch_graph = build_module_graph(model, dummy_input)
+        # key: (module_name, 'predecessors' or 'successors'), value: list of module names
+        self._neighbors = dict()
+        # key: (module_name, 'input' or 'output'), value: the last mask propagated from the node
+        self._propagated = dict()
+
+    def _get_neighbors(self, module_name, direction):
+        """
+        Get the predecessors or successors of a node, which are computed once and cached
+        """
+        key = (module_name, direction)
+        if key not in self._neighbors:
+            if direction == 'predecessors':
+                self._neighbors[key] = self.torch_graph.find_predecessors(module_name)
+            else:
+                self._neighbors[key] = self.torch_graph.find_successors(module_name)
+        return self._neighbors[key]
+
+    def _is_changed(self, module_name, direction, cmask):
+        """
+        Check whether the mask to propagate from a node differs from the last one propagated
+        in the same direction, and record it if so.
+        """
+        key = (module_name, direction)
+        last = self._propagated.get(key)
+        if last is not None and last == cmask:
+            return False
+        # the mask_index of cmask may be updated later by merge, so record a copy of it
+        snapshot = CoarseMask(num_dim=len(cmask.mask_index))
+        snapshot.mask_index = list(cmask.mask_index)
+        self._propagated[key] = snapshot
+        return True
 
     def infer_module_mask(self, module_name, last_module, mask=None, in_shape=None, out_shape=None):
         """
@@ -69,6 +101,9 @@ class ModelSpeedup:
         If its input shape is changed, continue infering its predecessors
         If its output shape is changed, continue infering its successors
 
+        The propagation uses a worklist instead of recursion, nodes are visited in the same depth-first
+        order as recursion, and the masks of a node are propagated only when they are changed.
+
         Parameters
         ----------
         module_name : str
@@ -81,6 +116,35 @@ class ModelSpeedup:
             Input shape of this node
         out_shape : ModuleMasks
             Output shape of this node
+
+        Returns
+        -------
+        int
+            the number of visited nodes
+        """
+        worklist = [(module_name, last_module, mask, in_shape, out_shape)]
+        num_visits = 0
+        while worklist:
+            module_name, last_module, mask, in_shape, out_shape = worklist.pop()
+            num_visits += 1
+            input_cmask, output_cmask = self._infer_node_mask(module_name, last_module, mask, in_shape, out_shape)
+            # push successors first so that predecessors are visited first, in the same order as recursion
+            if output_cmask and self._is_changed(module_name, 'output', output_cmask):
+                for _module_name in reversed(self._get_neighbors(module_name, 'successors')):
+                    worklist.append((_module_name, module_name, None, output_cmask, None))
+            if input_cmask and self._is_changed(module_name, 'input', input_cmask):
+                for _module_name in reversed(self._get_neighbors(module_name, 'predecessors')):
+                    worklist.append((_module_name, module_name, None, None, input_cmask))
+        return num_visits
+
+    def _infer_node_mask(self, module_name, last_module, mask=None, in_shape=None, out_shape=None):
+        """
+        Infer the masks of one node, see ``infer_module_mask``.
+
+        Returns
+        -------
+        CoarseMask, CoarseMask
+            The mask of its input tensor, the mask of its output tensor
         """
         input_cmask = output_cmask = None
         if module_name in self.inferred_masks:
@@ -124,23 +188,21 @@ class ModelSpeedup:
                     "Has not supported infering input shape from output shape for module/function: `{}`, {}"
                     .format(m_type, module_name))
             input_cmask = infer_from_outshape[m_type](module_masks, out_shape)
-
-        if input_cmask:
-            predecessors = self.torch_graph.find_predecessors(module_name)
-            for _module_name in predecessors:
-                self.infer_module_mask(_module_name, module_name, out_shape=input_cmask)
-        if output_cmask:
-            successors = self.torch_graph.find_successors(module_name)
-            for _module_name in successors:
-                self.infer_module_mask(_module_name, module_name, in_shape=output_cmask)
+        return input_cmask, output_cmask
 
     def infer_modules_masks(self):
         """
         Do shape inference of involved modules, including the shape of weights, inputs, output
         """
-        for module_name, mask in self.masks.items():
+        start = time.time()
+        num_visits = 0
+        for idx, (module_name, mask) in enumerate(self.masks.items()):
             _logger.debug('Start mask inference from %s', module_name)
-            self.infer_module_mask(module_name, None, mask=mask)
+            num_visits += self.infer_module_mask(module_name, None, mask=mask)
+            _logger.debug('mask inference progress: %d/%d masked modules, %d node visits',
+                          idx + 1, len(self.masks), num_visits)
+        _logger.info('mask inference of %d masked modules done in %.2fs, %d nodes inferred with %d visits',
+                     len(self.masks), time.time() - start, len(self.inferred_masks), num_visits)
 
     def replace_compressed_modules(self):
         """
@@ -178,11 +240,17 @@ class ModelSpeedup:
         """
         training = self.bound_model.training
         _logger.info("start to speed up the model")
+        start = time.time()
         _logger.info("fix the mask conflict of the interdependent layers")
         fix_mask_conflict(self.masks, self.bound_model, self.dummy_input)
+        _logger.info("mask conflict fixed in %.2fs", time.time() - start)
         _logger.info("infer module masks...")
         self.infer_modules_masks()
         _logger.info("replace compressed modules...")
+        replace_start = time.time()
         self.replace_compressed_modules()
+        _logger.info("compressed modules replaced in %.2fs", time.time() - replace_start)
+        # the cached graph of the model is outdated after its modules are replaced
+        invalidate_module_graph(self.bound_model)
         self.bound_model.train(training)
-        _logger.info("speedup done")
+        _logger.info("speedup done in %.2fs", time.time() - start)
@@ -0,0 +1,150 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import logging
+import torch
+import torch.nn.functional as F
+from .compressor import get_module_by_name
+
+_logger = logging.getLogger(__name__)
+
+__all__ = ['SparseLinear', 'SparseConv2d', 'sparsify_model']
+
+
+def to_sparse(weight):
+    """
+    Convert a 2D dense weight into the sparse format for ``torch.sparse.mm``,
+    CSR if it is supported by the installed pytorch, COO otherwise.
+
+    Parameters
+    ----------
+    weight : torch.Tensor
+        2D dense weight
+
+    Returns
+    -------
+    torch.Tensor
+        sparse weight
+    """
+    if hasattr(weight, 'to_sparse_csr'):
+        return weight.to_sparse_csr()
+    return weight.to_sparse().coalesce()
+
+
+class SparseLinear(torch.nn.Module):
+    """
+    Inference-only linear module with the weight stored in sparse format.
+    """
+    def __init__(self, linear):
+        """
+        Parameters
+        ----------
+        linear : torch.nn.Linear
+            the linear module whose pruned weights are zeros
+        """
+        super().__init__()
+        self.in_features = linear.in_features
+        self.out_features = linear.out_features
+        self.register_buffer('weight', to_sparse(linear.weight.data))
+        self.register_buffer('bias', None if linear.bias is None else linear.bias.data.clone())
+
+    def forward(self, x):
+        x_2d = x.reshape(-1, self.in_features)
+        # (out, in) x (in, N) -> (out, N)
+        out = torch.sparse.mm(self.weight, x_2d.t()).t()
+        if self.bias is not None:
+            out = out + self.bias
+        return out.reshape(*x.shape[:-1], self.out_features)
+
+
+class SparseConv2d(torch.nn.Module):
+    """
+    Inference-only 2d convolution module with the weight stored in sparse format,
+    computed by im2col and sparse matrix multiplication. Grouped convolution is not supported.
+    """
+    def __init__(self, conv):
+        """
+        Parameters
+        ----------
+        conv : torch.nn.Conv2d
+            the convolution module whose pruned weights are zeros
+        """
+        super().__init__()
+        assert conv.groups == 1, 'grouped convolution is not supported'
+        assert conv.padding_mode == 'zeros', 'only zero padding is supported'
+        self.in_channels = conv.in_channels
+        self.out_channels = conv.out_channels
+        self.kernel_size = conv.kernel_size
+        self.stride = conv.stride
+        self.padding = conv.padding
+        self.dilation = conv.dilation
+        self.register_buffer('weight', to_sparse(conv.weight.data.reshape(conv.out_channels, -1)))
+        self.register_buffer('bias', None if conv.bias is None else conv.bias.data.clone())
+
+    def forward(self, x):
+        batch_size, _, height, width = x.shape
+        out_h = (height + 2 * self.padding[0] - self.dilation[0] * (self.kernel_size[0] - 1) - 1) // self.stride[0] + 1
+        out_w = (width + 2 * self.padding[1] - self.dilation[1] * (self.kernel_size[1] - 1) - 1) // self.stride[1] + 1
+        # (N, C*kh*kw, L) -> (C*kh*kw, N*L)
+        cols = F.unfold(x, self.kernel_size, dilation=self.dilation, padding=self.padding, stride=self.stride)
+        cols = cols.transpose(0, 1).reshape(cols.size(1), -1)
+        out = torch.sparse.mm(self.weight, cols)
+        out = out.reshape(self.out_channels, batch_size, out_h, out_w).transpose(0, 1)
+        if self.bias is not None:
+            out = out + self.bias.view(1, -1, 1, 1)
+        return out.contiguous()
+
+
+def _weight_sparsity(module, mask):
+    if mask is not None and mask.get('weight') is not None:
+        weight_mask = mask['weight']
+        return 1 - weight_mask.float().sum().item() / weight_mask.numel()
+    return (module.weight.data == 0).float().sum().item() / module.weight.numel()
+
+
+def sparsify_model(model, masks=None, min_sparsity=0.95):
+    """
+    Replace the fine-grained pruned ``Linear`` and ``Conv2d`` modules of a model
+    by ``SparseLinear`` and ``SparseConv2d`` for CPU inference. The model is modified in place.
+    The model should not be wrapped by a pruner, and the masks should have been applied to its weights.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        The model to sparsify
+    masks : dict or str
+        (optional) the mask dict or the path of the mask file exported by ``Pruner.export_model``.
+        If not given, the sparsity of a module is measured by the zeros in its weight.
+    min_sparsity : float
+        Only the modules with weight sparsity no less than it are replaced,
+        because sparse matrix multiplication is slower than dense one under low sparsity.
+
+    Returns
+    -------
+    torch.nn.Module
+        the model with sparse modules
+    """
+    if isinstance(masks, str):
+        masks = torch.load(masks, map_location='cpu')
+    to_replace = []
+    for name, module in model.named_modules():
+        if not name or masks is not None and name not in masks:
+            continue
+        if type(module) == torch.nn.Linear:
+            sparse_type = SparseLinear
+        elif type(module) == torch.nn.Conv2d and module.groups == 1 and module.padding_mode == 'zeros':
+            sparse_type = SparseConv2d
+        else:
+            continue
+        sparsity = _weight_sparsity(module, None if masks is None else masks[name])
+        if sparsity < min_sparsity:
+            continue
+        to_replace.append((name, module, sparse_type, sparsity))
+
+    for name, module, sparse_type, sparsity in to_replace:
+        _logger.info('replace %s with %s, sparsity: %.4f', name, sparse_type.__name__, sparsity)
+        if masks is not None:
+            module.weight.data = module.weight.data.mul(masks[name]['weight'].to(module.weight.device))
+        super_module, _ = get_module_by_name(model, name)
+        setattr(super_module, name.split('.')[-1], sparse_type(module))
+    return model
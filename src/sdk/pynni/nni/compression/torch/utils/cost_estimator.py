@@ -0,0 +1,283 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+import logging
+import time
+from collections import OrderedDict
+
+import numpy as np
+import torch
+import torch.nn as nn
+from nni._graph_utils import build_module_graph
+
+__all__ = ['CostEstimator']
+
+_logger = logging.getLogger(__name__)
+
+ESTIMATED_TYPES = ['Conv2d', 'Linear', 'BatchNorm2d']
+# ops through which the pruned channels of the predecessor layer are passed to the successor layer
+CHANNEL_PRESERVING_TYPES = ['BatchNorm2d', 'ReLU', 'ReLU6', 'MaxPool2d', 'AvgPool2d', 'AdaptiveAvgPool2d',
+                            'Dropout', 'Dropout2d', 'aten::relu', 'aten::relu_', 'aten::relu6', 'aten::hardtanh',
+                            'aten::hardtanh_', 'aten::max_pool2d', 'aten::avg_pool2d', 'aten::adaptive_avg_pool2d',
+                            'aten::dropout', 'aten::dropout_']
+FLATTEN_TYPES = ['aten::flatten', 'aten::view', 'aten::reshape']
+# bytes of an element of activations and weights
+ELEMENT_SIZE = 4
+
+
+class CostEstimator:
+    """
+    Estimate FLOPs, params, memory traffic and (optionally) CPU latency of a model analytically,
+    from the tensor shapes of its TorchModuleGraph, without running the model for every estimation.
+    The estimation is aware of channel pruning masks, both the pruned output channels of a layer and
+    the input channels pruned by its predecessor layer are taken into consideration.
+    Only Conv2d, Linear and BatchNorm2d layers are counted, and FLOPs/memory are counted for one sample.
+    """
+
+    def __init__(self, model, dummy_input, latency_table=None):
+        """
+        Parameters
+        ----------
+        model : torch.nn.Module
+            The model to estimate, it should not be wrapped by a pruner
+        dummy_input : torch.Tensor
+            The input example to trace the model, the graph is shared with other compression utilities
+        latency_table : dict or str
+            (optional) latency lookup table or its path, created by ``profile_latency_table``
+        """
+        self.model = model
+        self.graph = build_module_graph(model, dummy_input)
+        shapes = self._get_tensor_shapes()
+        modules = dict(model.named_modules())
+        # key: layer name, value: info of the layer
+        self.layers = OrderedDict()
+        for name, node in self.graph.name_to_node.items():
+            if node.type != 'module' or node.op_type not in ESTIMATED_TYPES:
+                continue
+            input_layer, input_scale = self._find_input_layer(name)
+            self.layers[name] = {
+                'type': node.op_type,
+                'module': modules[name],
+                'in_shape': shapes.get(node.inputs[0]),
+                'out_shape': shapes.get(node.outputs[0]),
+                'input_layer': input_layer,
+                'input_scale': input_scale
+            }
+        self.latency_table = None
+        if latency_table is not None:
+            self.load_latency_table(latency_table)
+
+    def _get_tensor_shapes(self):
+        shapes = {}
+        values = list(self.graph.trace.graph.inputs())
+        for cpp_node in self.graph.trace.graph.nodes():
+            values.extend(cpp_node.outputs())
+        for value in values:
+            try:
+                sizes = value.type().sizes()
+            except RuntimeError:
+                continue
+            if sizes is not None:
+                shapes[value.debugName()] = list(sizes)
+        return shapes
+
+    def _find_input_layer(self, name):
+        """
+        Find the layer whose output channels are the input channels of the given layer, passing through
+        channel-preserving and flatten ops. The scale is the number of input features per channel.
+        """
+        scale = 1
+        predecessors = self.graph.find_predecessors(name)
+        while len(predecessors) == 1:
+            node = self.graph.name_to_node[predecessors[0]]
+            if node.type == 'module' and node.op_type in ['Conv2d', 'Linear', 'BatchNorm2d']:
+                return node.name, scale
+            if node.op_type in FLATTEN_TYPES and node.auxiliary is not None:
+                in_shape = node.auxiliary['in_shape']
+                scale *= int(np.prod(in_shape[2:]))
+            elif node.op_type not in CHANNEL_PRESERVING_TYPES:
+                break
+            predecessors = self.graph.find_predecessors(node.unique_name)
+        return None, 1
+
+    def _out_channels(self, name, masks, cache):
+        if name in cache:
+            return cache[name]
+        layer = self.layers[name]
+        module = layer['module']
+        mask = masks.get(name) if masks is not None else None
+        if mask is not None and mask.get('weight') is not None:
+            weight_mask = mask['weight']
+            channels = int((weight_mask.reshape(weight_mask.size(0), -1) != 0).any(dim=1).sum().item())
+        elif layer['type'] == 'BatchNorm2d':
+            channels = self._in_channels(name, masks, cache)
+        elif layer['type'] == 'Conv2d':
+            channels = module.out_channels
+        else:
+            channels = module.out_features
+        cache[name] = channels
+        return channels
+
+    def _in_channels(self, name, masks, cache):
+        layer = self.layers[name]
+        module = layer['module']
+        full = module.num_features if layer['type'] == 'BatchNorm2d' else \
+            module.in_channels if layer['type'] == 'Conv2d' else module.in_features
+        if layer['input_layer'] is None:
+            return full
+        return min(full, self._out_channels(layer['input_layer'], masks, cache) * layer['input_scale'])
+
+    def _estimate_layer(self, name, in_channels, out_channels):
+        """
+        Returns
+        -------
+        dict
+            flops, params and memory of the layer with the given numbers of input and output channels kept
+        """
+        layer = self.layers[name]
+        module = layer['module']
+        out_shape = layer['out_shape']
+        in_shape = layer['in_shape']
+        if layer['type'] == 'Conv2d':
+            out_size = int(np.prod(out_shape[2:]))
+            in_size = int(np.prod(in_shape[2:]))
+            kernel_size = int(np.prod(module.kernel_size))
+            in_per_group = module.in_channels // module.groups * in_channels / module.in_channels
+            bias = 1 if module.bias is not None else 0
+            params = out_channels * (in_per_group * kernel_size + bias)
+            flops = out_channels * out_size * (in_per_group * kernel_size + bias)
+            activations = in_channels * in_size + out_channels * out_size
+        elif layer['type'] == 'Linear':
+            # features of the dimensions other than batch and the last one
+            out_size = int(np.prod(out_shape[1:-1]))
+            bias = 1 if module.bias is not None else 0
+            params = out_channels * (in_channels + bias)
+            flops = out_size * params
+            activations = out_size * (in_channels + out_channels)
+        else:
+            out_size = int(np.prod(out_shape[2:]))
+            params = 2 * out_channels
+            flops = 2 * out_channels * out_size
+            activations = 2 * out_channels * out_size
+        return {'flops': flops, 'params': params, 'memory': ELEMENT_SIZE * (params + activations)}
+
+    def estimate(self, masks=None, per_layer=False):
+        """
+        Estimate the cost of the model under the given masks.
+
+        Parameters
+        ----------
+        masks : dict
+            (optional) masks in the format exported by ``Pruner.export_model``,
+            key: layer name, value: dict with key 'weight' for the weight mask
+        per_layer : bool
+            whether to return the cost of each layer
+
+        Returns
+        -------
+        dict
+            total 'flops', 'params', 'memory' (bytes of weights and activations to access),
+            and 'latency' (ms) if the latency table is given. If ``per_layer`` is True, 'layers' contains
+            the cost of each layer.
+        """
+        cache = {}
+        total = {'flops': 0, 'params': 0, 'memory': 0}
+        layers = OrderedDict()
+        if self.latency_table is not None:
+            total['latency'] = 0.
+        for name in self.layers:
+            in_channels = self._in_channels(name, masks, cache)
+            out_channels = self._out_channels(name, masks, cache)
+            cost = self._estimate_layer(name, in_channels, out_channels)
+            if self.latency_table is not None:
+                cost['latency'] = self._lookup_latency(name, cost['flops'])
+            for key in total:
+                total[key] += cost[key]
+            layers[name] = cost
+        if per_layer:
+            total['layers'] = layers
+        return total
+
+    def _lookup_latency(self, name, flops):
+        if name not in self.latency_table:
+            return 0.
+        points = self.latency_table[name]
+        return float(np.interp(flops, [p[0] for p in points], [p[1] for p in points]))
+
+    def profile_latency_table(self, path=None, ratios=(0.25, 0.5, 0.75, 1.0), warmup=3, repeat=10):
+        """
+        Profile the CPU latency of each layer with different ratios of channels kept, to build the latency
+        lookup table. With the table, the latency of a layer is interpolated by its estimated FLOPs.
+        Run it on the machine where the model is to be deployed.
+
+        Parameters
+        ----------
+        path : str
+            (optional) path to save the table in json
+        ratios : list
+            ratios of the input and output channels kept to profile
+        warmup : int
+            number of warm-up runs of each profiling
+        repeat : int
+            number of runs to average the latency
+
+        Returns
+        -------
+        dict
+            the latency lookup table, key: layer name, value: list of [flops, latency in ms] sorted by flops
+        """
+        table = {}
+        with torch.no_grad():
+            for name, layer in self.layers.items():
+                points = []
+                for ratio in ratios:
+                    module, inputs, in_channels, out_channels = self._build_profile_layer(layer, ratio)
+                    for _ in range(warmup):
+                        module(inputs)
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        module(inputs)
+                    latency = (time.perf_counter() - start) / repeat * 1000
+                    flops = self._estimate_layer(name, in_channels, out_channels)['flops']
+                    points.append([flops, latency])
+                table[name] = sorted(points)
+                _logger.info('latency of %s profiled: %s', name, table[name])
+        self.latency_table = table
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(table, f)
+        return table
+
+    def _build_profile_layer(self, layer, ratio):
+        module = layer['module']
+        in_shape = list(layer['in_shape'])
+        if layer['type'] == 'Conv2d':
+            groups = module.groups
+            in_channels = max(groups, int(module.in_channels * ratio) // groups * groups)
+            out_channels = max(groups, int(module.out_channels * ratio) // groups * groups)
+            new_module = nn.Conv2d(in_channels, out_channels, module.kernel_size, module.stride, module.padding,
+                                   module.dilation, groups, module.bias is not None)
+        elif layer['type'] == 'Linear':
+            in_channels = max(1, int(module.in_features * ratio))
+            out_channels = max(1, int(module.out_features * ratio))
+            new_module = nn.Linear(in_channels, out_channels, module.bias is not None)
+        else:
+            in_channels = out_channels = max(1, int(module.num_features * ratio))
+            new_module = nn.BatchNorm2d(in_channels)
+        in_shape[1 if layer['type'] != 'Linear' else -1] = in_channels
+        return new_module.eval(), torch.randn(in_shape), in_channels, out_channels
+
+    def load_latency_table(self, latency_table):
+        """
+        Load the latency lookup table.
+
+        Parameters
+        ----------
+        latency_table : dict or str
+            latency lookup table or its path, created by ``profile_latency_table``
+        """
+        if isinstance(latency_table, str):
+            with open(latency_table) as f:
+                latency_table = json.load(f)
+        self.latency_table = latency_table
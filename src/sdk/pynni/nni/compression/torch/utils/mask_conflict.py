@@ -29,15 +29,11 @@ def fix_mask_conflict(masks, model=None, dummy_input=None, traced=None):
         # if the input is the path of the mask_file
         assert os.path.exists(masks)
         masks = torch.load(masks)
-    # if the user uses the model and dummy_input to trace the model, we
-    # should get the traced model handly, so that, we only trace the
-    # model once, GroupMaskConflict and ChannelMaskConflict will reuse
-    # this traced model.
+    # if the user uses the model and dummy_input to trace the model, the graph
+    # is built once and cached, GroupMaskConflict, ChannelMaskConflict and
+    # CatMaskPadding will reuse this graph.
     if traced is None:
         assert model is not None and dummy_input is not None
-        with torch.onnx.set_training(model, False):
-            # We need to trace the model in this way, else it will have problems
-            traced = torch.jit.trace(model, dummy_input)
 
     fix_group_mask = GroupMaskConflict(masks, model, dummy_input, traced)
     masks = fix_group_mask.fix_mask()
@@ -3,10 +3,14 @@
 
 import copy
 import csv
+import json
 import logging
+import multiprocessing
+import os
 from collections import OrderedDict
 
 import numpy as np
+import torch
 import torch.nn as nn
 
 from nni.compression.torch import LevelPruner
@@ -19,6 +23,52 @@ SUPPORTED_OP_TYPE = [getattr(nn, name) for name in SUPPORTED_OP_NAME]
 logger = logging.getLogger('Sensitivity_Analysis')
 logger.setLevel(logging.INFO)
 
+# The analysis and the validation arguments inherited by forked workers, so that
+# the model and the arguments referring to it are not pickled.
+_worker_context = None
+
+
+def _init_worker(num_threads):
+    torch.set_num_threads(num_threads)
+
+
+def _analyze_layer_worker(job):
+    analyzer, val_args, val_kwargs, checkpoint_path = _worker_context
+    name, finished = job
+
+    def on_result(name, sparsity, val_metric):
+        # each record is appended by a single write, so records of different workers don't interleave
+        analyzer._write_checkpoint(checkpoint_path, {'layer': name, 'sparsity': sparsity, 'metric': val_metric})
+
+    return name, analyzer._analyze_layer(name, val_args, val_kwargs, finished, on_result)
+
+
+class CachedDataLoader:
+    """
+    Load the first ``num_batches`` batches of a data loader once and iterate over them from memory.
+    Pass it to ``val_func`` through ``val_args`` or ``val_kwargs`` to use a fast proxy validation
+    in the sensitivity analysis.
+
+    Parameters
+    ----------
+    data_loader : iterable
+        The data loader of the validation dataset
+    num_batches : int
+        Number of batches to cache
+    """
+    def __init__(self, data_loader, num_batches):
+        self.batches = []
+        for batch in data_loader:
+            if len(self.batches) >= num_batches:
+                break
+            self.batches.append(batch)
+
+    def __iter__(self):
+        return iter(self.batches)
+
+    def __len__(self):
+        return len(self.batches)
+
 
 class SensitivityAnalysis:
     def __init__(self, model, val_func, sparsities=None, prune_type='l1', early_stop_mode=None, early_stop_value=None):
@@ -138,7 +188,7 @@ class SensitivityAnalysis:
                 return True
         return False
 
-    def analysis(self, val_args=None, val_kwargs=None, specified_layers=None):
+    def analysis(self, val_args=None, val_kwargs=None, specified_layers=None, n_workers=1, checkpoint_path=None):
         """
         This function analyze the sensitivity to pruning for
         each conv layer in the target model.
@@ -159,6 +209,14 @@ class SensitivityAnalysis:
             the conv layers that specified in the list.
             User can also use this option to parallelize
             the sensitivity analysis easily.
+        n_workers : int
+            Number of worker processes to analyze layers in parallel. Workers are forked
+            from the current process, so each of them gets a private copy of the model
+            without pickling. Only supported on platforms with ``fork``, and the model
+            should not be on GPU when ``n_workers`` is larger than 1.
+        checkpoint_path : str
+            If set, every validation result is appended to this file, and results already
+            in the file are not evaluated again. Use it to resume an interrupted analysis.
         Returns
         -------
         sensitivities : dict
@@ -169,19 +227,41 @@ class SensitivityAnalysis:
             val_args = []
         if val_kwargs is None:
             val_kwargs = {}
+        finished = self._load_checkpoint(checkpoint_path)
         # Get the original validation metric(accuracy/loss) before pruning
         if self.ori_metric is None:
             self.ori_metric = self.val_func(*val_args, **val_kwargs)
+            self._write_checkpoint(checkpoint_path, {'ori_metric': self.ori_metric})
         namelist = list(self.target_layer.keys())
         if specified_layers is not None:
             # only analyze several specified conv layers
             namelist = list(filter(lambda x: x in specified_layers, namelist))
-        for name in namelist:
-            self.sensitivities[name] = {}
-            for sparsity in self.sparsities:
-                # Calculate the actual prune ratio based on the already pruned ratio
-                sparsity = (
-                    1.0 - self.already_pruned[name]) * sparsity + self.already_pruned[name]
+
+        def on_result(name, sparsity, val_metric):
+            self._write_checkpoint(checkpoint_path, {'layer': name, 'sparsity': sparsity, 'metric': val_metric})
+
+        if n_workers <= 1:
+            for name in namelist:
+                self.sensitivities[name] = self._analyze_layer(
+                    name, val_args, val_kwargs, finished.get(name, {}), on_result)
+        else:
+            self.sensitivities.update(self._parallel_analysis(namelist, val_args, val_kwargs, finished,
+                                                              n_workers, checkpoint_path))
+        return self.sensitivities
+
+    def _analyze_layer(self, name, val_args, val_kwargs, finished, on_result=None):
+        """
+        Prune a layer with all sparsities and validate the model, then restore the layer.
+        Results in ``finished`` (a dict from sparsity to metric) are reused instead of validated again.
+        """
+        sensitivity = {}
+        for sparsity in self.sparsities:
+            # Calculate the actual prune ratio based on the already pruned ratio
+            sparsity = (
+                1.0 - self.already_pruned[name]) * sparsity + self.already_pruned[name]
+            if sparsity in finished:
+                val_metric = finished[sparsity]
+            else:
                 # TODO In current L1/L2 Filter Pruner, the 'op_types' is still necessary
                 # I think the L1/L2 Pruner should specify the op_types automaticlly
                 # according to the op_names
@@ -189,24 +269,85 @@ class SensitivityAnalysis:
                     name], 'op_types': ['Conv2d']}]
                 pruner = self.Pruner(self.model, cfg)
                 pruner.compress()
-                val_metric = self.val_func(*val_args, **val_kwargs)
+                try:
+                    val_metric = self.val_func(*val_args, **val_kwargs)
+                except BaseException:
+                    # leave the model as it was if the analysis is interrupted
+                    pruner._unwrap_model()
+                    self._restore_layer(name)
+                    raise
                 logger.info('Layer: %s Sparsity: %.2f Validation Metric: %.4f',
                             name, sparsity, val_metric)
-
-                self.sensitivities[name][sparsity] = val_metric
                 pruner._unwrap_model()
                 del pruner
-                # check if the current metric meet the stop condition
-                if self._need_to_stop(self.ori_metric, val_metric):
-                    break
+                if on_result is not None:
+                    on_result(name, sparsity, val_metric)
 
-            # reset the weights pruned by the pruner, because the
-            # input sparsities is sorted, so we donnot need to reset
-            # weight of the layer when the sparsity changes, instead,
-            # we only need reset the weight when the pruning layer changes.
-            self.model.load_state_dict(self.ori_state_dict)
+            sensitivity[sparsity] = val_metric
+            # check if the current metric meet the stop condition
+            if self._need_to_stop(self.ori_metric, val_metric):
+                break
 
-        return self.sensitivities
+        # reset the weights pruned by the pruner, because the
+        # input sparsities is sorted, so we donnot need to reset
+        # weight of the layer when the sparsity changes, instead,
+        # we only need reset the weight when the pruning layer changes.
+        self._restore_layer(name)
+        return sensitivity
+
+    def _parallel_analysis(self, namelist, val_args, val_kwargs, finished, n_workers, checkpoint_path):
+        global _worker_context
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise RuntimeError('Parallel sensitivity analysis requires the fork start method.')
+        if any(param.is_cuda for param in self.model.parameters()):
+            raise RuntimeError('Parallel sensitivity analysis does not support models on GPU.')
+        sensitivities = {}
+        _worker_context = (self, val_args, val_kwargs, checkpoint_path)
+        try:
+            ctx = multiprocessing.get_context('fork')
+            num_threads = max(1, torch.get_num_threads() // n_workers)
+            with ctx.Pool(n_workers, initializer=_init_worker, initargs=(num_threads,)) as pool:
+                jobs = [(name, finished.get(name, {})) for name in namelist]
+                # workers write the checkpoint after each validation, so that an interruption
+                # loses at most one sparsity of each layer being analyzed
+                for name, sensitivity in pool.imap_unordered(_analyze_layer_worker, jobs):
+                    sensitivities[name] = sensitivity
+        finally:
+            _worker_context = None
+        # keep the order of layers
+        return OrderedDict((name, sensitivities[name]) for name in namelist)
+
+    def _restore_layer(self, name):
+        """
+        Restore the tensors of a layer from the original state dict.
+        """
+        with torch.no_grad():
+            for key, tensor in self.target_layer[name].state_dict(keep_vars=True).items():
+                tensor.data.copy_(self.ori_state_dict[name + '.' + key])
+
+    def _load_checkpoint(self, checkpoint_path):
+        finished = {}
+        if checkpoint_path is None or not os.path.exists(checkpoint_path):
+            return finished
+        with open(checkpoint_path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if 'ori_metric' in record:
+                    if self.ori_metric is None:
+                        self.ori_metric = record['ori_metric']
+                else:
+                    finished.setdefault(record['layer'], {})[record['sparsity']] = record['metric']
+        logger.info('Loaded %d results from %s', sum(len(v) for v in finished.values()), checkpoint_path)
+        return finished
+
+    def _write_checkpoint(self, checkpoint_path, record):
+        if checkpoint_path is None:
+            return
+        with open(checkpoint_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
 
     def export(self, filepath):
         """
@@ -4,7 +4,7 @@
 import csv
 import logging
 
-from nni._graph_utils import TorchModuleGraph
+from nni._graph_utils import build_module_graph
 
 __all__ = ['ChannelDependency', 'GroupDependency', 'CatPaddingDependency']
 
@@ -24,7 +24,7 @@ class Dependency:
             # user should provide model & dummy_input to trace
             # the model or a already traced model
             assert model is not None and dummy_input is not None
-        self.graph = TorchModuleGraph(model, dummy_input, traced_model)
+        self.graph = build_module_graph(model, dummy_input, traced_model)
         self.dependency = dict()
         self.build_dependency()
 
@@ -1,7 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import copy
 import logging
 
 import torch
@@ -14,6 +13,17 @@ from .mutator import DartsMutator
 logger = logging.getLogger(__name__)
 
 
+def _foreach_add_(tensors, others, alpha=1.):
+    """
+    In-place ``tensors += alpha * others``, fused into one kernel launch when ``torch._foreach_add_`` is available.
+    """
+    if hasattr(torch, "_foreach_add_"):
+        torch._foreach_add_(tensors, others, alpha=alpha)
+    else:
+        for t, o in zip(tensors, others):
+            t.add_(o, alpha=alpha)
+
+
 class DartsTrainer(Trainer):
     """
     DARTS trainer.
@@ -50,11 +60,14 @@ class DartsTrainer(Trainer):
         Learning rate of architecture parameters.
     unrolled : float
         ``True`` if using second order optimization, else first order optimization.
+    hessian_frequency : int
+        Only used when ``unrolled`` is ``True``. Compute the finite-difference hessian-vector product every
+        ``hessian_frequency`` steps, and reuse the last one in between. ``1`` computes it on every step.
     """
     def __init__(self, model, loss, metrics,
                  optimizer, num_epochs, dataset_train, dataset_valid,
                  mutator=None, batch_size=64, workers=4, device=None, log_frequency=None,
-                 callbacks=None, arc_learning_rate=3.0E-4, unrolled=False):
+                 callbacks=None, arc_learning_rate=3.0E-4, unrolled=False, hessian_frequency=1):
         super().__init__(model, mutator if mutator is not None else DartsMutator(model),
                          loss, metrics, optimizer, num_epochs, dataset_train, dataset_valid,
                          batch_size, workers, device, log_frequency, callbacks)
@@ -62,6 +75,13 @@ class DartsTrainer(Trainer):
         self.ctrl_optim = torch.optim.Adam(self.mutator.parameters(), arc_learning_rate, betas=(0.5, 0.999),
                                            weight_decay=1.0E-3)
         self.unrolled = unrolled
+        assert hessian_frequency >= 1, "Hessian frequency must be a positive integer."
+        self.hessian_frequency = hessian_frequency
+        self._unrolled_steps = 0
+        self._hessian = None
+        # flat buffer holding a snapshot of model weights, allocated once and reused across steps
+        self._weight_buffer = None
+        self._weight_views = None
 
         n_train = len(self.dataset_train)
         split = n_train // 2
@@ -104,7 +124,7 @@ class DartsTrainer(Trainer):
             self.optimizer.step()
 
             metrics = self.metrics(logits, trn_y)
-            metrics["loss"] = loss.item()
+            metrics["loss"] = loss.detach()
             meters.update(metrics)
             if self.log_frequency is not None and step % self.log_frequency == 0:
                 logger.info("Epoch [%s/%s] Step [%s/%s]  %s", epoch + 1,
@@ -143,7 +163,7 @@ class DartsTrainer(Trainer):
         """
         Compute unrolled loss and backward its gradients
         """
-        backup_params = copy.deepcopy(tuple(self.model.parameters()))
+        self._snapshot_weights()
 
         # do virtual step on training data
         lr = self.optimizer.param_groups[0]["lr"]
@@ -159,33 +179,57 @@ class DartsTrainer(Trainer):
         d_model, d_ctrl = w_grads[:len(w_model)], w_grads[len(w_model):]
 
         # compute hessian and final gradients
-        hessian = self._compute_hessian(backup_params, d_model, trn_X, trn_y)
+        if self._hessian is None or self._unrolled_steps % self.hessian_frequency == 0:
+            self._hessian = self._compute_hessian(d_model, trn_X, trn_y)
+        self._unrolled_steps += 1
         with torch.no_grad():
-            for param, d, h in zip(w_ctrl, d_ctrl, hessian):
+            for param, d, h in zip(w_ctrl, d_ctrl, self._hessian):
                 # gradient = dalpha - lr * hessian
                 param.grad = d - lr * h
 
         # restore weights
-        self._restore_weights(backup_params)
+        self._restore_weights()
 
     def _compute_virtual_model(self, X, y, lr, momentum, weight_decay):
         """
-        Compute unrolled weights w`
+        Compute unrolled weights w` in place
         """
         # don't need zero_grad, using autograd to calculate gradients
         _, loss = self._logits_and_loss(X, y)
-        gradients = torch.autograd.grad(loss, self.model.parameters())
+        params = tuple(self.model.parameters())
+        gradients = list(torch.autograd.grad(loss, params))
+        with torch.no_grad():
+            # gradients are fresh tensors, so they can be used as buffers of the update
+            if weight_decay:
+                _foreach_add_(gradients, params, alpha=weight_decay)
+            if momentum:
+                buffered = [(g, self.optimizer.state[w]["momentum_buffer"]) for w, g in zip(params, gradients)
+                            if "momentum_buffer" in self.optimizer.state[w]]
+                if buffered:
+                    _foreach_add_([g for g, _ in buffered], [m for _, m in buffered], alpha=momentum)
+            # w` = w - lr * (momentum * m + g + weight_decay * w)
+            _foreach_add_(params, gradients, alpha=-lr)
+
+    def _snapshot_weights(self):
+        params = tuple(self.model.parameters())
+        numel = sum(p.numel() for p in params)
+        if self._weight_buffer is None or self._weight_buffer.numel() != numel or \
+                self._weight_buffer.device != params[0].device:
+            self._weight_buffer = torch.empty(numel, dtype=params[0].dtype, device=params[0].device)
+            self._weight_views, offset = [], 0
+            for p in params:
+                self._weight_views.append(self._weight_buffer.narrow(0, offset, p.numel()).view_as(p))
+                offset += p.numel()
         with torch.no_grad():
-            for w, g in zip(self.model.parameters(), gradients):
-                m = self.optimizer.state[w].get("momentum_buffer", 0.)
-                w = w - lr * (momentum * m + g + weight_decay * w)
+            for view, p in zip(self._weight_views, params):
+                view.copy_(p)
 
-    def _restore_weights(self, backup_params):
+    def _restore_weights(self):
         with torch.no_grad():
-            for param, backup in zip(self.model.parameters(), backup_params):
+            for param, backup in zip(self.model.parameters(), self._weight_views):
                 param.copy_(backup)
 
-    def _compute_hessian(self, backup_params, dw, trn_X, trn_y):
+    def _compute_hessian(self, dw, trn_X, trn_y):
         """
             dw = dw` { L_val(w`, alpha) }
             w+ = w + eps * dw
@@ -193,22 +237,22 @@ class DartsTrainer(Trainer):
             hessian = (dalpha { L_trn(w+, alpha) } - dalpha { L_trn(w-, alpha) }) / (2*eps)
             eps = 0.01 / ||dw||
         """
-        self._restore_weights(backup_params)
-        norm = torch.cat([w.view(-1) for w in dw]).norm()
-        eps = 0.01 / norm
+        self._restore_weights()
+        norm = torch.stack([w.norm() for w in dw]).norm().item()
         if norm < 1E-8:
-            logger.warning("In computing hessian, norm is smaller than 1E-8, cause eps to be %.6f.", norm.item())
+            logger.warning("In computing hessian, norm is smaller than 1E-8, cause eps to be %.6f.", norm)
+        eps = 0.01 / max(norm, 1E-8)
 
+        params = tuple(self.model.parameters())
         dalphas = []
         for e in [eps, -2. * eps]:
             # w+ = w + eps*dw`, w- = w - eps*dw`
             with torch.no_grad():
-                for p, d in zip(self.model.parameters(), dw):
-                    p += e * d
+                _foreach_add_(params, dw, alpha=e)
 
             _, loss = self._logits_and_loss(trn_X, trn_y)
             dalphas.append(torch.autograd.grad(loss, self.mutator.parameters()))
 
         dalpha_pos, dalpha_neg = dalphas  # dalpha { L_trn(w+) }, # dalpha { L_trn(w-) }
-        hessian = [(p - n) / 2. * eps for p, n in zip(dalpha_pos, dalpha_neg)]
+        hessian = [(p - n) / (2. * eps) for p, n in zip(dalpha_pos, dalpha_neg)]
         return hessian
@@ -140,7 +140,7 @@ class EnasTrainer(Trainer):
             loss.backward()
             nn.utils.clip_grad_norm_(self.model.parameters(), 5.)
             self.optimizer.step()
-            metrics["loss"] = loss.item()
+            metrics["loss"] = loss.detach()
             meters.update(metrics)
 
             if self.log_frequency is not None and step % self.log_frequency == 0:
@@ -164,19 +164,19 @@ class EnasTrainer(Trainer):
                 metrics = self.metrics(logits, y)
                 reward = self.reward_function(logits, y)
                 if self.entropy_weight:
-                    reward += self.entropy_weight * self.mutator.sample_entropy.item()
+                    reward = reward + self.entropy_weight * self.mutator.sample_entropy.detach()
                 self.baseline = self.baseline * self.baseline_decay + reward * (1 - self.baseline_decay)
                 loss = self.mutator.sample_log_prob * (reward - self.baseline)
                 if self.skip_weight:
                     loss += self.skip_weight * self.mutator.sample_skip_penalty
                 metrics["reward"] = reward
-                metrics["loss"] = loss.item()
-                metrics["ent"] = self.mutator.sample_entropy.item()
-                metrics["log_prob"] = self.mutator.sample_log_prob.item()
+                metrics["loss"] = loss.detach()
+                metrics["ent"] = self.mutator.sample_entropy.detach()
+                metrics["log_prob"] = self.mutator.sample_log_prob.detach()
                 metrics["baseline"] = self.baseline
                 metrics["skip"] = self.mutator.sample_skip_penalty
 
-                loss /= self.mutator_steps_aggregate
+                loss = loss / self.mutator_steps_aggregate
                 loss.backward()
                 meters.update(metrics)
 
@@ -201,7 +201,7 @@ class EnasTrainer(Trainer):
                         logits, _ = logits
                     metrics = self.metrics(logits, y)
                     loss = self.loss(logits, y)
-                    metrics["loss"] = loss.item()
+                    metrics["loss"] = loss.detach()
                     meters.update(metrics)
 
                 logger.info("Test Epoch [%d/%d] Arc [%d/%d] Summary  %s",
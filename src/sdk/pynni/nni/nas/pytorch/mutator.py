@@ -20,6 +20,8 @@ class Mutator(BaseMutator):
         super().__init__(model)
         self._cache = dict()
         self._connect_all = False
+        self._batched_cache = None
+        self._dispatch_cache = dict()
 
     def sample_search(self):
         """
@@ -50,6 +52,7 @@ class Mutator(BaseMutator):
         variable so that `on_forward_layer_choice` and `on_forward_input_choice` can use the decision directly.
         """
         self._cache = self.sample_search()
+        self._dispatch_cache = dict()
 
     def export(self):
         """
@@ -90,6 +93,46 @@ class Mutator(BaseMutator):
             data[k] = v
         return data
 
+    def forward_batched(self, decisions, *inputs):
+        """
+        Evaluate multiple architectures with a single forward pass of the supernet.
+
+        Inputs are repeated along the batch dimension so that every architecture owns a slice of the batch.
+        In every ``LayerChoice``, each candidate op runs only once, on the concatenated slices of the
+        architectures that select it. This is useful to rank a large number of candidates with a shared
+        validation batch.
+
+        Parameters
+        ----------
+        decisions : list of dict
+            Decisions of architectures to evaluate, each in the format returned by ``sample_search``.
+        inputs : tuple of tensor
+            Inputs that will be feeded into the network. Every architecture is evaluated on all of them.
+
+        Returns
+        -------
+        list
+            Model outputs, one for each architecture, in the same order as ``decisions``.
+
+        Notes
+        -----
+        The model should be in eval mode, as batch norm statistics would otherwise be computed across
+        architectures. Masks returned by mutables are the union of the masks of all architectures, so the model
+        should not depend on them to build its graph. Architectures that select no inputs in an ``InputChoice``
+        get zeros in their slice if other architectures select some. Mutables called within a candidate op of a
+        ``LayerChoice`` only see the slices of the architectures that select that op.
+        """
+        if not decisions:
+            return []
+        n_archs = len(decisions)
+        inputs = tuple(torch.cat([t] * n_archs) if torch.is_tensor(t) else t for t in inputs)
+        try:
+            self._batched_cache = list(decisions)
+            out = self.model(*inputs)
+        finally:
+            self._batched_cache = None
+        return self._split_batched_output(out, n_archs)
+
     def graph(self, inputs):
         """
         Return model supernet graph.
@@ -159,19 +202,19 @@ class Mutator(BaseMutator):
         tuple of torch.Tensor and torch.Tensor
             Output and mask.
         """
+        if self._batched_cache is not None:
+            return self._batched_layer_choice(mutable, *args, **kwargs)
         if self._connect_all:
             return self._all_connect_tensor_reduction(mutable.reduction,
                                                       [op(*args, **kwargs) for op in mutable]), \
                 torch.ones(len(mutable))
 
-        def _map_fn(op, args, kwargs):
-            return op(*args, **kwargs)
-
         mask = self._get_decision(mutable)
         assert len(mask) == len(mutable), \
             "Invalid mask, expected {} to be of length {}.".format(mask, len(mutable))
-        out, mask = self._select_with_mask(_map_fn, [(choice, args, kwargs) for choice in mutable], mask)
-        return self._tensor_reduction(mutable.reduction, out), mask
+        indices, weights, mask = self._get_dispatch(mutable.key, mask)
+        out = [mutable._modules[mutable.names[i]](*args, **kwargs) for i in indices]
+        return self._tensor_reduction(mutable.reduction, out, weights), mask
 
     def on_forward_input_choice(self, mutable, tensor_list):
         """
@@ -190,14 +233,78 @@ class Mutator(BaseMutator):
         tuple of torch.Tensor and torch.Tensor
             Output and mask.
         """
+        if self._batched_cache is not None:
+            return self._batched_input_choice(mutable, tensor_list)
         if self._connect_all:
             return self._all_connect_tensor_reduction(mutable.reduction, tensor_list), \
                 torch.ones(mutable.n_candidates)
         mask = self._get_decision(mutable)
         assert len(mask) == mutable.n_candidates, \
             "Invalid mask, expected {} to be of length {}.".format(mask, mutable.n_candidates)
-        out, mask = self._select_with_mask(lambda x: x, [(t,) for t in tensor_list], mask)
-        return self._tensor_reduction(mutable.reduction, out), mask
+        indices, weights, mask = self._get_dispatch(mutable.key, mask)
+        out = [tensor_list[i] for i in indices]
+        return self._tensor_reduction(mutable.reduction, out, weights), mask
+
+    def _get_dispatch(self, key, mask):
+        """
+        Resolve the decision of a mutable into indices of selected candidates and their weights.
+        The result is cached until next ``reset()``, as long as the contents of the decision stay the same.
+        Decisions updated in place are detected, by the contents of lists and arrays, and by the version
+        counter of tensors.
+
+        Parameters
+        ----------
+        key : str
+            Key of the mutable.
+        mask : list-like object
+            Decision of the mutable. See :meth:`_select_with_mask`.
+
+        Returns
+        -------
+        tuple of list of int, torch.Tensor and torch.Tensor
+            Indices of selected candidates, weights of them (``None`` if mask is boolean) and mask as a tensor.
+        """
+        signature = self._mask_signature(mask)
+        cached = self._dispatch_cache.get(key)
+        if cached is None or cached[0] != signature:
+            # the decision is kept in the cache, so that the id in its signature is not reused
+            cached = (signature, mask) + self._compile_mask(mask)
+            self._dispatch_cache[key] = cached
+        _, _, indices, index, mask = cached
+        if not mask.dtype.is_floating_point:
+            return indices, None, mask
+        # weights are gathered on every call, so that they are always connected to the current graph of mask
+        return indices, mask if index is None else mask[index], mask
+
+    def _mask_signature(self, mask):
+        if torch.is_tensor(mask):
+            # the version counter is bumped by every in-place operation on the tensor
+            return id(mask), mask._version
+        if isinstance(mask, np.ndarray):
+            return mask.dtype.str, mask.tobytes()
+        return tuple(mask)
+
+    def _compile_mask(self, mask):
+        if (isinstance(mask, list) and len(mask) >= 1 and isinstance(mask[0], (bool, np.bool_))) or \
+                (isinstance(mask, np.ndarray) and mask.dtype == np.bool_) or \
+                (torch.is_tensor(mask) and mask.dtype == torch.bool):
+            weighted = False
+        elif (isinstance(mask, list) and len(mask) >= 1 and isinstance(mask[0], (float, int))) or \
+                (isinstance(mask, np.ndarray) and mask.dtype in (np.float32, np.float64, np.int32, np.int64)) or \
+                (torch.is_tensor(mask) and mask.is_floating_point()):
+            weighted = True
+        else:
+            raise ValueError("Unrecognized mask '%s'" % mask)
+        if not torch.is_tensor(mask):
+            mask = torch.tensor(mask)  # pylint: disable=not-callable
+        if weighted and not mask.is_floating_point():
+            mask = mask.float()
+        # the only synchronization needed to find out selected candidates
+        indices = [i for i, m in enumerate(mask.detach().cpu().tolist()) if m]
+        index = None
+        if weighted and len(indices) < len(mask):
+            index = torch.tensor(indices, dtype=torch.long, device=mask.device)  # pylint: disable=not-callable
+        return indices, index, mask
 
     def _select_with_mask(self, map_fn, candidates, mask):
         """
@@ -218,32 +325,40 @@ class Mutator(BaseMutator):
         tuple of list of torch.Tensor and torch.Tensor
             Output and mask.
         """
-        if (isinstance(mask, list) and len(mask) >= 1 and isinstance(mask[0], bool)) or \
-                (isinstance(mask, np.ndarray) and mask.dtype == np.bool) or \
-                "BoolTensor" in mask.type():
-            out = [map_fn(*cand) for cand, m in zip(candidates, mask) if m]
-        elif (isinstance(mask, list) and len(mask) >= 1 and isinstance(mask[0], (float, int))) or \
-                (isinstance(mask, np.ndarray) and mask.dtype in (np.float32, np.float64, np.int32, np.int64)) or \
-                "FloatTensor" in mask.type():
-            out = [map_fn(*cand) * m for cand, m in zip(candidates, mask) if m]
-        else:
-            raise ValueError("Unrecognized mask '%s'" % mask)
-        if not torch.is_tensor(mask):
-            mask = torch.tensor(mask)  # pylint: disable=not-callable
+        indices, index, mask = self._compile_mask(mask)
+        out = [map_fn(*candidates[i]) for i in indices]
+        if mask.is_floating_point():
+            out = [t * w for t, w in zip(out, mask if index is None else mask[index])]
         return out, mask
 
-    def _tensor_reduction(self, reduction_type, tensor_list):
+    def _tensor_reduction(self, reduction_type, tensor_list, weights=None):
         if reduction_type == "none":
-            return tensor_list
+            if weights is None:
+                return tensor_list
+            return [t * w for t, w in zip(tensor_list, weights)]
         if not tensor_list:
             return None  # empty. return None for now
-        if len(tensor_list) == 1:
-            return tensor_list[0]
-        if reduction_type == "sum":
-            return sum(tensor_list)
-        if reduction_type == "mean":
-            return sum(tensor_list) / len(tensor_list)
+        if reduction_type in ("sum", "mean"):
+            if len(tensor_list) == 1:
+                out = tensor_list[0] if weights is None else tensor_list[0] * weights[0]
+            elif any(t.size() != tensor_list[0].size() for t in tensor_list):
+                # rely on broadcasting
+                if weights is not None:
+                    tensor_list = [t * w for t, w in zip(tensor_list, weights)]
+                out = sum(tensor_list)
+            else:
+                stacked = torch.stack(tensor_list)
+                if weights is None:
+                    out = stacked.sum(0)
+                else:
+                    weights = weights.to(dtype=stacked.dtype, device=stacked.device)
+                    out = (stacked * weights.view(-1, *([1] * (stacked.dim() - 1)))).sum(0)
+            return out / len(tensor_list) if reduction_type == "mean" else out
         if reduction_type == "concat":
+            if weights is not None:
+                tensor_list = [t * w for t, w in zip(tensor_list, weights)]
+            if len(tensor_list) == 1:
+                return tensor_list[0]
             return torch.cat(tensor_list, dim=1)
         raise ValueError("Unrecognized reduction policy: \"{}\"".format(reduction_type))
 
@@ -254,6 +369,90 @@ class Mutator(BaseMutator):
             return torch.cat(tensor_list, dim=1)
         return torch.stack(tensor_list).sum(0)
 
+    def _batched_layer_choice(self, mutable, *args, **kwargs):
+        masks = self._get_batched_decisions(mutable, len(mutable))
+        n_archs = len(masks)
+        tensors = [t for t in list(args) + list(kwargs.values()) if torch.is_tensor(t)]
+        assert tensors, "Batched forward of \"{}\" requires at least one tensor input.".format(mutable.key)
+        slice_size = self._batched_slice_size(tensors[0], n_archs)
+        device = tensors[0].device
+
+        def _gather(t, index):
+            return t.index_select(0, index) if torch.is_tensor(t) else t
+
+        outputs = [[] for _ in range(n_archs)]
+        for i, op in enumerate(mutable):
+            archs = [k for k in range(n_archs) if masks[k][i]]
+            if not archs:
+                continue
+            if len(archs) == n_archs:
+                out = op(*args, **kwargs)
+            else:
+                index = torch.cat([torch.arange(k * slice_size, (k + 1) * slice_size) for k in archs]).to(device)
+                # mutables nested in the op only see the architectures that select it
+                batched_cache = self._batched_cache
+                self._batched_cache = [batched_cache[k] for k in archs]
+                try:
+                    out = op(*[_gather(t, index) for t in args], **{k: _gather(t, index) for k, t in kwargs.items()})
+                finally:
+                    self._batched_cache = batched_cache
+            for k, chunk in zip(archs, out.split(slice_size)):
+                outputs[k].append(chunk if masks[k].dtype == torch.bool else chunk * masks[k][i].item())
+        return self._batched_tensor_reduction(mutable.reduction, outputs), self._batched_mask_union(masks)
+
+    def _batched_input_choice(self, mutable, tensor_list):
+        masks = self._get_batched_decisions(mutable, mutable.n_candidates)
+        n_archs = len(masks)
+        tensors = [t for t in tensor_list if torch.is_tensor(t)]
+        assert tensors, "Batched forward of \"{}\" requires at least one tensor input.".format(mutable.key)
+        slice_size = self._batched_slice_size(tensors[0], n_archs)
+        outputs = []
+        for k, mask in enumerate(masks):
+            chosen = [t.narrow(0, k * slice_size, slice_size) for t, m in zip(tensor_list, mask) if m]
+            if mask.dtype != torch.bool:
+                chosen = [t * m.item() for t, m in zip(chosen, mask[mask != 0])]
+            outputs.append(chosen)
+        return self._batched_tensor_reduction(mutable.reduction, outputs), self._batched_mask_union(masks)
+
+    def _get_batched_decisions(self, mutable, length):
+        masks = []
+        for decision in self._batched_cache:
+            if mutable.key not in decision:
+                raise ValueError("\"{}\" not found in batched decisions.".format(mutable.key))
+            mask = torch.as_tensor(to_list(decision[mutable.key]))
+            assert len(mask) == length, \
+                "Invalid mask, expected {} to be of length {}.".format(mask, length)
+            masks.append(mask)
+        return masks
+
+    def _batched_slice_size(self, tensor, n_archs):
+        if tensor.size(0) % n_archs != 0:
+            raise ValueError("Batch size {} is not divisible by number of architectures {}."
+                             .format(tensor.size(0), n_archs))
+        return tensor.size(0) // n_archs
+
+    def _batched_tensor_reduction(self, reduction_type, outputs):
+        if reduction_type == "none":
+            raise ValueError("Reduction policy \"none\" is not supported in batched forward.")
+        reduced = [self._tensor_reduction(reduction_type, out) for out in outputs]
+        template = next((t for t in reduced if t is not None), None)
+        if template is None:
+            return None
+        return torch.cat([torch.zeros_like(template) if t is None else t for t in reduced])
+
+    def _batched_mask_union(self, masks):
+        masks = torch.stack(masks)
+        if masks.dtype == torch.bool:
+            return masks.any(0)
+        return masks.max(0)[0]
+
+    def _split_batched_output(self, out, n_archs):
+        if torch.is_tensor(out):
+            return list(out.split(self._batched_slice_size(out, n_archs)))
+        if isinstance(out, (tuple, list)):
+            return [type(out)(t) for t in zip(*[self._split_batched_output(t, n_archs) for t in out])]
+        raise ValueError("Unsupported output type '%s' in batched forward." % type(out))
+
     def _get_decision(self, mutable):
         """
         By default, this method checks whether `mutable.key` is already in the decision cache,
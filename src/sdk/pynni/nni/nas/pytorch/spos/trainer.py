@@ -71,7 +71,7 @@ class SPOSSupernetTrainer(Trainer):
             self.optimizer.step()
 
             metrics = self.metrics(logits, y)
-            metrics["loss"] = loss.item()
+            metrics["loss"] = loss.detach()
             meters.update(metrics)
             if self.log_frequency is not None and step % self.log_frequency == 0:
                 logger.info("Epoch [%s/%s] Step [%s/%s]  %s", epoch + 1,
@@ -86,7 +86,7 @@ class SPOSSupernetTrainer(Trainer):
                 logits = self.model(x)
                 loss = self.loss(logits, y)
                 metrics = self.metrics(logits, y)
-                metrics["loss"] = loss.item()
+                metrics["loss"] = loss.detach()
                 meters.update(metrics)
                 if self.log_frequency is not None and step % self.log_frequency == 0:
                     logger.info("Epoch [%s/%s] Validation Step [%s/%s]  %s", epoch + 1,
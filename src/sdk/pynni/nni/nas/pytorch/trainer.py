@@ -10,6 +10,7 @@ from abc import abstractmethod
 import torch
 
 from .base_trainer import BaseTrainer
+from .utils import StatusRecorder
 
 _logger = logging.getLogger(__name__)
 
@@ -40,7 +41,9 @@ class Trainer(BaseTrainer):
         Called with logits and targets. Returns a loss tensor.
         See `PyTorch loss functions`_ for examples.
     metrics : callable
-        Called with logits and targets. Returns a dict that maps metrics keys to metrics data. For example,
+        Called with logits and targets. Returns a dict that maps metrics keys to metrics data. Metrics data can be
+        python numbers or scalar tensors; tensors are only synchronized to host when metrics are logged, so
+        returning tensors avoids a device synchronization on every step. For example,
 
         .. code-block:: python
 
@@ -94,7 +97,7 @@ class Trainer(BaseTrainer):
         self.log_frequency = log_frequency
         self.log_dir = os.path.join("logs", str(time.time()))
         os.makedirs(self.log_dir, exist_ok=True)
-        self.status_writer = open(os.path.join(self.log_dir, "log"), "w")
+        self.status_recorder = None
         self.callbacks = callbacks if callbacks is not None else []
         for callback in self.callbacks:
             callback.build(self.model, self.mutator, self)
@@ -149,6 +152,9 @@ class Trainer(BaseTrainer):
             for callback in self.callbacks:
                 callback.on_epoch_end(epoch)
 
+            if self.status_recorder is not None:
+                self.status_recorder.flush()
+
     def validate(self):
         """
         Do one validation.
@@ -174,9 +180,16 @@ class Trainer(BaseTrainer):
         """
         raise NotImplementedError("Not implemented yet")
 
-    def enable_visualization(self):
+    def enable_visualization(self, status_interval=1, status_buffer_size=64):
         """
         Enable visualization. Write graph and training log to folder ``logs/<timestamp>``.
+
+        Parameters
+        ----------
+        status_interval : int
+            Record the architecture status once every ``status_interval`` calls of ``_write_graph_status``.
+        status_buffer_size : int
+            Number of status records buffered in memory before they are written to the log in background.
         """
         sample = None
         for x, _ in self.train_loader:
@@ -187,8 +200,12 @@ class Trainer(BaseTrainer):
         _logger.info("Creating graph json, writing to %s. Visualization enabled.", self.log_dir)
         with open(os.path.join(self.log_dir, "graph.json"), "w") as f:
             json.dump(self.mutator.graph(sample), f)
+        if self.status_recorder is not None:
+            self.status_recorder.close()
+        self.status_recorder = StatusRecorder(os.path.join(self.log_dir, "log"),
+                                              interval=status_interval, buffer_size=status_buffer_size)
         self.visualization_enabled = True
 
     def _write_graph_status(self):
-        if hasattr(self, "visualization_enabled") and self.visualization_enabled:
-            print(json.dumps(self.mutator.status()), file=self.status_writer, flush=True)
+        if self.status_recorder is not None:
+            self.status_recorder.record(self.mutator)
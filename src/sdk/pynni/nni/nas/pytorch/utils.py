@@ -1,7 +1,11 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import json
 import logging
+import queue
+import threading
+import weakref
 from collections import OrderedDict
 
 import numpy as np
@@ -59,6 +63,9 @@ def to_list(arr):
 class AverageMeterGroup:
     """
     Average meter group for multiple average meters.
+
+    Metrics can be python numbers or scalar tensors. Tensors are accumulated on their device,
+    and are only synchronized when the values of the meters are read (e.g., when the group is printed).
     """
 
     def __init__(self):
@@ -74,6 +81,13 @@ class AverageMeterGroup:
                 self.meters[k] = AverageMeter(k, ":4f")
             self.meters[k].update(v)
 
+    def sync(self):
+        """
+        Synchronize the pending tensor metrics of all meters.
+        """
+        for meter in self.meters.values():
+            meter.sync()
+
     def __getattr__(self, item):
         return self.meters[item]
 
@@ -94,6 +108,9 @@ class AverageMeter:
     """
     Computes and stores the average and current value.
 
+    Values given as tensors are summed on their device without synchronization.
+    They are converted to python numbers when ``val``, ``avg`` or ``sum`` is read, or ``sync`` is called.
+
     Parameters
     ----------
     name : str
@@ -111,9 +128,10 @@ class AverageMeter:
         """
         Reset the meter.
         """
-        self.val = 0
-        self.avg = 0
-        self.sum = 0
+        self._val = 0
+        self._sum = 0
+        self._pending_val = None
+        self._pending_sum = None
         self.count = 0
 
     def update(self, val, n=1):
@@ -122,23 +140,140 @@ class AverageMeter:
 
         Parameters
         ----------
-        val : float or int
-            The new value to be accounted in.
+        val : float or int or torch.Tensor
+            The new value to be accounted in. Tensors must contain exactly one element.
         n : int
             The weight of the new value.
         """
-        self.val = val
-        self.sum += val * n
+        if torch.is_tensor(val):
+            val = val.detach()
+            self._pending_val = val
+            self._pending_sum = val * n if self._pending_sum is None else self._pending_sum + val * n
+        else:
+            self._val = val
+            self._pending_val = None
+            self._sum += val * n
         self.count += n
-        self.avg = self.sum / self.count
+
+    def sync(self):
+        """
+        Move the pending tensor values to host.
+        """
+        if self._pending_sum is not None:
+            self._sum += self._pending_sum.item()
+            self._pending_sum = None
+        if self._pending_val is not None:
+            self._val = self._pending_val.item()
+            self._pending_val = None
+
+    @property
+    def val(self):
+        self.sync()
+        return self._val
+
+    @property
+    def sum(self):
+        self.sync()
+        return self._sum
+
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count else 0
 
     def __str__(self):
         fmtstr = '{name} {val' + self.fmt + '} ({avg' + self.fmt + '})'
-        return fmtstr.format(**self.__dict__)
+        return fmtstr.format(name=self.name, val=self.val, avg=self.avg)
 
     def summary(self):
         fmtstr = '{name}: {avg' + self.fmt + '}'
-        return fmtstr.format(**self.__dict__)
+        return fmtstr.format(name=self.name, avg=self.avg)
+
+
+class StatusRecorder:
+    """
+    Records the architecture status of a mutator into an append-only file of JSON lines.
+
+    Only one of every ``interval`` calls to :meth:`record` takes a snapshot. Snapshots are buffered in memory
+    and handed over in batches to a background thread, which serializes and appends them to the file,
+    so that the training loop never waits for disk.
+
+    Parameters
+    ----------
+    path : str
+        Path of the status log file. It will be truncated.
+    interval : int
+        Take a snapshot every ``interval`` calls.
+    buffer_size : int
+        Number of snapshots buffered before they are written.
+    """
+
+    def __init__(self, path, interval=1, buffer_size=64):
+        assert interval >= 1 and buffer_size >= 1
+        self.path = path
+        self.interval = interval
+        self.buffer_size = buffer_size
+        self._counter = 0
+        self._buffer = []
+        self._queue = queue.Queue()
+        self._file = open(path, "w")
+        # the thread and the finalizer don't reference the recorder, so that it can be collected without ``close``
+        self._thread = threading.Thread(target=_write_status_loop, args=(self._queue, self._file, path), daemon=True)
+        self._thread.start()
+        # also runs at interpreter exit if the recorder is still alive
+        self._finalizer = weakref.finalize(self, _close_status_writer, self._buffer, self._queue, self._thread, self._file)
+
+    def record(self, mutator):
+        """
+        Count a call and take a snapshot of ``mutator.status()`` if it falls on the interval.
+
+        Parameters
+        ----------
+        mutator : Mutator
+            Mutator whose status is recorded.
+        """
+        self._counter += 1
+        if (self._counter - 1) % self.interval != 0:
+            return
+        self._buffer.append(mutator.status())
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Hand over the buffered snapshots to the writer thread.
+        """
+        _flush_status_buffer(self._buffer, self._queue)
+
+    def close(self):
+        """
+        Write all pending snapshots and close the file. Calling it more than once is harmless.
+        """
+        self._finalizer()
+
+
+def _flush_status_buffer(buffer, status_queue):
+    if buffer:
+        status_queue.put(list(buffer))
+        buffer.clear()
+
+
+def _close_status_writer(buffer, status_queue, thread, file):
+    _flush_status_buffer(buffer, status_queue)
+    status_queue.put(None)
+    thread.join()
+    file.close()
+
+
+def _write_status_loop(status_queue, file, path):
+    while True:
+        batch = status_queue.get()
+        if batch is None:
+            break
+        try:
+            file.write("".join(json.dumps(status, separators=(",", ":")) + "\n" for status in batch))
+            file.flush()
+        except (OSError, TypeError, ValueError):
+            _logger.exception("Failed to write architecture status to %s.", path)
 
 
 class StructuredMutableTreeNode:
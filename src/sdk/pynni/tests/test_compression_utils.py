@@ -1,7 +1,9 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import json
 import os
+import tempfile
 import unittest
 from unittest import TestCase, main
 import torch
@@ -12,6 +14,8 @@ import numpy as np
 from nni.compression.torch import L1FilterPruner
 from nni.compression.torch.utils.shape_dependency import ChannelDependency
 from nni.compression.torch.utils.mask_conflict import fix_mask_conflict
+from nni.compression.torch.utils.cost_estimator import CostEstimator
+from nni.compression.torch.utils.sensitivity_analysis import CachedDataLoader, SensitivityAnalysis
 
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 prefix = 'analysis_test'
@@ -136,6 +140,112 @@ class AnalysisUtilsTest(TestCase):
                             fixed_mask[lset[i]]['bias'])
                         assert b_index1 == b_index2
 
+    def test_cost_estimator(self):
+        class Model(nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.conv1 = nn.Conv2d(3, 8, 3)
+                self.bn = nn.BatchNorm2d(8)
+                self.conv2 = nn.Conv2d(8, 8, 3)
+                self.fc = nn.Linear(8 * 12 * 12, 4)
+
+            def forward(self, x):
+                x = torch.relu(self.bn(self.conv1(x)))
+                return self.fc(torch.flatten(self.conv2(x), 1))
+
+        net = Model()
+        estimator = CostEstimator(net, torch.ones(1, 3, 16, 16))
+        cost = estimator.estimate()
+        assert cost['params'] == sum(p.numel() for p in net.parameters())
+        assert cost['flops'] == 8 * 14 * 14 * 28 + 2 * 8 * 14 * 14 + 8 * 12 * 12 * 73 + 4 * 1153
+
+        # half of the filters of conv1 are pruned, the input channels of bn and conv2 are pruned too
+        weight_mask = torch.ones(8, 3, 3, 3)
+        weight_mask[:4] = 0
+        cost = estimator.estimate({'conv1': {'weight': weight_mask}}, per_layer=True)
+        assert cost['layers']['conv1']['params'] == 4 * 28
+        assert cost['layers']['bn']['params'] == 2 * 4
+        assert cost['layers']['conv2']['params'] == 8 * 37
+        assert cost['layers']['fc']['params'] == 4 * 1153
+
+        table = estimator.profile_latency_table(ratios=[0.5, 1.0], warmup=1, repeat=1)
+        assert set(table.keys()) == {'conv1', 'bn', 'conv2', 'fc'}
+        assert estimator.estimate()['latency'] > 0
+
+
+class SensitivityModel(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.conv1 = nn.Conv2d(3, 8, 3)
+        self.conv2 = nn.Conv2d(8, 8, 3)
+        self.conv3 = nn.Conv2d(8, 4, 3)
+
+    def forward(self, x):
+        return self.conv3(torch.relu(self.conv2(torch.relu(self.conv1(x)))))
+
+
+class SensitivityAnalysisTest(TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = SensitivityModel()
+        self.data = CachedDataLoader(torch.utils.data.DataLoader(torch.randn(32, 3, 8, 8), batch_size=4), 3)
+        self.num_validations = 0
+        self.sparsities = [0.25, 0.5, 0.75]
+        self.checkpoint_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(self.checkpoint_dir.name, 'checkpoint.jsonl')
+
+    def tearDown(self):
+        self.checkpoint_dir.cleanup()
+
+    def val_func(self, data_loader, fail_after=None):
+        if fail_after is not None and self.num_validations >= fail_after:
+            raise KeyboardInterrupt
+        self.num_validations += 1
+        with torch.no_grad():
+            return sum(self.model(x).abs().mean().item() for x in data_loader)
+
+    def analyze(self, n_workers=1, checkpoint_path=None, fail_after=None):
+        analyzer = SensitivityAnalysis(self.model, self.val_func, sparsities=self.sparsities)
+        return analyzer.analysis(val_args=[self.data], val_kwargs={'fail_after': fail_after}, n_workers=n_workers,
+                                 checkpoint_path=checkpoint_path)
+
+    def test_cached_data_loader(self):
+        self.assertEqual(len(self.data), 3)
+        # the same batches in every epoch
+        for x, y in zip(self.data, self.data):
+            self.assertTrue(torch.equal(x, y))
+
+    def test_parallel_analysis(self):
+        state_dict = {k: v.clone() for k, v in self.model.state_dict().items()}
+        serial = self.analyze()
+        for k, v in self.model.state_dict().items():
+            self.assertTrue(torch.equal(v, state_dict[k]))
+        parallel = self.analyze(n_workers=2, checkpoint_path=self.checkpoint_path)
+        self.assertListEqual(list(parallel.keys()), ['conv1', 'conv2', 'conv3'])
+        for name in serial:
+            for sparsity in serial[name]:
+                self.assertAlmostEqual(serial[name][sparsity], parallel[name][sparsity], places=5)
+        for k, v in self.model.state_dict().items():
+            self.assertTrue(torch.equal(v, state_dict[k]))
+        # every validation of the workers is in the checkpoint
+        with open(self.checkpoint_path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 1 + 3 * len(self.sparsities))
+
+    def test_resume_from_checkpoint(self):
+        expected = self.analyze()
+        self.num_validations = 0
+        # interrupted after the original metric and 4 pruned validations
+        with self.assertRaises(KeyboardInterrupt):
+            self.analyze(checkpoint_path=self.checkpoint_path, fail_after=5)
+        self.assertIsInstance(self.model.conv2, nn.Conv2d)
+        self.num_validations = 0
+        resumed = self.analyze(checkpoint_path=self.checkpoint_path)
+        self.assertEqual(self.num_validations, 3 * len(self.sparsities) - 4)
+        for name in expected:
+            for sparsity in expected[name]:
+                self.assertAlmostEqual(expected[name][sparsity], resumed[name][sparsity], places=5)
+
 
 if __name__ == '__main__':
     main()
@@ -312,6 +312,30 @@ class CompressorTestCase(TestCase):
         assert math.isclose(model.relu.module.tracked_min_biased, 0.002, abs_tol=eps)
         assert math.isclose(model.relu.module.tracked_max_biased, 0.00998, abs_tol=eps)
 
+    def test_torch_QAT_quantizer_export_int8(self):
+        model = TorchModel()
+        config_list = [{
+            'quant_types': ['weight'],
+            'quant_bits': 8,
+            'op_types': ['Conv2d', 'Linear']
+        }]
+        quantizer = torch_compressor.QAT_Quantizer(model, config_list)
+        quantizer.compress()
+        x = torch.randn(8, 1, 28, 28)
+        model.eval()
+        with torch.no_grad():
+            out = model(x)
+            int8_model = quantizer.export_int8_model(x)
+            assert isinstance(int8_model.conv1, torch_compressor.Int8Module)
+            assert isinstance(int8_model.fc2, torch_compressor.Int8Module)
+            # batch normalizations are folded into the convolutions
+            assert isinstance(int8_model.bn1, torch.nn.Identity)
+            int8_out = int8_model(x)
+            assert torch.allclose(out.exp(), int8_out.exp(), atol=0.05)
+            # the quantizer is not changed
+            assert isinstance(model.conv1, torch_compressor.compressor.QuantizerModuleWrapper)
+            assert torch.equal(model(x), out)
+
     def test_torch_pruner_validation(self):
         # test bad configuraiton
         pruner_classes = [torch_compressor.__dict__[x] for x in \
@@ -1,10 +1,12 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import gc
 import sys
 import os
 import math
 import uuid
+import weakref
 import shutil
 import numpy as np
 import torch
@@ -15,7 +17,7 @@ from google.protobuf import text_format
 import unittest
 from unittest import TestCase, main
 
-from nni._graph_utils import build_module_graph, build_graph, TorchModuleGraph
+from nni._graph_utils import build_module_graph, build_graph, TorchModuleGraph, invalidate_module_graph
 
 class BackboneModel1(nn.Module):
     def __init__(self):
@@ -74,6 +76,31 @@ class GraphUtilsTestCase(TestCase):
         assert g.find_predecessors('backbone2.bn1') == ['backbone2.conv1']
         assert g.find_predecessors('backbone2.bn2') == ['backbone2.conv2']
 
+    def test_module_graph_cache(self):
+        big_model = BigModel()
+        g = build_module_graph(big_model, torch.randn(2, 1, 28, 28))
+        # same model structure and input signature
+        assert build_module_graph(big_model, torch.randn(2, 1, 28, 28)) is g
+        assert build_module_graph(big_model, torch.randn(4, 1, 28, 28)) is not g
+        assert build_module_graph(BigModel(), torch.randn(2, 1, 28, 28)) is not g
+        big_model.fc3 = nn.Linear(10, 5)
+        g = build_module_graph(big_model, torch.randn(2, 1, 28, 28))
+        invalidate_module_graph(big_model)
+        assert build_module_graph(big_model, torch.randn(2, 1, 28, 28)) is not g
+        # the cached graphs don't keep the model alive
+        model_ref = weakref.ref(big_model)
+        del big_model
+        gc.collect()
+        assert model_ref() is None
+        # the graph of a traced model is cached while it's used
+        traced_model = torch.jit.trace(BigModel(), torch.randn(2, 1, 28, 28))
+        g = build_module_graph(traced_model=traced_model)
+        assert build_module_graph(traced_model=traced_model) is g
+        traced_ref = weakref.ref(traced_model)
+        del traced_model, g
+        gc.collect()
+        assert traced_ref() is None
+
     def _test_graph(self, model, dummy_input, expected_file):
         actual_proto, _ = build_graph(model, dummy_input)
 
@@ -2,6 +2,10 @@
 # Licensed under the MIT license.
 
 import os
+import sys
+import tempfile
+from argparse import Namespace
+from unittest import mock
 import numpy as np
 import torch
 import torchvision.models as models
@@ -11,7 +15,8 @@ from torchvision.models.vgg import vgg16
 from torchvision.models.resnet import resnet18
 from unittest import TestCase, main
 
-from nni.compression.torch import L1FilterPruner, apply_compression_results, ModelSpeedup
+from nni.compression.torch import L1FilterPruner, LevelPruner, apply_compression_results, ModelSpeedup
+from nni.compression.torch.speedup import SparseConv2d, SparseLinear, sparsify_model
 
 torch.manual_seed(0)
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -174,9 +179,135 @@ class SpeedupTestCase(TestCase):
             assert (abs(ori_sum - speeded_sum) / abs(ori_sum) < RELATIVE_THRESHOLD) or \
                    (abs(ori_sum - speeded_sum) < ABSOLUTE_THRESHOLD)
 
+    def test_sparsify_model(self):
+        net = BackboneModel2()
+        pruner = LevelPruner(net, [{'sparsity': 0.96, 'op_types': ['Conv2d', 'Linear']}])
+        pruner.compress()
+        pruner.export_model(MODEL_FILE, MASK_FILE)
+        pruner._unwrap_model()
+        net.eval()
+        data = torch.randn(BATCH_SIZE, 1, 28, 28)
+        ori_out = net(data)
+
+        sparse_model = BackboneModel2()
+        sparse_model.load_state_dict(torch.load(MODEL_FILE))
+        sparse_model.eval()
+        sparsify_model(sparse_model, MASK_FILE)
+        assert isinstance(sparse_model.conv1, SparseConv2d)
+        assert isinstance(sparse_model.fc1, SparseLinear)
+        assert torch.allclose(ori_out, sparse_model(data), atol=ABSOLUTE_THRESHOLD)
+
     def tearDown(self):
         os.remove(MODEL_FILE)
         os.remove(MASK_FILE)
 
+class FakeModuleGraph:
+    """
+    A module graph given by its edges, so that mask propagation can be tested without tracing
+    """
+    def __init__(self, nodes, edges):
+        self.name_to_node = {name: Namespace(name=name, op_type=op_type, type='module', auxiliary=None)
+                             for name, op_type in nodes}
+        self.successors = {name: [] for name, _ in nodes}
+        self.predecessors = {name: [] for name, _ in nodes}
+        for src, dst in edges:
+            self.successors[src].append(dst)
+            self.predecessors[dst].append(src)
+
+    def find_successors(self, module_name):
+        return self.successors[module_name]
+
+    def find_predecessors(self, module_name):
+        return self.predecessors[module_name]
+
+class RecursiveModelSpeedup(ModelSpeedup):
+    """
+    The recursive mask propagation before the worklist rewrite, as the reference
+    """
+    def infer_module_mask(self, module_name, last_module, mask=None, in_shape=None, out_shape=None):
+        input_cmask, output_cmask = self._infer_node_mask(module_name, last_module, mask, in_shape, out_shape)
+        num_visits = 1
+        if input_cmask:
+            for _module_name in self.torch_graph.find_predecessors(module_name):
+                num_visits += self.infer_module_mask(_module_name, module_name, out_shape=input_cmask)
+        if output_cmask:
+            for _module_name in self.torch_graph.find_successors(module_name):
+                num_visits += self.infer_module_mask(_module_name, module_name, in_shape=output_cmask)
+        return num_visits
+
+def conv_mask(out_channels, in_channels, kept):
+    weight = torch.zeros(out_channels, in_channels, 3, 3)
+    bias = torch.zeros(out_channels)
+    weight[kept] = 1
+    bias[kept] = 1
+    return {'weight': weight, 'bias': bias}
+
+def bn_mask(num_features, kept):
+    weight = torch.zeros(num_features)
+    weight[kept] = 1
+    return {'weight': weight, 'bias': weight.clone()}
+
+class MaskPropagationTestCase(TestCase):
+    def setUp(self):
+        self.mask_file = tempfile.NamedTemporaryFile(suffix='.pth', delete=False).name
+
+    def tearDown(self):
+        os.remove(self.mask_file)
+
+    def infer_masks(self, speedup_class, graph, masks):
+        torch.save(masks, self.mask_file)
+        with mock.patch('nni.compression.torch.speedup.compressor.build_module_graph', return_value=graph):
+            ms = speedup_class(nn.Module(), None, self.mask_file)
+        ms.infer_modules_masks()
+        return ms.inferred_masks
+
+    def assert_cmask_equal(self, cmask_a, cmask_b):
+        if cmask_a is None or cmask_b is None:
+            self.assertIs(cmask_a, cmask_b)
+        else:
+            self.assertEqual(cmask_a, cmask_b)
+
+    def test_deep_chain(self):
+        depth = sys.getrecursionlimit() + 100
+        nodes = [('conv0', 'Conv2d')] + [('relu%d' % i, 'aten::relu') for i in range(depth)] + [('conv1', 'Conv2d')]
+        graph = FakeModuleGraph(nodes, zip([name for name, _ in nodes[:-1]], [name for name, _ in nodes[1:]]))
+        masks = {'conv0': conv_mask(8, 3, [1, 4, 5])}
+        with self.assertRaises(RecursionError):
+            self.infer_masks(RecursiveModelSpeedup, graph, masks)
+
+        inferred_masks = self.infer_masks(ModelSpeedup, graph, masks)
+        self.assertEqual(len(inferred_masks), depth + 2)
+        self.assertListEqual(inferred_masks['conv1'].input_mask.mask_index[1].tolist(), [1, 4, 5])
+        self.assertListEqual(inferred_masks['relu%d' % (depth - 1)].output_mask.mask_index[1].tolist(), [1, 4, 5])
+
+    def test_resnet_block(self):
+        # conv0 -> bn0 -> relu0 -> conv1 -> bn1 -> relu1 -> conv2 -> bn2 -> add -> relu2 -> conv3
+        #                       \-------------------------------------------/
+        nodes = [('conv0', 'Conv2d'), ('bn0', 'BatchNorm2d'), ('relu0', 'aten::relu'),
+                 ('conv1', 'Conv2d'), ('bn1', 'BatchNorm2d'), ('relu1', 'aten::relu'),
+                 ('conv2', 'Conv2d'), ('bn2', 'BatchNorm2d'), ('add', 'aten::add'),
+                 ('relu2', 'aten::relu'), ('conv3', 'Conv2d')]
+        edges = [('conv0', 'bn0'), ('bn0', 'relu0'), ('relu0', 'conv1'), ('conv1', 'bn1'), ('bn1', 'relu1'),
+                 ('relu1', 'conv2'), ('conv2', 'bn2'), ('bn2', 'add'), ('relu0', 'add'), ('add', 'relu2'),
+                 ('relu2', 'conv3')]
+        # the masks of conv0 and conv2 are aligned, as fix_mask_conflict does for the residual connection,
+        # the mask of bn1 is propagated back to conv1
+        masks = {'conv0': conv_mask(8, 3, [0, 2, 3, 7]),
+                 'bn1': bn_mask(6, [1, 2, 5]),
+                 'conv2': conv_mask(8, 6, [0, 2, 3, 7])}
+        expected = self.infer_masks(RecursiveModelSpeedup, FakeModuleGraph(nodes, edges), masks)
+        inferred_masks = self.infer_masks(ModelSpeedup, FakeModuleGraph(nodes, edges), masks)
+
+        self.assertSetEqual(set(inferred_masks), set(expected))
+        self.assertSetEqual(set(inferred_masks), {name for name, _ in nodes})
+        for name, module_masks in inferred_masks.items():
+            self.assert_cmask_equal(module_masks.input_mask, expected[name].input_mask)
+            self.assert_cmask_equal(module_masks.output_mask, expected[name].output_mask)
+            self.assertSetEqual(set(module_masks.param_masks), set(expected[name].param_masks))
+            for param_name, param_mask in module_masks.param_masks.items():
+                self.assert_cmask_equal(param_mask, expected[name].param_masks[param_name])
+        self.assertListEqual(inferred_masks['conv1'].param_masks['weight'].mask_index[0].tolist(), [1, 2, 5])
+        self.assertListEqual(inferred_masks['conv3'].input_mask.mask_index[1].tolist(), [0, 2, 3, 7])
+
 if __name__ == '__main__':
     main()
@@ -1,20 +1,35 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import gc
 import importlib
+import json
 import os
 import sys
+import tempfile
+import weakref
 from collections import OrderedDict
-from unittest import TestCase, main
+from unittest import TestCase, main, mock
 
+import numpy as np
 import torch
 import torch.nn as nn
 from nni.nas.pytorch.classic_nas import get_and_apply_next_architecture
-from nni.nas.pytorch.darts import DartsMutator
-from nni.nas.pytorch.enas import EnasMutator
+from nni.nas.pytorch.darts import DartsMutator, DartsTrainer
+from nni.nas.pytorch.enas import EnasMutator, EnasTrainer
 from nni.nas.pytorch.fixed import apply_fixed_architecture
 from nni.nas.pytorch.mutables import LayerChoice
 from nni.nas.pytorch.random import RandomMutator
-from nni.nas.pytorch.utils import _reset_global_mutable_counting
+from nni.nas.pytorch.utils import AverageMeterGroup, StatusRecorder, _reset_global_mutable_counting
+
+
+class DartsSearchSpace(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.fc1 = LayerChoice([nn.Linear(4, 6), nn.Linear(4, 6)])
+        self.fc2 = LayerChoice([nn.Linear(6, 3), nn.Linear(6, 3)])
+
+    def forward(self, x):
+        return self.fc2(torch.tanh(self.fc1(x)))
 
 
 class NasTestCase(TestCase):
@@ -86,6 +101,80 @@ class NasTestCase(TestCase):
         self.cuda_test = [t for t in self.cuda_test if t <= 1]
         self.default_mutator_test_pipeline(DartsMutator)
 
+    def _darts_trainer(self, hessian_frequency=1):
+        _reset_global_mutable_counting()
+        model = DartsSearchSpace()
+        dataset = torch.utils.data.TensorDataset(torch.randn(16, 4), torch.randint(0, 3, (16,)))
+        optimizer = torch.optim.SGD(model.parameters(), 0.1, momentum=0., weight_decay=0.)
+        return DartsTrainer(model, nn.CrossEntropyLoss(), lambda logits, y: {}, optimizer, 1, dataset, dataset,
+                            batch_size=8, workers=0, device=torch.device("cpu"), unrolled=True,
+                            hessian_frequency=hessian_frequency)
+
+    def _unrolled_val_loss(self, trainer, trn_X, trn_y, val_X, val_y):
+        """L_val(w - lr * dw L_trn(w, alpha), alpha), the objective of the unrolled architecture step."""
+        params = list(trainer.model.parameters())
+        backup = [p.detach().clone() for p in params]
+        _, loss = trainer._logits_and_loss(trn_X, trn_y)
+        gradients = torch.autograd.grad(loss, params)
+        with torch.no_grad():
+            for p, g in zip(params, gradients):
+                p.sub_(trainer.optimizer.param_groups[0]["lr"] * g)
+            _, loss = trainer._logits_and_loss(val_X, val_y)
+            for p, b in zip(params, backup):
+                p.copy_(b)
+        return loss.item()
+
+    def test_darts_unrolled_backward(self):
+        default_dtype = torch.get_default_dtype()
+        torch.set_default_dtype(torch.float64)
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as log_dir:
+            # trainer writes logs in working directory
+            os.chdir(log_dir)
+            try:
+                trainer = self._darts_trainer()
+                trn_X, trn_y, val_X, val_y = torch.randn(8, 4), torch.randint(0, 3, (8,)), torch.randn(8, 4), \
+                    torch.randint(0, 3, (8,))
+                weights = [p.detach().clone() for p in trainer.model.parameters()]
+                trainer._unrolled_backward(trn_X, trn_y, val_X, val_y)
+                for p, w in zip(trainer.model.parameters(), weights):
+                    self.assertTrue(torch.equal(p, w))
+
+                # central finite difference of the unrolled objective with respect to each architecture weight
+                h = 1E-5
+                for alpha in trainer.mutator.parameters():
+                    reference = torch.zeros_like(alpha)
+                    for i in range(alpha.numel()):
+                        with torch.no_grad():
+                            alpha.view(-1)[i] += h
+                        loss_pos = self._unrolled_val_loss(trainer, trn_X, trn_y, val_X, val_y)
+                        with torch.no_grad():
+                            alpha.view(-1)[i] -= 2 * h
+                        loss_neg = self._unrolled_val_loss(trainer, trn_X, trn_y, val_X, val_y)
+                        with torch.no_grad():
+                            alpha.view(-1)[i] += h
+                        reference.view(-1)[i] = (loss_pos - loss_neg) / (2 * h)
+                    self.assertTrue(torch.allclose(alpha.grad, reference, rtol=1E-3, atol=1E-6))
+            finally:
+                os.chdir(cwd)
+                torch.set_default_dtype(default_dtype)
+
+    def test_darts_hessian_frequency(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as log_dir:
+            os.chdir(log_dir)
+            try:
+                trainer = self._darts_trainer(hessian_frequency=2)
+                X, y = torch.randn(8, 4), torch.randint(0, 3, (8,))
+                trainer._unrolled_backward(X, y, X, y)
+                hessian = trainer._hessian
+                trainer._unrolled_backward(X, y, X, y)
+                self.assertIs(trainer._hessian, hessian)
+                trainer._unrolled_backward(X, y, X, y)
+                self.assertIsNot(trainer._hessian, hessian)
+            finally:
+                os.chdir(cwd)
+
     def test_apply_twice(self):
         model = self.model_module.NaiveSearchSpace(self)
         with self.assertRaises(RuntimeError):
@@ -108,6 +197,174 @@ class NasTestCase(TestCase):
         get_and_apply_next_architecture(model)
         self.iterative_sample_and_forward(model)
 
+    def test_forward_batched(self):
+        for model_cls in [self.model_module.NaiveSearchSpace, self.model_module.LayerChoiceOnlySearchSpace]:
+            _reset_global_mutable_counting()
+            model = model_cls(self)
+            model.eval()
+            mutator = RandomMutator(model)
+            decisions = [mutator.sample_search() for _ in range(4)]
+            x = torch.randn([2] + self.default_input_size)
+            with torch.no_grad():
+                batched = mutator.forward_batched(decisions, x)
+                self.assertEqual(len(batched), len(decisions))
+                for decision, out in zip(decisions, batched):
+                    mutator._cache = decision
+                    self.assertTrue(torch.allclose(model(x), out, atol=1e-5))
+
+    def test_forward_batched_nested(self):
+        class InnerCall(nn.Module):
+            def __init__(self, inner):
+                super().__init__()
+                # not registered as a submodule, search space parsing doesn't allow nested mutables
+                self.__dict__["inner"] = inner
+
+            def forward(self, x):
+                return self.inner(torch.tanh(x))
+
+        class NestedSearchSpace(nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.inner = LayerChoice([nn.Linear(4, 4) for _ in range(3)], key="inner")
+                self.outer = LayerChoice([nn.Linear(4, 4), InnerCall(self.inner)], key="outer")
+
+            def forward(self, x):
+                return self.outer(x)
+
+        _reset_global_mutable_counting()
+        model = NestedSearchSpace()
+        model.eval()
+        mutator = RandomMutator(model)
+
+        def one_hot(i, n):
+            return torch.tensor([j == i for j in range(n)])
+
+        # the inner choice only runs for the three architectures picking the second outer candidate
+        decisions = [{"outer": one_hot(o, 2), "inner": one_hot(i, 3)} for o, i in [(0, 1), (1, 0), (1, 2), (1, 1), (0, 0)]]
+        x = torch.randn(2, 4)
+        with torch.no_grad():
+            batched = mutator.forward_batched(decisions, x)
+            self.assertEqual(len(batched), len(decisions))
+            for decision, out in zip(decisions, batched):
+                mutator._cache = decision
+                self.assertTrue(torch.allclose(model(x), out, atol=1e-6))
+
+    def _layer_choice_with_mask(self, mask):
+        _reset_global_mutable_counting()
+        layer_choice = LayerChoice([nn.Linear(4, 3) for _ in range(3)], return_mask=True)
+        mutator = RandomMutator(layer_choice)
+        mutator._cache = {layer_choice.key: mask}
+        return layer_choice, mutator
+
+    def test_dispatch_cache(self):
+        for mask in [[True, False, True], np.array([True, False, True]), torch.tensor([True, False, True])]:
+            layer_choice, mutator = self._layer_choice_with_mask(mask)
+            x = torch.randn(2, 4)
+            with mock.patch.object(mutator, "_compile_mask", wraps=mutator._compile_mask) as compile_mask:
+                for _ in range(3):
+                    out, _ = layer_choice(x)
+                self.assertEqual(compile_mask.call_count, 1)
+                self.assertTrue(torch.allclose(out, layer_choice[0](x) + layer_choice[2](x)))
+                # decision updated in place
+                mask[0] = False
+                mask[1] = True
+                out, out_mask = layer_choice(x)
+                self.assertEqual(compile_mask.call_count, 2)
+                self.assertTrue(torch.allclose(out, layer_choice[1](x) + layer_choice[2](x)))
+                self.assertListEqual(out_mask.tolist(), [False, True, True])
+                # reset invalidates the cache even if the decision doesn't change
+                mutator._dispatch_cache = dict()
+                layer_choice(x)
+                self.assertEqual(compile_mask.call_count, 3)
+
+    def test_dispatch_weighted_reduction(self):
+        weights = torch.tensor([0.2, 0., 0.8], requires_grad=True)
+        layer_choice, _ = self._layer_choice_with_mask(weights)
+        x = torch.randn(2, 4)
+        out, _ = layer_choice(x)
+        expected = sum(w * op(x) for w, op in zip(weights, layer_choice))
+        self.assertTrue(torch.allclose(out, expected))
+        # weights gathered from the cache are connected to the graph of the decision
+        out.sum().backward()
+        reference = torch.stack([op(x).sum() for op in layer_choice]).detach()
+        self.assertTrue(torch.allclose(weights.grad[[0, 2]], reference[[0, 2]]))
+
+    def test_average_meter_group(self):
+        meters = AverageMeterGroup()
+        for i in range(4):
+            meters.update({"loss": torch.tensor(float(i)), "acc": 0.5})
+        self.assertIsNotNone(meters.loss._pending_sum)
+        meters.sync()
+        self.assertIsNone(meters.loss._pending_sum)
+        self.assertAlmostEqual(meters.loss.val, 3.)
+        self.assertAlmostEqual(meters.loss.avg, 1.5)
+        meters.update({"loss": 5., "acc": torch.tensor(1.)})
+        self.assertAlmostEqual(meters.loss.avg, 2.2)
+        self.assertAlmostEqual(meters.acc.val, 1.)
+        self.assertAlmostEqual(meters.acc.avg, 0.6)
+
+    def test_enas_logged_loss(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as log_dir:
+            # trainer writes logs in working directory
+            os.chdir(log_dir)
+            try:
+                _reset_global_mutable_counting()
+                model = DartsSearchSpace()
+                dataset = torch.utils.data.TensorDataset(torch.randn(40, 4), torch.randint(0, 3, (40,)))
+                optimizer = torch.optim.SGD(model.parameters(), 0.1)
+                accuracy = lambda logits, y: (logits.argmax(1) == y).float().mean()
+                trainer = EnasTrainer(model, nn.CrossEntropyLoss(), lambda logits, y: {"acc": accuracy(logits, y)},
+                                      accuracy, optimizer, 1, dataset, dataset, batch_size=4, workers=0,
+                                      device=torch.device("cpu"), child_steps=1, mutator_steps=1,
+                                      mutator_steps_aggregate=4, entropy_weight=0.1)
+                logged = []
+                with mock.patch.object(AverageMeterGroup, "update", lambda self, data: logged.append(dict(data))):
+                    trainer.train_one_epoch(0)
+            finally:
+                os.chdir(cwd)
+        rl_metrics = [m for m in logged if "reward" in m]
+        self.assertEqual(len(rl_metrics), 4)
+        for m in rl_metrics:
+            self.assertTrue(torch.is_tensor(m["acc"]))
+            expected = m["log_prob"] * (m["reward"] - m["baseline"]) + trainer.skip_weight * m["skip"]
+            self.assertTrue(torch.allclose(m["loss"], expected))
+
+    def test_status_recorder(self):
+        model = self.model_module.NaiveSearchSpace(self)
+        mutator = RandomMutator(model)
+        with tempfile.TemporaryDirectory() as log_dir:
+            path = os.path.join(log_dir, "log")
+            recorder = StatusRecorder(path, interval=3, buffer_size=2)
+            expected = []
+            for i in range(10):
+                mutator.reset()
+                if i % 3 == 0:
+                    expected.append(mutator.status())
+                recorder.record(mutator)
+            recorder.close()
+            recorder.close()
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual(records, expected)
+
+    def test_status_recorder_collected(self):
+        model = self.model_module.NaiveSearchSpace(self)
+        mutator = RandomMutator(model)
+        with tempfile.TemporaryDirectory() as log_dir:
+            path = os.path.join(log_dir, "log")
+            recorder = StatusRecorder(path, buffer_size=4)
+            mutator.reset()
+            recorder.record(mutator)
+            recorder_ref, status_file = weakref.ref(recorder), recorder._file
+            # a recorder that is never closed doesn't outlive its last reference
+            del recorder
+            gc.collect()
+            self.assertIsNone(recorder_ref())
+            self.assertTrue(status_file.closed)
+            with open(path) as f:
+                self.assertEqual([json.loads(line) for line in f], [mutator.status()])
+
     def test_layer_choice(self):
         for i in range(2):
             for j in range(2):
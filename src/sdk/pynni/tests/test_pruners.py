@@ -10,6 +10,7 @@ from unittest import TestCase, main
 from nni.compression.torch import LevelPruner, SlimPruner, FPGMPruner, L1FilterPruner, \
     L2FilterPruner, AGP_Pruner, ActivationMeanRankFilterPruner, ActivationAPoZRankFilterPruner, \
     TaylorFOWeightFilterPruner, NetAdaptPruner, SimulatedAnnealingPruner, ADMMPruner, AutoCompressPruner
+from nni.compression.torch.pruning.candidate_evaluator import CandidateEvaluator
 
 def validate_sparsity(wrapper, sparsity, bias=False):
     masks = [wrapper.weight_mask]
@@ -259,5 +260,106 @@ class PrunerTestCase(TestCase):
             prune_config['agp']['config_list'][0]['op_types'] = ['default']
             test_agp(pruning_algorithm)
 
+    def test_activation_statistics(self):
+        def mean_activation(activations):
+            return torch.mean(activations, dim=(0, 2, 3))
+
+        def apoz(activations):
+            return torch.eq(activations, 0).sum(dim=(0, 2, 3)).float() / activations[:, 0].numel()
+
+        for pruner_class, reference_fn, largest in [(ActivationMeanRankFilterPruner, mean_activation, False),
+                                                    (ActivationAPoZRankFilterPruner, apoz, True)]:
+            model = Model()
+            config_list = [{'sparsity': 0.5, 'op_types': ['Conv2d']}]
+            pruner = pruner_class(model, config_list, statistics_batch_num=3)
+            pruner.compress()
+            # stacked activations of all batches, as they were collected before the statistics were streamed
+            activations = []
+            handle = model.conv1.module.register_forward_hook(lambda module, x, y: activations.append(F.relu(y.detach())))
+            batches = [torch.randn(4, 1, 28, 28) for _ in range(3)]
+            for x in batches:
+                model(x)
+            handle.remove()
+            reference = reference_fn(torch.cat(activations, 0))
+
+            statistics = pruner.collected_activation[0]
+            assert statistics['batch_num'] == 3
+            if largest:
+                streamed = pruner.masker._calc_apoz(statistics)
+            else:
+                streamed = pruner.masker._cal_mean_activation(statistics)
+            assert torch.allclose(streamed, reference, atol=1e-6)
+
+            pruner.update_mask()
+            pruned = torch.topk(reference, 4, largest=largest)[1]
+            weight_mask = model.conv1.weight_mask.view(8, -1)
+            assert (weight_mask[pruned] == 0).all()
+            assert weight_mask.sum() == weight_mask[0].numel() * 4
+            # the collector is removed once enough batches are collected
+            assert pruner.hook_id not in pruner._fwd_hook_handles
+            model(batches[0])
+            assert statistics['batch_num'] == 3
+
+    def test_fpgm_chunked_distance_sums(self):
+        def distance_sums(weight):
+            # one filter at a time, as FPGM ranked filters before the distances were computed in chunks
+            w = weight.view(weight.size(0), -1)
+            return torch.stack([torch.sqrt(((w - w[i]) ** 2).sum(-1)).sum() for i in range(w.size(0))])
+
+        model = Model()
+        pruner = FPGMPruner(model, [{'sparsity': 0.5, 'op_types': ['Conv2d']}])
+        # fewer filters in each chunk than in the layer
+        pruner.masker.chunk_size = 3
+        weight = torch.randn(20, 4, 3, 3)
+        assert torch.allclose(pruner.masker._get_distance_sums(weight), distance_sums(weight), rtol=1e-4)
+
+        pruner.compress()
+        expected = sorted(range(8), key=lambda i: distance_sums(model.conv1.module.weight.data)[i].item())[:4]
+        pruned = [i for i in range(8) if (model.conv1.weight_mask[i] == 0).all()]
+        assert sorted(expected) == pruned
+
+    def test_compact_mask(self):
+        model = Model()
+        pruner = LevelPruner(model, [{'sparsity': 0.5, 'op_types': ['default']}])
+        pruner.compress()
+        assert model.conv1.weight_mask.dtype == torch.bool
+        model.eval()
+        x = torch.randn(4, 1, 28, 28)
+        model(x)
+        pruned = ~model.conv1.weight_mask
+        assert (model.conv1.module.weight[pruned] == 0).all()
+        # masks are applied again when weights are changed
+        with torch.no_grad():
+            model.conv1.module.weight.fill_(1.)
+        model(x)
+        assert (model.conv1.module.weight[pruned] == 0).all()
+        # and when masks are changed
+        model.conv1.weight_mask = torch.zeros(model.conv1.weight_mask.shape)
+        model(x)
+        assert (model.conv1.module.weight == 0).all()
+
+    def test_candidate_evaluator(self):
+        model = Model()
+        x = torch.randn(4, 1, 28, 28)
+        state_dict = {k: v.clone() for k, v in model.state_dict().items()}
+        num_evaluations = [0]
+
+        def evaluator(model):
+            num_evaluations[0] += 1
+            with torch.no_grad():
+                return model(x).sum().item()
+
+        candidate_evaluator = CandidateEvaluator(model, evaluator, 'l1')
+        config_list = [{'sparsity': 0.5, 'op_types': ['Conv2d'], 'op_names': ['conv1']}]
+        result = candidate_evaluator.evaluate(config_list)
+        # the model is unwrapped and its weights are restored
+        assert isinstance(model.conv1, nn.Conv2d)
+        for k, v in model.state_dict().items():
+            assert torch.equal(v, state_dict[k])
+        # the same config_list in another order is read from cache
+        results = candidate_evaluator.evaluate_many([[{'op_names': ['conv1'], 'op_types': ['Conv2d'], 'sparsity': 0.5}]])
+        assert results == [result]
+        assert num_evaluations[0] == 1
+
 if __name__ == '__main__':
     main()
@@ -3,8 +3,41 @@
 
 import os
 import json
+import tempfile
+from contextlib import contextmanager
 from .constants import NNICTL_HOME_DIR
 
+@contextmanager
+def file_lock(file_path):
+    '''hold an exclusive lock of file_path.lock, so that parallel nnictl processes update the file in turn'''
+    with open(file_path + '.lock', 'a') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def atomic_write_json(file_path, content):
+    '''write json to a temporary file and rename it, so that readers never see a partial file'''
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=os.path.basename(file_path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(content, file)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
 class Config:
     '''a util class to load and save config'''
     def __init__(self, file_path):
@@ -19,9 +52,10 @@ class Config:
 
     def set_config(self, key, value):
         '''set {key:value} paris to self.config'''
-        self.config = self.read_file()
-        self.config[key] = value
-        self.write_file()
+        with file_lock(self.config_file):
+            self.config = self.read_file()
+            self.config[key] = value
+            self._write_file()
 
     def get_config(self, key):
         '''get a value according to key'''
@@ -29,10 +63,13 @@ class Config:
 
     def write_file(self):
         '''save config to local file'''
+        with file_lock(self.config_file):
+            self._write_file()
+
+    def _write_file(self):
         if self.config:
             try:
-                with open(self.config_file, 'w') as file:
-                    json.dump(self.config, file)
+                atomic_write_json(self.config_file, self.config)
             except IOError as error:
                 print('Error:', error)
                 return
@@ -54,31 +91,46 @@ class Experiments:
         self.experiment_file = os.path.join(NNICTL_HOME_DIR, '.experiment')
         self.experiments = self.read_file()
 
+    @contextmanager
+    def _modify(self):
+        '''reload experiments under the file lock, and write them back once after they are modified,
+        so that changes of other nnictl processes are kept'''
+        with file_lock(self.experiment_file):
+            self.experiments = self.read_file()
+            yield self.experiments
+            self._write_file()
+
     def add_experiment(self, expId, port, time, file_name, platform, experiment_name):
         '''set {key:value} paris to self.experiment'''
-        self.experiments[expId] = {}
-        self.experiments[expId]['port'] = port
-        self.experiments[expId]['startTime'] = time
-        self.experiments[expId]['endTime'] = 'N/A'
-        self.experiments[expId]['status'] = 'INITIALIZED'
-        self.experiments[expId]['fileName'] = file_name
-        self.experiments[expId]['platform'] = platform
-        self.experiments[expId]['experimentName'] = experiment_name
-        self.write_file()
+        with self._modify() as experiments:
+            experiments[expId] = {}
+            experiments[expId]['port'] = port
+            experiments[expId]['startTime'] = time
+            experiments[expId]['endTime'] = 'N/A'
+            experiments[expId]['status'] = 'INITIALIZED'
+            experiments[expId]['fileName'] = file_name
+            experiments[expId]['platform'] = platform
+            experiments[expId]['experimentName'] = experiment_name
 
     def update_experiment(self, expId, key, value):
         '''Update experiment'''
-        if expId not in self.experiments:
-            return False
-        self.experiments[expId][key] = value
-        self.write_file()
-        return True
+        return expId in self.update_experiments({expId: {key: value}})
+
+    def update_experiments(self, updates):
+        '''Update experiments with {expId: {key: value}} in one write, returns ids of updated experiments'''
+        updated = []
+        with self._modify() as experiments:
+            for expId, values in updates.items():
+                if expId in experiments:
+                    experiments[expId].update(values)
+                    updated.append(expId)
+        return updated
 
     def remove_experiment(self, expId):
         '''remove an experiment by id'''
-        if expId in self.experiments:
-            self.experiments.pop(expId)
-        self.write_file()
+        with self._modify() as experiments:
+            if expId in experiments:
+                experiments.pop(expId)
 
     def get_all_experiments(self):
         '''return all of experiments'''
@@ -86,9 +138,12 @@ class Experiments:
 
     def write_file(self):
         '''save config to local file'''
+        with file_lock(self.experiment_file):
+            return self._write_file()
+
+    def _write_file(self):
         try:
-            with open(self.experiment_file, 'w') as file:
-                json.dump(self.experiments, file)
+            atomic_write_json(self.experiment_file, self.experiments)
         except IOError as error:
             print('Error:', error)
             return ''
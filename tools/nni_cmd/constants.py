@@ -13,6 +13,15 @@ WARNING_INFO = 'WARNING: '
 DEFAULT_REST_PORT = 8080
 REST_TIME_OUT = 20
 
+# timeout of each request when refreshing status of experiments
+REST_STATUS_TIME_OUT = 2
+
+# max number of experiments whose status is refreshed at the same time
+MAX_STATUS_WORKERS = 16
+
+# max number of remote machines whose log data is copied at the same time
+MAX_SYNC_WORKERS = 16
+
 EXPERIMENT_SUCCESS_INFO = Fore.GREEN + 'Successfully started experiment!\n' + Fore.RESET + \
                           '------------------------------------------------------------------------------------\n' \
                           'The experiment id is %s\n'\
@@ -0,0 +1,179 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import csv
+import json
+import time
+from datetime import datetime
+from .common_utils import print_warning
+
+# number of trials requested in each page of export
+EXPORT_PAGE_SIZE = 1000
+
+TIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']
+
+class ExportError(Exception):
+    '''raised when a page of trials cannot be fetched from NNI manager'''
+
+def is_pyarrow_available():
+    try:
+        import pyarrow.parquet  # pylint: disable=unused-import
+        return True
+    except ImportError:
+        return False
+
+def parse_time(time_string):
+    '''convert local time like "2020-01-01 12:00:00" to timestamp in milliseconds'''
+    for time_format in TIME_FORMATS:
+        try:
+            return int(time.mktime(datetime.strptime(time_string, time_format).timetuple()) * 1000)
+        except ValueError:
+            pass
+    raise ValueError('Unknown time format %s, please use one of %s' % (time_string, TIME_FORMATS))
+
+def get_export_filter(args):
+    '''build query parameters of export-data from command line arguments'''
+    export_filter = {}
+    if getattr(args, 'status', None):
+        export_filter['status'] = ','.join(args.status)
+    if getattr(args, 'since', None):
+        export_filter['start_time'] = parse_time(args.since)
+    if getattr(args, 'until', None):
+        export_filter['end_time'] = parse_time(args.until)
+    return export_filter
+
+def iter_trial_pages(fetch, export_filter, page_size=EXPORT_PAGE_SIZE):
+    '''
+    yield lists of exported trial records page by page, fetch(params) returns parsed response of export-data.
+    Each page is requested after the cursor of the previous page, so trials added during export are not repeated.
+    '''
+    cursor = None
+    while True:
+        params = dict(export_filter)
+        params['limit'] = page_size
+        if cursor is not None:
+            params['after'] = cursor
+        content = fetch(params)
+        if isinstance(content, list):
+            # NNI manager without pagination returns all records at once
+            if export_filter:
+                print_warning('NNI manager does not support export filters, all trials are exported.')
+            yield content
+            return
+        yield content['trials']
+        if content['nextCursor'] is None:
+            return
+        cursor = content['nextCursor']
+
+def format_record(record):
+    '''flatten a record to parameters, metrics and id'''
+    record_value = json.loads(record['value'])
+    if not isinstance(record_value, (float, int)):
+        return {**record['parameter'], **record_value, **{'id': record['id']}}
+    return {**record['parameter'], **{'reward': record_value, 'id': record['id']}}
+
+def collect_schema(pages):
+    '''first pass of csv and parquet export, returns columns in the order they first appear and their types'''
+    columns = {}
+    for page in pages:
+        for record in page:
+            for key, value in format_record(record).items():
+                columns[key] = _merge_type(columns.get(key), value)
+    return columns
+
+def _merge_type(column_type, value):
+    if value is None:
+        return column_type
+    if isinstance(value, bool):
+        value_type = 'bool'
+    elif isinstance(value, int):
+        value_type = 'int'
+    elif isinstance(value, float):
+        value_type = 'float'
+    else:
+        value_type = 'string'
+    if column_type is None or column_type == value_type:
+        return value_type
+    if {column_type, value_type} == {'int', 'float'}:
+        return 'float'
+    return 'string'
+
+def write_json(pages, path, lines=False):
+    '''write records as a json array, or json lines if lines is True, page by page'''
+    count = 0
+    with open(path, 'w') as file:
+        if not lines:
+            file.write('[')
+        for page in pages:
+            for record in page:
+                text = json.dumps(record, separators=(',', ':'))
+                if lines:
+                    file.write(text + '\n')
+                else:
+                    file.write((',' if count else '') + text)
+                count += 1
+        if not lines:
+            file.write(']')
+    return count
+
+def write_csv(pages, path, columns):
+    '''write formatted records to csv page by page, keys not in columns are ignored'''
+    count = 0
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, columns, extrasaction='ignore')
+        writer.writeheader()
+        for page in pages:
+            writer.writerows(format_record(record) for record in page)
+            count += len(page)
+    return count
+
+def write_parquet(pages, path, schema):
+    '''write formatted records to parquet, one row group per page, pyarrow is required'''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    arrow_types = {'bool': pa.bool_(), 'int': pa.int64(), 'float': pa.float64(), 'string': pa.string()}
+    arrow_schema = pa.schema([(name, arrow_types[column_type or 'string']) for name, column_type in schema.items()])
+    count = 0
+    with pq.ParquetWriter(path, arrow_schema) as writer:
+        for page in pages:
+            records = [format_record(record) for record in page]
+            if not records:
+                continue
+            arrays = []
+            for name, column_type in schema.items():
+                values = [record.get(name) for record in records]
+                if column_type == 'float':
+                    values = [None if value is None else float(value) for value in values]
+                elif column_type in ('string', None):
+                    values = [None if value is None or isinstance(value, str) else json.dumps(value) for value in values]
+                arrays.append(pa.array(values, type=arrow_schema.field(name).type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=arrow_schema))
+            count += len(records)
+    return count
+
+def export_trials(fetch, export_type, path, export_filter=None, columns=None, page_size=EXPORT_PAGE_SIZE):
+    '''
+    Export trials page by page, so that memory doesn't grow with the number of trials.
+    csv and parquet scan the pages twice, first for the columns, unless columns are given for csv.
+    Returns the number of exported records.
+    '''
+    export_filter = export_filter or {}
+    pages = lambda: iter_trial_pages(fetch, export_filter, page_size)
+    if export_type == 'json':
+        return write_json(pages(), path)
+    if export_type == 'jsonl':
+        return write_json(pages(), path, lines=True)
+    if export_type == 'csv':
+        if not columns:
+            columns = list(collect_schema(pages()).keys())
+        if not columns:
+            return 0
+        return write_csv(pages(), path, columns)
+    if export_type == 'parquet':
+        schema = collect_schema(pages())
+        if columns:
+            schema = {name: schema.get(name) for name in columns}
+        if not schema:
+            return 0
+        return write_parquet(pages(), path, schema)
+    raise ValueError('Unknown type: %s' % export_type)
@@ -14,6 +14,7 @@ from .nnictl_utils import stop_experiment, trial_ls, trial_kill, list_experiment
                           get_config, log_stdout, log_stderr, search_space_auto_gen, webui_nas
 from .package_management import package_install, package_uninstall, package_show, package_list
 from .constants import DEFAULT_REST_PORT
+from .export_utils import EXPORT_PAGE_SIZE
 from .tensorboard_utils import start_tensorboard, stop_tensorboard
 init(autoreset=True)
 
@@ -144,10 +145,16 @@ def parse_args():
     parser_import_data.add_argument('--filename', '-f', required=True)
     parser_import_data.set_defaults(func=import_data)
     #export trial data
-    parser_trial_export = parser_experiment_subparsers.add_parser('export', help='export trial job results to csv or json')
+    parser_trial_export = parser_experiment_subparsers.add_parser('export', help='export trial job results to json, jsonl, csv or parquet')
     parser_trial_export.add_argument('id', nargs='?', help='the id of experiment')
-    parser_trial_export.add_argument('--type', '-t', choices=['json', 'csv'], required=True, dest='type', help='target file type')
+    parser_trial_export.add_argument('--type', '-t', choices=['json', 'jsonl', 'csv', 'parquet'], required=True, dest='type',
+                                     help='target file type')
     parser_trial_export.add_argument('--filename', '-f', required=True, dest='path', help='target file path')
+    parser_trial_export.add_argument('--status', nargs='+', help='only export trials in these status, e.g. SUCCEEDED')
+    parser_trial_export.add_argument('--since', help='only export trials started after this local time, e.g. "2020-01-01 12:00:00"')
+    parser_trial_export.add_argument('--until', help='only export trials started before this local time')
+    parser_trial_export.add_argument('--columns', help='comma separated columns of csv or parquet, all columns by default')
+    parser_trial_export.add_argument('--page_size', type=int, default=EXPORT_PAGE_SIZE, help='number of trials fetched in each request')
     parser_trial_export.set_defaults(func=export_trials_data)
 
     #TODO:finish webui function
@@ -219,6 +226,9 @@ def parse_args():
     parser_tensorboard_start.add_argument('id', nargs='?', help='the id of experiment')
     parser_tensorboard_start.add_argument('--trial_id', '-T', dest='trial_id', help='the id of trial')
     parser_tensorboard_start.add_argument('--port', dest='port', default=6006, help='the port to start tensorboard')
+    parser_tensorboard_start.add_argument('--watch', action='store_true', help='keep copying log data from remote machines')
+    parser_tensorboard_start.add_argument('--interval', dest='interval', type=int, default=30, \
+    help='the time interval to copy log data in watch mode, the unit is second')
     parser_tensorboard_start.set_defaults(func=start_tensorboard)
     parser_tensorboard_stop = parser_tensorboard_subparsers.add_parser('stop', help='stop tensorboard')
     parser_tensorboard_stop.add_argument('id', nargs='?', help='the id of experiment')
@@ -1,7 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import csv
 import os
 import sys
 import json
@@ -9,8 +8,10 @@ import time
 import re
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
+from urllib.parse import urlencode
 from subprocess import Popen
 from pyhdfs import HdfsClient
 from nni.package_utils import get_nni_installation_path
@@ -18,50 +19,63 @@ from nni_annotation import expand_annotations
 from .rest_utils import rest_get, rest_delete, check_rest_server_quick, check_response
 from .url_utils import trial_jobs_url, experiment_url, trial_job_id_url, export_data_url
 from .config_utils import Config, Experiments
+from .export_utils import ExportError, export_trials, get_export_filter, is_pyarrow_available
 from .constants import NNICTL_HOME_DIR, EXPERIMENT_INFORMATION_FORMAT, EXPERIMENT_DETAIL_FORMAT, \
-     EXPERIMENT_MONITOR_INFO, TRIAL_MONITOR_HEAD, TRIAL_MONITOR_CONTENT, TRIAL_MONITOR_TAIL, REST_TIME_OUT
+     EXPERIMENT_MONITOR_INFO, TRIAL_MONITOR_HEAD, TRIAL_MONITOR_CONTENT, TRIAL_MONITOR_TAIL, REST_TIME_OUT, \
+     REST_STATUS_TIME_OUT, MAX_STATUS_WORKERS
 from .common_utils import print_normal, print_error, print_warning, detect_process, get_yml_content
 from .command_utils import check_output_command, kill_command
 from .ssh_utils import create_ssh_sftp_client, remove_remote_directory
 
-def get_experiment_time(port):
+def get_experiment_time(port, timeout=REST_TIME_OUT):
     '''get the startTime and endTime of an experiment'''
-    response = rest_get(experiment_url(port), REST_TIME_OUT)
+    response = rest_get(experiment_url(port), timeout)
     if response and check_response(response):
         content = convert_time_stamp_to_date(json.loads(response.text))
         return content.get('startTime'), content.get('endTime')
     return None, None
 
-def get_experiment_status(port):
+def get_experiment_status(port, timeout=5):
     '''get the status of an experiment'''
-    result, response = check_rest_server_quick(port)
+    result, response = check_rest_server_quick(port, timeout)
     if result:
         return json.loads(response.text).get('status')
     return None
 
+def get_experiment_updates(experiment):
+    '''query the latest status and time of an experiment, returns {key: value} to update'''
+    nni_config = Config(experiment['fileName'])
+    rest_pid = nni_config.get_config('restServerPid')
+    if not detect_process(rest_pid):
+        return {'status': 'STOPPED'}
+    updates = {}
+    rest_port = nni_config.get_config('restServerPort')
+    startTime, endTime = get_experiment_time(rest_port, REST_STATUS_TIME_OUT)
+    if startTime:
+        updates['startTime'] = startTime
+    if endTime:
+        updates['endTime'] = endTime
+    status = get_experiment_status(rest_port, REST_STATUS_TIME_OUT)
+    if status:
+        updates['status'] = status
+    return updates
+
 def update_experiment():
     '''Update the experiment status in config file'''
     experiment_config = Experiments()
     experiment_dict = experiment_config.get_all_experiments()
     if not experiment_dict:
         return None
-    for key in experiment_dict.keys():
-        if isinstance(experiment_dict[key], dict):
-            if experiment_dict[key].get('status') != 'STOPPED':
-                nni_config = Config(experiment_dict[key]['fileName'])
-                rest_pid = nni_config.get_config('restServerPid')
-                if not detect_process(rest_pid):
-                    experiment_config.update_experiment(key, 'status', 'STOPPED')
-                    continue
-                rest_port = nni_config.get_config('restServerPort')
-                startTime, endTime = get_experiment_time(rest_port)
-                if startTime:
-                    experiment_config.update_experiment(key, 'startTime', startTime)
-                if endTime:
-                    experiment_config.update_experiment(key, 'endTime', endTime)
-                status = get_experiment_status(rest_port)
-                if status:
-                    experiment_config.update_experiment(key, 'status', status)
+    running_ids = [key for key, value in experiment_dict.items()
+                   if isinstance(value, dict) and value.get('status') != 'STOPPED']
+    if not running_ids:
+        return None
+    # query experiments concurrently, and write all updates at once
+    with ThreadPoolExecutor(max_workers=min(len(running_ids), MAX_STATUS_WORKERS)) as executor:
+        results = executor.map(lambda key: get_experiment_updates(experiment_dict[key]), running_ids)
+        updates = {key: result for key, result in zip(running_ids, results) if result}
+    if updates:
+        experiment_config.update_experiments(updates)
 
 def check_experiment_id(args, update=True):
     '''check if the id is valid
@@ -242,9 +256,8 @@ def stop_experiment(args):
                             print_error(exception)
                     nni_config.set_config('tensorboardPidList', [])
             print_normal('Stop experiment success.')
-            experiment_config.update_experiment(experiment_id, 'status', 'STOPPED')
             time_now = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
-            experiment_config.update_experiment(experiment_id, 'endTime', str(time_now))
+            experiment_config.update_experiments({experiment_id: {'status': 'STOPPED', 'endTime': str(time_now)}})
 
 def trial_ls(args):
     '''List trial'''
@@ -681,7 +694,7 @@ def monitor_experiment(args):
     set_monitor(False, args.time)
 
 def export_trials_data(args):
-    '''export experiment metadata to csv
+    '''export experiment metadata to json, jsonl, csv or parquet
     '''
     nni_config = Config(get_config_filename(args))
     rest_port = nni_config.get_config('restServerPort')
@@ -689,37 +702,30 @@ def export_trials_data(args):
     if not detect_process(rest_pid):
         print_error('Experiment is not running...')
         return
-    running, response = check_rest_server_quick(rest_port)
-    if running:
-        response = rest_get(export_data_url(rest_port), 20)
-        if response is not None and check_response(response):
-            if args.type == 'json':
-                with open(args.path, 'w') as file:
-                    file.write(response.text)
-            elif args.type == 'csv':
-                content = json.loads(response.text)
-                trial_records = []
-                for record in content:
-                    record_value = json.loads(record['value'])
-                    if not isinstance(record_value, (float, int)):
-                        formated_record = {**record['parameter'], **record_value, **{'id': record['id']}}
-                    else:
-                        formated_record = {**record['parameter'], **{'reward': record_value, 'id': record['id']}}
-                    trial_records.append(formated_record)
-                if not trial_records:
-                    print_error('No trial results collected! Please check your trial log...')
-                    exit(0)
-                with open(args.path, 'w', newline='') as file:
-                    writer = csv.DictWriter(file, set.union(*[set(r.keys()) for r in trial_records]))
-                    writer.writeheader()
-                    writer.writerows(trial_records)
-            else:
-                print_error('Unknown type: %s' % args.type)
-                exit(1)
-        else:
-            print_error('Export failed...')
-    else:
+    running, _ = check_rest_server_quick(rest_port)
+    if not running:
         print_error('Restful server is not Running')
+        return
+    if args.type == 'parquet' and not is_pyarrow_available():
+        print_error('pyarrow is required to export parquet, please install it by "pip install pyarrow"')
+        exit(1)
+
+    def fetch_page(params):
+        response = rest_get(export_data_url(rest_port) + '?' + urlencode(params), 20)
+        if response is None or not check_response(response):
+            raise ExportError('Export failed...')
+        return json.loads(response.text)
+
+    columns = args.columns.split(',') if args.columns else None
+    try:
+        count = export_trials(fetch_page, args.type, args.path, get_export_filter(args), columns, args.page_size)
+    except (ExportError, ValueError) as error:
+        print_error(error)
+        exit(1)
+    if not count and args.type in ('csv', 'parquet'):
+        print_error('No trial results collected! Please check your trial log...')
+        exit(0)
+    print_normal('Exported %d trials to %s' % (count, args.path))
 
 def search_space_auto_gen(args):
     '''dry run trial code to generate search space file'''
@@ -63,9 +63,9 @@ def check_rest_server(rest_port):
             time.sleep(1)
     return  False, response
 
-def check_rest_server_quick(rest_port):
+def check_rest_server_quick(rest_port, timeout=5):
     '''Check if restful server is ready, only check once'''
-    response = rest_get(check_status_url(rest_port), 5)
+    response = rest_get(check_status_url(rest_port), timeout)
     if response and response.status_code == 200:
         return True, response
     return False, None
@@ -2,6 +2,9 @@
 # Licensed under the MIT license.
 
 import os
+import posixpath
+import stat
+import tempfile
 from .common_utils import print_error
 from .command_utils import install_package_command
 
@@ -30,6 +33,40 @@ def copy_remote_directory_to_local(sftp, remote_path, local_path):
     except Exception:
         pass
 
+def sync_remote_directory_to_local(sftp, remote_path, local_path):
+    '''
+    copy new or changed files of a remote directory to local machine, like rsync, a file is skipped
+    if the local copy has the same size and modification time, returns the number of copied files
+    '''
+    os.makedirs(local_path, exist_ok=True)
+    copied = 0
+    for attr in sftp.listdir_attr(remote_path):
+        remote_full_path = posixpath.join(remote_path, attr.filename)
+        local_full_path = os.path.join(local_path, attr.filename)
+        if stat.S_ISDIR(attr.st_mode):
+            copied += sync_remote_directory_to_local(sftp, remote_full_path, local_full_path)
+            continue
+        try:
+            local_stat = os.stat(local_full_path)
+            if local_stat.st_size == attr.st_size and int(local_stat.st_mtime) == attr.st_mtime:
+                continue
+        except FileNotFoundError:
+            pass
+        # tensorboard may be reading the file, so it's replaced only when the copy is complete,
+        # the temp name must not contain 'tfevents', or tensorboard would load the partial file
+        temp_fd, temp_path = tempfile.mkstemp(prefix='.nnisync-', dir=local_path)
+        os.close(temp_fd)
+        try:
+            sftp.get(remote_full_path, temp_path)
+            if attr.st_mtime is not None:
+                os.utime(temp_path, (attr.st_mtime, attr.st_mtime))
+            os.replace(temp_path, local_full_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        copied += 1
+    return copied
+
 def create_ssh_sftp_client(host_ip, port, username, password, ssh_key_path, passphrase):
     '''create ssh client'''
     try:
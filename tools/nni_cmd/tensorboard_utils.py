@@ -5,19 +5,23 @@ import os
 import json
 import re
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import call, Popen
 from .rest_utils import rest_get, check_rest_server_quick, check_response
 from .config_utils import Config, Experiments
 from .url_utils import trial_jobs_url, get_local_urls
-from .constants import REST_TIME_OUT
-from .common_utils import print_normal, print_error, print_green, detect_process, detect_port, check_tensorboard_version
+from .constants import REST_TIME_OUT, MAX_SYNC_WORKERS
+from .common_utils import print_normal, print_error, print_green, print_warning, detect_process, detect_port, \
+                          check_tensorboard_version
 from .nnictl_utils import check_experiment_id, check_experiment_id
-from .ssh_utils import create_ssh_sftp_client, copy_remote_directory_to_local
+from .ssh_utils import create_ssh_sftp_client, sync_remote_directory_to_local
 
 def parse_log_path(args, trial_content):
-    '''parse log path'''
+    '''parse log path, returns log paths, hosts and ids of selected trials'''
     path_list = []
     host_list = []
+    id_list = []
     for trial in trial_content:
         if args.trial_id and args.trial_id != 'all' and trial.get('id') != args.trial_id:
             continue
@@ -26,59 +30,127 @@ def parse_log_path(args, trial_content):
         if match:
             path_list.append(match.group('path'))
             host_list.append(match.group('host'))
+            id_list.append(trial.get('id'))
     if not path_list:
         print_error('Trial id %s error!' % args.trial_id)
         exit(1)
-    return path_list, host_list
+    return path_list, host_list, id_list
 
-def copy_data_from_remote(args, nni_config, trial_content, path_list, host_list, temp_nni_path):
+class RemoteLogSyncer:
+    '''
+    Copy trial log data from remote machines to local directories named by trial id.
+    Each machine has one ssh connection, which is reused by later syncs, and machines are synced in parallel.
+    '''
+    def __init__(self, machine_list, local_root):
+        self.machine_dict = {machine['ip']: machine for machine in machine_list}
+        self.local_root = local_root
+        self.sftp_clients = {}
+
+    def _get_sftp(self, host):
+        if self.sftp_clients.get(host) is None:
+            machine = self.machine_dict[host]
+            self.sftp_clients[host] = create_ssh_sftp_client(host, machine['port'], machine['username'], machine['passwd'],
+                                                             machine.get('sshKeyPath'), machine.get('passphrase'))
+        return self.sftp_clients[host]
+
+    def _close_sftp(self, host):
+        sftp = self.sftp_clients.pop(host, None)
+        if sftp is not None:
+            sftp.close()
+            sftp.get_channel().get_transport().close()
+
+    def _sync_host(self, host, trials):
+        sftp = self._get_sftp(host)
+        if sftp is None:
+            return 0
+        copied = 0
+        for trial_id, remote_path in trials:
+            try:
+                copied += sync_remote_directory_to_local(sftp, remote_path, os.path.join(self.local_root, trial_id))
+            except FileNotFoundError:
+                # the trial hasn't written any output yet
+                pass
+            except Exception as exception:
+                print_warning('Copy log data from %s failed: %s' % (host + ':' + remote_path, exception))
+                # connect again in the next sync
+                self._close_sftp(host)
+                break
+        return copied
+
+    def sync(self, path_list, host_list, id_list):
+        '''copy new or changed log files, returns local log paths and the number of copied files'''
+        trials_by_host = {}
+        for path, host, trial_id in zip(path_list, host_list, id_list):
+            trials_by_host.setdefault(host, []).append((trial_id, path))
+        with ThreadPoolExecutor(max_workers=min(len(trials_by_host), MAX_SYNC_WORKERS)) as executor:
+            copied = sum(executor.map(lambda item: self._sync_host(*item), trials_by_host.items()))
+        local_path_list = [os.path.join(self.local_root, trial_id) for trial_id in id_list]
+        return local_path_list, copied
+
+    def close(self):
+        for host in list(self.sftp_clients):
+            self._close_sftp(host)
+
+def copy_data_from_remote(syncer, path_list, host_list, id_list):
     '''use ssh client to copy data from remote machine to local machien'''
-    machine_list = nni_config.get_config('experimentConfig').get('machineList')
-    machine_dict = {}
-    local_path_list = []
-    for machine in machine_list:
-        machine_dict[machine['ip']] = {'port': machine['port'], 'passwd': machine['passwd'], 'username': machine['username'],
-                                       'sshKeyPath': machine.get('sshKeyPath'), 'passphrase': machine.get('passphrase')}
-    for index, host in enumerate(host_list):
-        local_path = os.path.join(temp_nni_path, trial_content[index].get('id'))
-        local_path_list.append(local_path)
-        print_normal('Copying log data from %s to %s' % (host + ':' + path_list[index], local_path))
-        sftp = create_ssh_sftp_client(host, machine_dict[host]['port'], machine_dict[host]['username'], machine_dict[host]['passwd'],
-                                      machine_dict[host]['sshKeyPath'], machine_dict[host]['passphrase'])
-        copy_remote_directory_to_local(sftp, path_list[index], local_path)
-    print_normal('Copy done!')
+    print_normal('Copying log data of %d trials from %d machines to %s' % (len(id_list), len(set(host_list)), syncer.local_root))
+    local_path_list, copied = syncer.sync(path_list, host_list, id_list)
+    print_normal('Copy done! %d files are updated' % copied)
     return local_path_list
 
 def get_path_list(args, nni_config, trial_content, temp_nni_path):
-    '''get path list according to different platform'''
-    path_list, host_list = parse_log_path(args, trial_content)
+    '''get path list according to different platform, returns the path list and the syncer of remote platform'''
+    path_list, host_list, id_list = parse_log_path(args, trial_content)
     platform = nni_config.get_config('experimentConfig').get('trainingServicePlatform')
     if platform == 'local':
         print_normal('Log path: %s' % ' '.join(path_list))
-        return path_list
+        return path_list, None
     elif platform == 'remote':
-        path_list = copy_data_from_remote(args, nni_config, trial_content, path_list, host_list, temp_nni_path)
+        syncer = RemoteLogSyncer(nni_config.get_config('experimentConfig').get('machineList'), temp_nni_path)
+        path_list = copy_data_from_remote(syncer, path_list, host_list, id_list)
         print_normal('Log path: %s' % ' '.join(path_list))
-        return path_list
+        return path_list, syncer
     else:
         print_error('Not supported platform!')
         exit(1)
 
+def watch_remote_log(args, rest_port, syncer):
+    '''keep copying log data of running trials, until the experiment stops or Ctrl+C is pressed'''
+    print_normal('Syncing log data every %d seconds, press Ctrl+C to stop syncing...' % args.interval)
+    try:
+        while True:
+            time.sleep(args.interval)
+            response = rest_get(trial_jobs_url(rest_port), REST_TIME_OUT)
+            if not response or not check_response(response):
+                print_normal('Experiment is not running, stop syncing.')
+                break
+            path_list, host_list, id_list = parse_log_path(args, json.loads(response.text))
+            _, copied = syncer.sync(path_list, host_list, id_list)
+            if copied:
+                print_normal('%d files are updated' % copied)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        syncer.close()
+
 def format_tensorboard_log_path(path_list):
     new_path_list = []
     for index, value in enumerate(path_list):
         new_path_list.append('name%d:%s' % (index + 1, value))
     return ','.join(new_path_list)
 
-def start_tensorboard_process(args, nni_config, path_list, temp_nni_path):
-    '''call cmds to start tensorboard process in local machine'''
+def start_tensorboard_process(args, nni_config, path_list, temp_nni_path, log_dir=None):
+    '''call cmds to start tensorboard process in local machine, runs are found in log_dir if it's set'''
     if detect_port(args.port):
         print_error('Port %s is used by another process, please reset port!' % str(args.port))
         exit(1)
     with open(os.path.join(temp_nni_path, 'tensorboard_stdout'), 'a+') as stdout_file, \
          open(os.path.join(temp_nni_path, 'tensorboard_stderr'), 'a+') as stderr_file:
-        log_dir_cmd = '--logdir_spec' if check_tensorboard_version() >= '2.0' else '--logdir'
-        cmds = ['tensorboard', log_dir_cmd, format_tensorboard_log_path(path_list), '--port', str(args.port)]
+        if log_dir is not None:
+            cmds = ['tensorboard', '--logdir', log_dir, '--port', str(args.port)]
+        else:
+            log_dir_cmd = '--logdir_spec' if check_tensorboard_version() >= '2.0' else '--logdir'
+            cmds = ['tensorboard', log_dir_cmd, format_tensorboard_log_path(path_list), '--port', str(args.port)]
         tensorboard_process = Popen(cmds, stdout=stdout_file, stderr=stderr_file)
     url_list = get_local_urls(args.port)
     print_green('Start tensorboard success!')
@@ -143,5 +215,13 @@ def start_tensorboard(args):
     temp_nni_path = os.path.join(tempfile.gettempdir(), 'nni', experiment_id)
     os.makedirs(temp_nni_path, exist_ok=True)
 
-    path_list = get_path_list(args, nni_config, trial_content, temp_nni_path)
-    start_tensorboard_process(args, nni_config, path_list, temp_nni_path)
+    path_list, syncer = get_path_list(args, nni_config, trial_content, temp_nni_path)
+    if syncer is None or not args.watch:
+        start_tensorboard_process(args, nni_config, path_list, temp_nni_path)
+        if syncer is not None:
+            syncer.close()
+        return
+    # tensorboard finds trials started later in subdirectories of the sync directory
+    log_dir = temp_nni_path if args.trial_id == 'all' else None
+    start_tensorboard_process(args, nni_config, path_list, temp_nni_path, log_dir)
+    watch_remote_log(args, rest_port, syncer)
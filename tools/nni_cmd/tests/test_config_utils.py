@@ -0,0 +1,56 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+import os
+import shutil
+import tempfile
+from multiprocessing import Process
+from unittest import TestCase, main
+
+from nni_cmd import config_utils
+from nni_cmd.config_utils import Experiments
+
+def add_experiments(home_dir, prefix, count):
+    config_utils.NNICTL_HOME_DIR = home_dir
+    for i in range(count):
+        Experiments().add_experiment('%s%d' % (prefix, i), 8080, 'time', 'file', 'local', 'name')
+        Experiments().update_experiment('%s%d' % (prefix, i), 'status', 'RUNNING')
+
+class ExperimentsTestCase(TestCase):
+    def setUp(self):
+        self.home_dir = tempfile.mkdtemp()
+        self.original_home_dir = config_utils.NNICTL_HOME_DIR
+        config_utils.NNICTL_HOME_DIR = self.home_dir
+
+    def tearDown(self):
+        config_utils.NNICTL_HOME_DIR = self.original_home_dir
+        shutil.rmtree(self.home_dir)
+
+    def test_update_experiments(self):
+        experiments = Experiments()
+        experiments.add_experiment('a', 8080, 'time', 'file_a', 'local', 'name')
+        experiments.add_experiment('b', 8081, 'time', 'file_b', 'local', 'name')
+        updated = experiments.update_experiments({'a': {'status': 'RUNNING'}, 'b': {'status': 'STOPPED', 'endTime': 'now'},
+                                                  'c': {'status': 'RUNNING'}})
+        self.assertListEqual(sorted(updated), ['a', 'b'])
+        self.assertFalse(experiments.update_experiment('c', 'status', 'RUNNING'))
+        with open(os.path.join(self.home_dir, '.experiment')) as experiment_file:
+            content = json.load(experiment_file)
+        self.assertEqual(content['a']['status'], 'RUNNING')
+        self.assertEqual(content['b']['endTime'], 'now')
+        self.assertNotIn('c', content)
+
+    def test_parallel_processes(self):
+        processes = [Process(target=add_experiments, args=(self.home_dir, prefix, 20)) for prefix in 'abcd']
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        experiments = Experiments().get_all_experiments()
+        # no update is lost
+        self.assertEqual(len(experiments), 80)
+        self.assertTrue(all(experiment['status'] == 'RUNNING' for experiment in experiments.values()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main
+
+from nni_cmd.export_utils import export_trials
+
+def make_records(count):
+    records = []
+    for i in range(count):
+        value = i if i % 2 else {'default': i, 'loss': i / 10}
+        records.append({'parameter': {'lr': i / 100}, 'value': json.dumps(json.dumps(value)), 'id': 'trial%d' % i})
+    return records
+
+class FakeManager:
+    '''serve export-data pages, or the whole list like NNI manager without pagination'''
+    def __init__(self, records, paginated=True):
+        self.records = records
+        self.paginated = paginated
+        self.requests = []
+
+    def fetch(self, params):
+        self.requests.append(params)
+        records = [dict(record, value=json.loads(record['value'])) for record in self.records]
+        if not self.paginated:
+            return records
+        # cursor is the id of the last trial of the previous page
+        ids = [record['id'] for record in records]
+        start = ids.index(params['after']) + 1 if 'after' in params else 0
+        end = start + params['limit']
+        next_cursor = ids[end - 1] if end < len(records) else None
+        return {'trials': records[start:end], 'nextCursor': next_cursor}
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_json_pages(self):
+        manager = FakeManager(make_records(25))
+        path = os.path.join(self.output_dir, 'trials.json')
+        self.assertEqual(export_trials(manager.fetch, 'json', path, page_size=10), 25)
+        self.assertListEqual([params.get('after') for params in manager.requests], [None, 'trial9', 'trial19'])
+        with open(path) as file:
+            self.assertListEqual([record['id'] for record in json.load(file)], ['trial%d' % i for i in range(25)])
+
+    def test_jsonl_with_filter(self):
+        manager = FakeManager(make_records(3))
+        path = os.path.join(self.output_dir, 'trials.jsonl')
+        export_trials(manager.fetch, 'jsonl', path, {'status': 'SUCCEEDED'}, page_size=2)
+        self.assertEqual(manager.requests[0]['status'], 'SUCCEEDED')
+        with open(path) as file:
+            self.assertEqual(len(file.readlines()), 3)
+
+    def test_csv_columns(self):
+        for paginated in [True, False]:
+            manager = FakeManager(make_records(5), paginated)
+            path = os.path.join(self.output_dir, 'trials.csv')
+            self.assertEqual(export_trials(manager.fetch, 'csv', path, page_size=2), 5)
+            with open(path) as file:
+                rows = list(csv.DictReader(file))
+            self.assertListEqual(list(rows[0].keys()), ['lr', 'default', 'loss', 'id', 'reward'])
+            self.assertEqual(rows[1]['reward'], '1')
+            self.assertEqual(rows[2]['loss'], '0.2')
+
+    def test_csv_declared_columns(self):
+        manager = FakeManager(make_records(5))
+        path = os.path.join(self.output_dir, 'trials.csv')
+        export_trials(manager.fetch, 'csv', path, columns=['id', 'lr'], page_size=2)
+        # columns are declared, so the pages are fetched once
+        self.assertEqual(len(manager.requests), 3)
+        with open(path) as file:
+            self.assertListEqual(list(next(csv.DictReader(file)).keys()), ['id', 'lr'])
+
+    def test_csv_empty(self):
+        path = os.path.join(self.output_dir, 'trials.csv')
+        self.assertEqual(export_trials(FakeManager([]).fetch, 'csv', path), 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import os
+import shutil
+import tempfile
+from argparse import Namespace
+from unittest import TestCase, main
+
+from nni_cmd.ssh_utils import sync_remote_directory_to_local
+
+class FakeSftp:
+    '''sftp client serving files of a local directory'''
+    def __init__(self):
+        self.copied = []
+        self.in_progress = []
+
+    def listdir_attr(self, path):
+        attrs = []
+        for name in os.listdir(path):
+            file_stat = os.stat(os.path.join(path, name))
+            attrs.append(Namespace(filename=name, st_mode=file_stat.st_mode, st_size=file_stat.st_size,
+                                   st_mtime=int(file_stat.st_mtime)))
+        return attrs
+
+    def get(self, remote_path, local_path):
+        self.copied.append(remote_path)
+        shutil.copyfile(remote_path, local_path)
+        # names seen in the local folder while the copy is in progress
+        self.in_progress.extend(os.listdir(os.path.dirname(local_path)))
+
+class SyncTestCase(TestCase):
+    def setUp(self):
+        self.remote_dir = tempfile.mkdtemp()
+        self.local_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.remote_dir, 'tensorboard'))
+        for name in ['trial.log', 'tensorboard/events.1', 'tensorboard/events.2']:
+            self.write_remote(name, 'data')
+
+    def tearDown(self):
+        shutil.rmtree(self.remote_dir)
+        shutil.rmtree(self.local_dir)
+
+    def write_remote(self, name, content, mtime=1000):
+        path = os.path.join(self.remote_dir, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        os.utime(path, (mtime, mtime))
+
+    def test_incremental_sync(self):
+        sftp = FakeSftp()
+        self.assertEqual(sync_remote_directory_to_local(sftp, self.remote_dir, self.local_dir), 3)
+        with open(os.path.join(self.local_dir, 'tensorboard', 'events.2')) as file:
+            self.assertEqual(file.read(), 'data')
+        # nothing changed
+        self.assertEqual(sync_remote_directory_to_local(sftp, self.remote_dir, self.local_dir), 0)
+        # a file is appended, and a file is added
+        self.write_remote('tensorboard/events.2', 'data more', 2000)
+        self.write_remote('tensorboard/events.3', 'data')
+        sftp.copied = []
+        self.assertEqual(sync_remote_directory_to_local(sftp, self.remote_dir, self.local_dir), 2)
+        self.assertListEqual(sorted(os.path.basename(path) for path in sftp.copied), ['events.2', 'events.3'])
+        with open(os.path.join(self.local_dir, 'tensorboard', 'events.2')) as file:
+            self.assertEqual(file.read(), 'data more')
+        self.assertFalse([name for name in os.listdir(os.path.join(self.local_dir, 'tensorboard')) if name.startswith('.nnisync')])
+
+    def test_no_tfevents_during_copy(self):
+        self.write_remote('tensorboard/events.out.tfevents.1.host', 'data')
+        sftp = FakeSftp()
+        sync_remote_directory_to_local(sftp, self.remote_dir, self.local_dir)
+        self.write_remote('tensorboard/events.out.tfevents.1.host', 'data more', 2000)
+        sftp.in_progress = []
+        self.assertEqual(sync_remote_directory_to_local(sftp, self.remote_dir, self.local_dir), 1)
+        self.assertListEqual([name for name in sftp.in_progress if 'tfevents' in name], ['events.out.tfevents.1.host'])
+        with open(os.path.join(self.local_dir, 'tensorboard', 'events.out.tfevents.1.host')) as file:
+            self.assertEqual(file.read(), 'data more')
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import argparse
 import json
 import os
 import subprocess
@@ -10,72 +11,216 @@ import traceback
 
 from xml.dom import minidom
 
+METRICS_FILE_NAME = "gpu_metrics"
+DEFAULT_INTERVAL_SECONDS = 5
+# the metrics file is truncated to the latest lines when it's larger than this,
+# readers only take the last line.
+DEFAULT_MAX_FILE_BYTES = 1024 * 1024
+KEEP_LINES = 10
+# NVML errors meaning that NVML doesn't work at all, other errors only fail a sample
+NVML_UNAVAILABLE_ERRORS = ['NVML_ERROR_UNINITIALIZED', 'NVML_ERROR_DRIVER_NOT_LOADED', 'NVML_ERROR_LIBRARY_NOT_FOUND',
+                           'NVML_ERROR_FUNCTION_NOT_FOUND', 'NVML_ERROR_LIB_RM_VERSION_MISMATCH']
+
+
+class BackendUnavailableError(Exception):
+    """
+    Raised by a backend when metrics can't be collected any more, e.g. nvidia-smi or the driver is missing.
+    """
 
-def main(argv):
-    metrics_output_dir = os.environ['METRIC_OUTPUT_DIR']
 
-    cmd = 'nvidia-smi -q -x'.split()
-    while(True):
+class NvmlBackend:
+    """
+    Collect gpu metrics with NVML, which doesn't fork a process or parse XML for each sample.
+    """
+
+    def __init__(self):
+        import pynvml  # pylint: disable=import-error
+        self.nvml = pynvml
+        self.unavailable_errors = {getattr(pynvml, name) for name in NVML_UNAVAILABLE_ERRORS if hasattr(pynvml, name)}
+        self.nvml.nvmlInit()
+
+    def collect(self):
         try:
-            smi_output = subprocess.check_output(cmd)
-        except Exception:
-            traceback.print_exc()
-            gen_empty_gpu_metric(metrics_output_dir)
-            break
-        parse_nvidia_smi_result(smi_output, metrics_output_dir)
-        # TODO: change to sleep time configurable via arguments
-        time.sleep(5)
+            return self._collect()
+        except self.nvml.NVMLError as error:
+            if getattr(error, 'value', None) in self.unavailable_errors:
+                raise BackendUnavailableError('NVML is unavailable: %s' % error) from error
+            raise
+
+    def _collect(self):
+        gpu_infos = []
+        for index in range(self.nvml.nvmlDeviceGetCount()):
+            handle = self.nvml.nvmlDeviceGetHandleByIndex(index)
+            utilization = self.nvml.nvmlDeviceGetUtilizationRates(handle)
+            memory = self.nvml.nvmlDeviceGetMemoryInfo(handle)
+            processes = [{
+                "pid": process.pid,
+                # it's None, if the memory usage is not available, e.g. in a container.
+                "usedMemory": None if process.usedGpuMemory is None else process.usedGpuMemory // 1024 // 1024
+            } for process in self.nvml.nvmlDeviceGetComputeRunningProcesses(handle)]
+            name = self.nvml.nvmlDeviceGetName(handle)
+            gpu_infos.append({
+                "index": index,
+                "gpuUtil": utilization.gpu,
+                "gpuMemUtil": utilization.memory,
+                "activeProcessNum": len(processes),
+                "gpuType": name.decode() if isinstance(name, bytes) else name,
+                "gpuMemTotal": memory.total // 1024 // 1024,
+                "gpuMemUsed": memory.used // 1024 // 1024,
+                "gpuMemFree": memory.free // 1024 // 1024,
+                "processes": processes
+            })
+        return gpu_infos
+
+    def close(self):
+        self.nvml.nvmlShutdown()
+
 
+class NvidiaSmiBackend:
+    """
+    Collect gpu metrics by parsing the XML output of nvidia-smi.
+    """
 
-def parse_nvidia_smi_result(smi, outputDir):
+    def __init__(self):
+        self.cmd = 'nvidia-smi -q -x'.split()
+
+    def collect(self):
+        try:
+            smi = subprocess.check_output(self.cmd)
+        except (OSError, subprocess.CalledProcessError) as error:
+            raise BackendUnavailableError('nvidia-smi is unavailable: %s' % error) from error
+        return parse_nvidia_smi_result(smi)
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    "nvml": NvmlBackend,
+    "nvidia-smi": NvidiaSmiBackend
+}
+
+
+def create_backend(name="auto"):
+    """
+    Create the backend by name, "auto" uses NVML if pynvml is available, and falls back to nvidia-smi.
+    """
+    if name != "auto":
+        return BACKENDS[name]()
     try:
-        old_umask = os.umask(0)
-        xmldoc = minidom.parseString(smi)
-        gpuList = xmldoc.getElementsByTagName('gpu')
-        with open(os.path.join(outputDir, "gpu_metrics"), 'a') as outputFile:
-            outPut = {}
-            outPut["Timestamp"] = time.asctime(time.localtime())
-            outPut["gpuCount"] = len(gpuList)
-            outPut["gpuInfos"] = []
-            for gpuIndex, gpu in enumerate(gpuList):
-                gpuInfo = {}
-                gpuInfo['index'] = gpuIndex
-                gpuInfo['gpuUtil'] = gpu.getElementsByTagName('utilization')[0]\
-                    .getElementsByTagName('gpu_util')[0]\
-                    .childNodes[0].data.replace("%", "").strip()
-                gpuInfo['gpuMemUtil'] = gpu.getElementsByTagName('utilization')[0]\
-                    .getElementsByTagName('memory_util')[0]\
-                    .childNodes[0].data.replace("%", "").strip()
-                processes = gpu.getElementsByTagName('processes')
-                runningProNumber = len(processes[0].getElementsByTagName('process_info'))
-                gpuInfo['activeProcessNum'] = runningProNumber
-
-                outPut["gpuInfos"].append(gpuInfo)
-            print(outPut)
-            outputFile.write("{}\n".format(json.dumps(outPut, sort_keys=True)))
-            outputFile.flush()
+        return NvmlBackend()
     except Exception as error:
-        # e_info = sys.exc_info()
-        print('gpu_metrics_collector error: %s' % error)
-    finally:
-        os.umask(old_umask)
+        print('NVML is not available, use nvidia-smi: %s' % error)
+        return NvidiaSmiBackend()
 
 
-def gen_empty_gpu_metric(outputDir):
-    try:
+class MetricsWriter:
+    """
+    Append metrics to the metrics file as json lines, and keep the file smaller than max_bytes.
+    """
+
+    def __init__(self, output_dir, max_bytes=DEFAULT_MAX_FILE_BYTES):
+        self.path = os.path.join(output_dir, METRICS_FILE_NAME)
+        self.max_bytes = max_bytes
+
+    def write(self, gpu_infos):
+        output = {}
+        output["Timestamp"] = time.asctime(time.localtime())
+        output["gpuCount"] = len(gpu_infos)
+        output["gpuInfos"] = gpu_infos
+        line = "{}\n".format(json.dumps(output, sort_keys=True))
         old_umask = os.umask(0)
-        with open(os.path.join(outputDir, "gpu_metrics"), 'a') as outputFile:
-            outPut = {}
-            outPut["Timestamp"] = time.asctime(time.localtime())
-            outPut["gpuCount"] = 0
-            outPut["gpuInfos"] = []
-            print(outPut)
-            outputFile.write("{}\n".format(json.dumps(outPut, sort_keys=True)))
-            outputFile.flush()
+        try:
+            with open(self.path, 'a') as outputFile:
+                outputFile.write(line)
+                size = outputFile.tell()
+            if size > self.max_bytes:
+                self._truncate()
+        finally:
+            os.umask(old_umask)
+
+    def _truncate(self):
+        with open(self.path) as outputFile:
+            lines = outputFile.readlines()[-KEEP_LINES:]
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as outputFile:
+            outputFile.writelines(lines)
+        # readers see either the old or the new file
+        os.replace(temp_path, self.path)
+
+
+def collect_loop(backend, writer, interval_seconds, count=None):
+    """
+    Write metrics collected by backend every interval_seconds, for count times or forever.
+    A sample failed to be collected or parsed is skipped. If the backend is unavailable,
+    empty metrics are written and the loop stops.
+    """
+    collected = 0
+    while count is None or collected < count:
+        start = time.time()
+        try:
+            writer.write(backend.collect())
+        except BackendUnavailableError:
+            traceback.print_exc()
+            writer.write([])
+            break
+        except Exception:
+            traceback.print_exc()
+        collected += 1
+        time.sleep(max(interval_seconds - (time.time() - start), 0))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Collect gpu metrics into $METRIC_OUTPUT_DIR/gpu_metrics')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL_SECONDS, help='seconds between samples')
+    parser.add_argument('--max_file_bytes', type=int, default=DEFAULT_MAX_FILE_BYTES, help='max size of the metrics file')
+    parser.add_argument('--backend', choices=['auto'] + list(BACKENDS.keys()), default='auto')
+    args = parser.parse_args(argv)
+
+    writer = MetricsWriter(os.environ['METRIC_OUTPUT_DIR'], args.max_file_bytes)
+    try:
+        backend = create_backend(args.backend)
     except Exception:
         traceback.print_exc()
+        writer.write([])
+        return
+    try:
+        collect_loop(backend, writer, args.interval)
     finally:
-        os.umask(old_umask)
+        backend.close()
+
+
+def _parse_percent(text):
+    # it's "N/A" if the value is not supported
+    value = text.replace("%", "").strip()
+    return int(value) if value.isdigit() else None
+
+
+def parse_nvidia_smi_result(smi):
+    xmldoc = minidom.parseString(smi)
+    gpuList = xmldoc.getElementsByTagName('gpu')
+    gpuInfos = []
+    for gpuIndex, gpu in enumerate(gpuList):
+        gpuInfo = {}
+        gpuInfo['index'] = gpuIndex
+        # integers as the ones of NVML
+        gpuInfo['gpuUtil'] = _parse_percent(gpu.getElementsByTagName('utilization')[0]
+                                            .getElementsByTagName('gpu_util')[0].childNodes[0].data)
+        gpuInfo['gpuMemUtil'] = _parse_percent(gpu.getElementsByTagName('utilization')[0]
+                                               .getElementsByTagName('memory_util')[0].childNodes[0].data)
+        processes = gpu.getElementsByTagName('processes')
+        processInfos = processes[0].getElementsByTagName('process_info')
+        gpuInfo['activeProcessNum'] = len(processInfos)
+        gpuInfo['processes'] = []
+        for processInfo in processInfos:
+            usedMemory = processInfo.getElementsByTagName('used_memory')[0].childNodes[0].data.replace("MiB", "").strip()
+            gpuInfo['processes'].append({
+                'pid': int(processInfo.getElementsByTagName('pid')[0].childNodes[0].data),
+                'usedMemory': int(usedMemory) if usedMemory.isdigit() else None
+            })
+
+        gpuInfos.append(gpuInfo)
+    return gpuInfos
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from argparse import Namespace
+
+from tools.nni_gpu_tool.gpu_metrics_collector import (METRICS_FILE_NAME, BackendUnavailableError, MetricsWriter,
+                                                      NvidiaSmiBackend, NvmlBackend, collect_loop, create_backend,
+                                                      parse_nvidia_smi_result)
+
+smi_output = b'''<?xml version="1.0" ?>
+<nvidia_smi_log>
+    <gpu id="00000000:00:04.0">
+        <product_name>Tesla P100-PCIE-16GB</product_name>
+        <utilization>
+            <gpu_util>35 %</gpu_util>
+            <memory_util>10 %</memory_util>
+        </utilization>
+        <processes>
+            <process_info>
+                <pid>1234</pid>
+                <type>C</type>
+                <used_memory>1021 MiB</used_memory>
+            </process_info>
+        </processes>
+    </gpu>
+</nvidia_smi_log>
+'''
+
+
+class FakeBackend:
+    '''Backend returning prepared gpu infos or raising prepared errors, it's unavailable once they run out'''
+    def __init__(self, samples):
+        self.samples = list(samples)
+
+    def collect(self):
+        if not self.samples:
+            raise BackendUnavailableError('no more samples')
+        sample = self.samples.pop(0)
+        if isinstance(sample, Exception):
+            raise sample
+        return sample
+
+    def close(self):
+        pass
+
+
+def fake_pynvml():
+    '''pynvml module with one GPU running one process'''
+    module = types.ModuleType('pynvml')
+    module.nvmlInit = lambda: None
+    module.nvmlShutdown = lambda: None
+    module.nvmlDeviceGetCount = lambda: 1
+    module.nvmlDeviceGetHandleByIndex = lambda index: index
+    module.nvmlDeviceGetUtilizationRates = lambda handle: Namespace(gpu=35, memory=10)
+    module.nvmlDeviceGetMemoryInfo = lambda handle: Namespace(total=16 << 30, used=1 << 30, free=15 << 30)
+    module.nvmlDeviceGetComputeRunningProcesses = lambda handle: [Namespace(pid=1234, usedGpuMemory=1021 << 20)]
+    module.nvmlDeviceGetName = lambda handle: b'Tesla P100-PCIE-16GB'
+    module.NVMLError = type('NVMLError', (Exception,), {'__init__': lambda self, value: setattr(self, 'value', value)})
+    module.NVML_ERROR_NOT_SUPPORTED = 3
+    module.NVML_ERROR_DRIVER_NOT_LOADED = 9
+    return module
+
+
+class GpuMetricsCollectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def read_metrics(self):
+        with open(os.path.join(self.output_dir, METRICS_FILE_NAME)) as metrics_file:
+            return [json.loads(line) for line in metrics_file]
+
+    def test_parse_nvidia_smi_result(self):
+        gpu_infos = parse_nvidia_smi_result(smi_output)
+        self.assertEqual(len(gpu_infos), 1)
+        self.assertEqual(gpu_infos[0]['gpuUtil'], 35)
+        self.assertEqual(gpu_infos[0]['gpuMemUtil'], 10)
+        self.assertEqual(gpu_infos[0]['activeProcessNum'], 1)
+        self.assertListEqual(gpu_infos[0]['processes'], [{'pid': 1234, 'usedMemory': 1021}])
+
+    def test_nvml_backend(self):
+        sys.modules['pynvml'] = fake_pynvml()
+        try:
+            backend = create_backend()
+            self.assertIsInstance(backend, NvmlBackend)
+            gpu_infos = backend.collect()
+            backend.close()
+        finally:
+            del sys.modules['pynvml']
+        self.assertEqual(gpu_infos[0]['gpuUtil'], 35)
+        self.assertEqual(gpu_infos[0]['gpuType'], 'Tesla P100-PCIE-16GB')
+        self.assertEqual(gpu_infos[0]['gpuMemFree'], 15 * 1024)
+        self.assertListEqual(gpu_infos[0]['processes'], [{'pid': 1234, 'usedMemory': 1021}])
+
+    def test_collect_loop(self):
+        samples = [[{'index': 0, 'gpuUtil': i, 'activeProcessNum': 0}] for i in range(3)]
+        collect_loop(FakeBackend(samples), MetricsWriter(self.output_dir), 0)
+        metrics = self.read_metrics()
+        self.assertListEqual([m['gpuCount'] for m in metrics], [1, 1, 1, 0])
+        self.assertListEqual([m['gpuInfos'][0]['gpuUtil'] for m in metrics[:3]], [0, 1, 2])
+
+    def test_parse_not_available(self):
+        gpu_infos = parse_nvidia_smi_result(smi_output.replace(b'35 %', b'N/A'))
+        self.assertIsNone(gpu_infos[0]['gpuUtil'])
+        self.assertEqual(gpu_infos[0]['gpuMemUtil'], 10)
+
+    def test_nvml_errors(self):
+        module = fake_pynvml()
+        sys.modules['pynvml'] = module
+        try:
+            backend = NvmlBackend()
+            def raise_error(value):
+                def func(*args):
+                    raise module.NVMLError(value)
+                return func
+
+            # a query not supported by the device fails the sample only
+            module.nvmlDeviceGetComputeRunningProcesses = raise_error(module.NVML_ERROR_NOT_SUPPORTED)
+            self.assertRaises(module.NVMLError, backend.collect)
+            module.nvmlDeviceGetCount = raise_error(module.NVML_ERROR_DRIVER_NOT_LOADED)
+            self.assertRaises(BackendUnavailableError, backend.collect)
+        finally:
+            del sys.modules['pynvml']
+
+    def test_nvidia_smi_unavailable(self):
+        backend = NvidiaSmiBackend()
+        backend.cmd = [os.path.join(self.output_dir, 'nvidia-smi')]
+        self.assertRaises(BackendUnavailableError, backend.collect)
+
+    def test_bad_samples_are_skipped(self):
+        samples = [[{'index': 0, 'gpuUtil': 0}], ValueError('bad sample'), IndexError('bad sample'),
+                   [{'index': 0, 'gpuUtil': 3}]]
+        collect_loop(FakeBackend(samples), MetricsWriter(self.output_dir), 0)
+        metrics = self.read_metrics()
+        self.assertListEqual([m['gpuCount'] for m in metrics], [1, 1, 0])
+        self.assertListEqual([m['gpuInfos'][0]['gpuUtil'] for m in metrics[:2]], [0, 3])
+
+    def test_file_size_is_capped(self):
+        samples = [[{'index': 0, 'gpuUtil': i}] for i in range(100)]
+        collect_loop(FakeBackend(samples), MetricsWriter(self.output_dir, max_bytes=1000), 0, count=100)
+        self.assertLessEqual(os.path.getsize(os.path.join(self.output_dir, METRICS_FILE_NAME)), 1000)
+        self.assertEqual(self.read_metrics()[-1]['gpuInfos'][0]['gpuUtil'], 99)
+
+
+if __name__ == '__main__':
+    unittest.main()
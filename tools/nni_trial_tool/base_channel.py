@@ -11,6 +11,8 @@ from .log_utils import LogType, nni_log
 from .commands import CommandType
 
 INTERVAL_SECONDS = 0.5
+# max number of messages sent in one batch
+MAX_BATCH_SIZE = 100
 
 
 class BaseChannel(ABC):
@@ -18,6 +20,12 @@ class BaseChannel(ABC):
         self.is_keep_parsed = args.node_count > 1
         self.args = args
         self.node_id = self.args.node_id
+        # set when a command is received, so that the consumer doesn't need to poll.
+        self.wakeup_event = getattr(args, "wakeup_event", None)
+        # number of messages which are queued or being sent. It's counted before a message is queued, and uncounted
+        # after the message is sent, so that a message dequeued by the send thread is never missed by sent().
+        self._unsent_count = 0
+        self._unsent_lock = threading.Lock()
 
     @abstractmethod
     def _inner_send(self, message):
@@ -69,10 +77,18 @@ class BaseChannel(ABC):
         data = json.dumps(data)
         data = data.encode('utf8')
         message = b'%b%014d%b' % (command.value, len(data), data)
+        with self._unsent_lock:
+            self._unsent_count += 1
         self.send_queue.put(message)
 
     def sent(self):
-        return self.send_queue.qsize() == 0
+        with self._unsent_lock:
+            return self._unsent_count == 0
+
+    def _mark_sent(self, count):
+        """Uncount messages taken from the send queue, once they are sent or failed to be sent."""
+        with self._unsent_lock:
+            self._unsent_count -= count
 
     def received(self):
         return self.receive_queue.qsize() > 0
@@ -111,6 +127,11 @@ class BaseChannel(ABC):
             nni_log(LogType.Error, 'meet unhandled exception in base_channel: %s' % identifier)
         return command, data
 
+    def _put_received(self, message):
+        self.receive_queue.put(message)
+        if self.wakeup_event is not None:
+            self.wakeup_event.set()
+
     def _fetch_message(self, buffer, has_new_line=False):
         messages = []
         while(len(buffer)) >= 16:
@@ -138,9 +159,24 @@ class BaseChannel(ABC):
             messages = self._inner_receive()
             if messages is not None:
                 for message in messages:
-                    self.receive_queue.put(message)
+                    self._put_received(message)
             time.sleep(INTERVAL_SECONDS)
 
+    def _get_send_batch(self):
+        """Wait for queued messages up to INTERVAL_SECONDS, and return at most MAX_BATCH_SIZE of them.
+        Returns an empty list if there is no message.
+        """
+        try:
+            messages = [self.send_queue.get(True, INTERVAL_SECONDS)]
+        except Empty:
+            return []
+        try:
+            while len(messages) < MAX_BATCH_SIZE:
+                messages.append(self.send_queue.get_nowait())
+        except Empty:
+            pass
+        return messages
+
     def _send_loop(self):
         while (self.is_running):
             message = None
@@ -151,4 +187,7 @@ class BaseChannel(ABC):
                 # do nothing, if no command received.
                 pass
             if message is not None:
-                self._inner_send(message)
+                try:
+                    self._inner_send(message)
+                finally:
+                    self._mark_sent(1)
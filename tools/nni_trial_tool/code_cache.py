@@ -0,0 +1,199 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Content-addressed cache of extracted code archives. Each distinct archive is extracted once, and trial code folders
+are built from the cache with reflinks where the file system supports them, so that preparing a trial doesn't depend
+on the size of code. Otherwise files are copied, or hardlinked if it is allowed.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import stat
+import sys
+import tarfile
+import time
+
+from .log_utils import LogType, nni_log
+
+# number of extracted archives kept in the cache
+MAX_CACHE_ENTRIES = 4
+# temporary folders of interrupted extractions are removed after this time
+STALE_TEMP_SECONDS = 3600
+
+# ioctl request to clone a file on btrfs, xfs and other copy on write file systems
+FICLONE = 0x40049409
+
+_hash_cache = {}
+
+
+def hash_archive(archive_path):
+    """
+    Returns sha256 of the archive. The result is reused until the archive file is changed.
+    """
+    archive_stat = os.stat(archive_path)
+    key = (os.path.realpath(archive_path), archive_stat.st_size, archive_stat.st_mtime_ns)
+    if key not in _hash_cache:
+        sha256 = hashlib.sha256()
+        with open(archive_path, "rb") as archive:
+            for chunk in iter(lambda: archive.read(1 << 20), b""):
+                sha256.update(chunk)
+        _hash_cache[key] = sha256.hexdigest()
+    return _hash_cache[key]
+
+
+def _clone_file(src, dst):
+    import fcntl
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+    shutil.copystat(src, dst)
+
+
+class TreeLinker:
+    """
+    Build a copy of a folder tree. Files are cloned if the file system supports reflinks, hardlinked if allowed and
+    possible, and copied otherwise. The first method that works is remembered for the following files.
+
+    Hardlinked files share content with the source and are read-only, so they are not allowed by default.
+    """
+
+    def __init__(self, allow_hardlink=False):
+        self.methods = []
+        if sys.platform.startswith("linux"):
+            self.methods.append(("reflink", _clone_file))
+        if allow_hardlink:
+            self.methods.append(("hardlink", os.link))
+        self.methods.append(("copy", shutil.copy2))
+
+    @property
+    def method(self):
+        return self.methods[0][0]
+
+    def link_file(self, src, dst):
+        while len(self.methods) > 1:
+            try:
+                self.methods[0][1](src, dst)
+                if self.method != "hardlink":
+                    _make_writable(dst)
+                return
+            except OSError as error:
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                # other errors, like permissions of a single file, are raised by the copy below.
+                if error.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EPERM, errno.EINVAL,
+                                       errno.EMLINK, errno.ENOSYS, errno.EBADF):
+                    break
+                self.methods.pop(0)
+        shutil.copy2(src, dst)
+        _make_writable(dst)
+
+    def link_tree(self, src, dst):
+        os.makedirs(dst, exist_ok=True)
+        for root, dirs, files in os.walk(src):
+            target_root = os.path.join(dst, os.path.relpath(root, src))
+            for name in list(dirs):
+                source = os.path.join(root, name)
+                if os.path.islink(source):
+                    # not followed by os.walk, recreate the link
+                    os.symlink(os.readlink(source), os.path.join(target_root, name))
+                    dirs.remove(name)
+                else:
+                    os.makedirs(os.path.join(target_root, name), exist_ok=True)
+            for name in files:
+                source = os.path.join(root, name)
+                if os.path.islink(source):
+                    os.symlink(os.readlink(source), os.path.join(target_root, name))
+                else:
+                    self.link_file(source, os.path.join(target_root, name))
+
+
+def _make_writable(path):
+    # cloned and copied files don't share content with the cache, restore the permission of the archive.
+    os.chmod(path, os.stat(path).st_mode | stat.S_IWUSR)
+
+
+def _make_read_only(path):
+    # hardlinked files share content with the cache, so they must not be changed in place.
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if not os.path.islink(file_path):
+                mode = os.stat(file_path).st_mode
+                os.chmod(file_path, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def _extract_to_cache(archive_path, cache_dir, digest):
+    entry_dir = os.path.join(cache_dir, digest)
+    if os.path.isdir(entry_dir):
+        return entry_dir
+
+    # extract to a temporary folder and rename it, so that other runners never see a partial entry.
+    temp_dir = os.path.join(cache_dir, "%s.tmp-%s" % (digest, os.getpid()))
+    if os.path.exists(temp_dir):
+        shutil.rmtree(temp_dir)
+    os.makedirs(temp_dir)
+    start = time.time()
+    with tarfile.open(archive_path, "r:gz") as tar:
+        tar.extractall(temp_dir)
+    _make_read_only(temp_dir)
+    try:
+        os.rename(temp_dir, entry_dir)
+        nni_log(LogType.Info, "code cache: extracted %s to %s in %.2f seconds" % (archive_path, entry_dir, time.time() - start))
+    except OSError:
+        # extracted by another runner at the same time
+        if not os.path.isdir(entry_dir):
+            raise
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return entry_dir
+
+
+def collect_garbage(cache_dir, keep=None, max_entries=MAX_CACHE_ENTRIES):
+    """
+    Remove least recently used entries beyond max_entries, and temporary folders of interrupted extractions.
+    """
+    now = time.time()
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not os.path.isdir(path):
+            continue
+        if ".tmp-" in name:
+            if now - os.path.getmtime(path) > STALE_TEMP_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        elif name != keep:
+            entries.append((os.path.getmtime(path), path))
+    entries.sort(reverse=True)
+    if keep is not None:
+        # the kept entry counts as one
+        max_entries -= 1
+    for _, path in entries[max_entries:]:
+        nni_log(LogType.Info, "code cache: remove %s" % path)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def prepare_code(archive_path, cache_dir, code_dir, allow_hardlink=False):
+    """
+    Build code_dir with the content of archive_path, extracting the archive into cache_dir only for the first time.
+
+    Parameters
+    ----------
+    allow_hardlink : bool
+        Whether files can be hardlinked from the cache when reflinks are not supported. Hardlinked files are
+        read-only, as they are shared by all trials of the archive, so they can't be changed by trials.
+
+    Returns
+    -------
+    str
+        The method used to build code_dir, ``reflink``, ``hardlink`` or ``copy``.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = hash_archive(archive_path)
+    entry_dir = _extract_to_cache(archive_path, cache_dir, digest)
+    # mark as recently used
+    os.utime(entry_dir)
+    linker = TreeLinker(allow_hardlink)
+    linker.link_tree(entry_dir, code_dir)
+    collect_garbage(cache_dir, keep=digest)
+    return linker.method
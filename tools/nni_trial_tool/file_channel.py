@@ -1,14 +1,95 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import ctypes
+import ctypes.util
 import os
+import select
+import struct
+import sys
+import threading
+import time
 
-from .base_channel import BaseChannel
+from .base_channel import BaseChannel, INTERVAL_SECONDS
+from .log_utils import LogType, nni_log
 
 command_path = "./commands"
 runner_commands_file_name_prefix = "runner_commands"
 manager_commands_file_name = "manager_commands.txt"
 
+# bounds of the adaptive polling interval, it's doubled each time no new command is read.
+# with inotify, it's never longer than the interval of other channels, since inotify doesn't see writes from
+# other hosts. without inotify, each wait is a poll, so it starts from the interval of other channels.
+MIN_POLL_SECONDS = 0.05
+MAX_POLL_SECONDS = INTERVAL_SECONDS
+MAX_FALLBACK_POLL_SECONDS = 8 * INTERVAL_SECONDS
+
+# inotify events of files in the watched folder
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+# header of struct inotify_event: wd, mask, cookie, len, followed by a null padded name of len bytes
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+class DirectoryWatcher:
+    """
+    Wait for changes of a file in a folder with inotify, which is only available on Linux.
+    Changes of other files in the folder are ignored, unless file_name is None.
+    """
+
+    def __init__(self, path, file_name=None):
+        self.file_name = None if file_name is None else os.fsencode(file_name)
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        watch = libc.inotify_add_watch(self.fd, os.fsencode(path), IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if watch < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch failed on %s" % path)
+
+    @staticmethod
+    def is_supported():
+        return sys.platform.startswith("linux") and ctypes.util.find_library("c") is not None
+
+    def wait(self, timeout):
+        """Wait until the file is changed or timeout, returns True if it is changed."""
+        deadline = time.time() + timeout
+        while True:
+            readable, _, _ = select.select([self.fd], [], [], max(deadline - time.time(), 0))
+            if not readable:
+                return False
+            if self._read_events():
+                return True
+
+    def _read_events(self):
+        """Drain pending events, returns True if any of them is about the file, or events are lost."""
+        changed = False
+        try:
+            while True:
+                # the kernel returns whole events only
+                data = os.read(self.fd, 4096)
+                if not data:
+                    break
+                offset = 0
+                while offset + INOTIFY_EVENT_HEADER.size <= len(data):
+                    _, mask, _, name_length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+                    offset += INOTIFY_EVENT_HEADER.size
+                    name = data[offset:offset + name_length].rstrip(b"\0")
+                    offset += name_length
+                    if self.file_name is None or name == self.file_name or mask & IN_Q_OVERFLOW:
+                        changed = True
+        except BlockingIOError:
+            pass
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
 
 class FileChannel(BaseChannel):
 
@@ -18,6 +99,8 @@ class FileChannel(BaseChannel):
         self.in_file = None
         self.in_offset = 0
         self.in_cache = b""
+        self.watcher = None
+        self._wakeup = threading.Event()
 
         super(FileChannel, self).__init__(args)
 
@@ -25,12 +108,10 @@ class FileChannel(BaseChannel):
         pass
 
     def _inner_close(self):
+        self._wakeup.set()
         if self.out_file is not None:
             self.out_file.close()
             self.out_file = None
-        if self.in_file is not None:
-            self.in_file.close()
-            self.in_file = None
 
     def _inner_send(self, message):
         if self.out_file is None:
@@ -55,8 +136,21 @@ class FileChannel(BaseChannel):
             self.in_file = None
 
         if self.in_file is None and os.path.exists(full_name):
-            self.in_file = open(full_name, "rb")
-            self.in_file.seek(self.in_offset)
+            self.in_file = open(full_name, "rb", buffering=0)
+
+    def _read_new_bytes(self):
+        """Read bytes appended after the stored offset, with a single fstat and pread."""
+        fd = self.in_file.fileno()
+        count = os.fstat(fd).st_size - self.in_offset
+        if count <= 0:
+            return b""
+        if hasattr(os, "pread"):
+            data = os.pread(fd, count, self.in_offset)
+        else:
+            self.in_file.seek(self.in_offset, os.SEEK_SET)
+            data = self.in_file.read(count)
+        self.in_offset += len(data)
+        return data
 
     def _inner_receive(self):
         messages = []
@@ -64,12 +158,57 @@ class FileChannel(BaseChannel):
         if self.in_file is None:
             self._open_manager_command()
         if self.in_file is not None:
-            self.in_file.seek(0, os.SEEK_END)
-            new_offset = self.in_file.tell()
-            self.in_file.seek(self.in_offset, os.SEEK_SET)
-            count = new_offset - self.in_offset
-            if count > 0:
-                self.in_cache += self.in_file.read(count)
-                self.in_offset = new_offset
+            data = self._read_new_bytes()
+            if data:
+                self.in_cache += data
                 messages, self.in_cache = self._fetch_message(self.in_cache, True)
         return messages
+
+    def _wait_for_change(self, timeout):
+        if self.watcher is None and DirectoryWatcher.is_supported() and os.path.isdir(command_path):
+            try:
+                self.watcher = DirectoryWatcher(command_path, manager_commands_file_name)
+            except OSError as identifier:
+                nni_log(LogType.Warning, 'FileChannel: cannot watch %s, fall back to polling: %s' % (command_path, identifier))
+                self.watcher = False
+        if self.watcher:
+            self.watcher.wait(timeout)
+        else:
+            self._wakeup.wait(timeout)
+
+    def _receive_loop(self):
+        # inotify doesn't see writes from other hosts of network file systems, so the file is still read
+        # after each bounded wait, but the wait is extended when nothing is coming.
+        interval = None
+        try:
+            while self.is_running:
+                messages = self._inner_receive()
+                for message in messages:
+                    self._put_received(message)
+                if self.watcher:
+                    min_interval, max_interval = MIN_POLL_SECONDS, MAX_POLL_SECONDS
+                else:
+                    min_interval, max_interval = INTERVAL_SECONDS, MAX_FALLBACK_POLL_SECONDS
+                if messages or interval is None:
+                    interval = min_interval
+                else:
+                    interval = min(max(interval * 2, min_interval), max_interval)
+                self._wait_for_change(interval)
+        finally:
+            if self.watcher:
+                self.watcher.close()
+            self.watcher = None
+            if self.in_file is not None:
+                self.in_file.close()
+                self.in_file = None
+
+    def _send_loop(self):
+        while self.is_running:
+            # no sleep, since it's a block call with INTERVAL_SECONDS second timeout
+            messages = self._get_send_batch()
+            if messages:
+                # one append and one flush for all queued messages
+                try:
+                    self._inner_send(b'\n'.join(messages))
+                finally:
+                    self._mark_sent(len(messages))
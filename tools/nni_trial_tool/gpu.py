@@ -2,6 +2,7 @@
 # Licensed under the MIT license.
 
 import subprocess
+import threading
 import time
 import traceback
 from xml.dom import minidom
@@ -67,3 +68,28 @@ def gen_empty_gpu_metric():
         traceback.print_exc()
         output = {}
     return output
+
+
+class GpuCollector(threading.Thread):
+    """
+    Collect gpu usage periodically in its own thread, so that slow collection doesn't delay commands of trials.
+    report is called with the collected gpu information.
+    """
+
+    def __init__(self, node_id, report, interval_seconds):
+        super(GpuCollector, self).__init__(daemon=True)
+        self.node_id = node_id
+        self.report = report
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.report(collect_gpu_usage(self.node_id))
+            except Exception:
+                traceback.print_exc()
+            self._stopped.wait(self.interval_seconds)
+
+    def stop(self):
+        self._stopped.set()
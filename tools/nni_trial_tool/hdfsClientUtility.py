@@ -3,29 +3,120 @@
 
 import os
 import posixpath
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from .log_utils import LogType, nni_log
 
-def copyHdfsDirectoryToLocal(hdfsDirectory, localDirectory, hdfsClient):
-    '''Copy directory from HDFS to local'''
+# number of files transferred at the same time
+MAX_TRANSFER_WORKERS = 8
+# files larger than this are uploaded in chunks, and the upload is resumed from the last chunk if interrupted
+UPLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+# suffix of files being uploaded in chunks
+PARTIAL_UPLOAD_SUFFIX = '.nnipart'
+
+
+class TransferStats:
+    '''Count transferred files and bytes, and log the throughput'''
+    def __init__(self):
+        self.start = time.time()
+        self.files = 0
+        self.skipped_files = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, size):
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+
+    def log(self, source, target):
+        seconds = max(time.time() - self.start, 1e-6)
+        nni_log(LogType.Info, 'Copied {0} to {1}: {2} files, {3} unchanged files skipped, {4} bytes in {5:.2f} seconds, '
+                '{6:.2f} MB/s'.format(source, target, self.files, self.skipped_files, self.bytes, seconds,
+                                      self.bytes / seconds / 1024 / 1024))
+
+
+def _list_hdfs_files(hdfsDirectory, hdfsClient):
+    '''List all files under hdfsDirectory with one call per directory, returns {relative path: FileStatus}'''
+    files = {}
+    pending = ['']
+    while pending:
+        relative_directory = pending.pop()
+        for f in hdfsClient.list_status(posixpath.join(hdfsDirectory, relative_directory)):
+            relative_path = posixpath.join(relative_directory, f.pathSuffix)
+            if f.type == 'DIRECTORY':
+                pending.append(relative_path)
+            elif f.type == 'FILE':
+                files[relative_path] = f
+            else:
+                raise AssertionError('unexpected type {}'.format(f.type))
+    return files
+
+
+def _is_unchanged(local_stat, file_status):
+    # HDFS keeps modification time in milliseconds
+    return local_stat.st_size == file_status.length and local_stat.st_mtime_ns // 1000000 == file_status.modificationTime
+
+
+def _run_transfers(transfers, max_workers):
+    '''Run transfer functions in a thread pool, returns exceptions of failed transfers'''
+    errors = []
+    if not transfers:
+        return errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(transfers))) as executor:
+        futures = [executor.submit(transfer) for transfer in transfers]
+        for future in futures:
+            exception = future.exception()
+            if exception is not None:
+                errors.append(exception)
+    return errors
+
+
+def copyHdfsDirectoryToLocal(hdfsDirectory, localDirectory, hdfsClient, max_workers=MAX_TRANSFER_WORKERS):
+    '''Copy directory from HDFS to local, files with the same size and modification time are skipped'''
+    stats = TransferStats()
+    try:
+        files = _list_hdfs_files(hdfsDirectory, hdfsClient)
+    except Exception as exception:
+        nni_log(LogType.Error, 'List hdfs directory {0} error: {1}'.format(hdfsDirectory, str(exception)))
+        raise exception
+
     if not os.path.exists(localDirectory):
         os.makedirs(localDirectory)
+    transfers = []
+    for relative_path, file_status in files.items():
+        hdfsFilePath = posixpath.join(hdfsDirectory, relative_path)
+        localFilePath = os.path.join(localDirectory, *relative_path.split('/'))
+        if os.path.isfile(localFilePath):
+            local_stat = os.stat(localFilePath)
+            if _is_unchanged(local_stat, file_status):
+                stats.skipped_files += 1
+                continue
+        os.makedirs(os.path.dirname(localFilePath), exist_ok=True)
+        transfers.append(lambda src=hdfsFilePath, dst=localFilePath, status=file_status:
+                         _download_file(src, dst, status, hdfsClient, stats))
+
+    errors = _run_transfers(transfers, max_workers)
+    stats.log(hdfsDirectory, localDirectory)
+    if errors:
+        raise errors[0]
+
+
+def _download_file(hdfsFilePath, localFilePath, file_status, hdfsClient, stats):
+    if os.path.exists(localFilePath):
+        os.remove(localFilePath)
     try:
-        listing = hdfsClient.list_status(hdfsDirectory)
+        hdfsClient.copy_to_local(hdfsFilePath, localFilePath)
     except Exception as exception:
-        nni_log(LogType.Error, 'List hdfs directory {0} error: {1}'.format(hdfsDirectory, str(exception)))
+        nni_log(LogType.Error, 'Copy hdfs file {0} to {1} error: {2}'.format(hdfsFilePath, localFilePath, str(exception)))
         raise exception
+    # keep modification time of HDFS, so that unchanged files are skipped next time
+    modification_time = file_status.modificationTime * 1000000
+    os.utime(localFilePath, ns=(modification_time, modification_time))
+    stats.add(file_status.length)
 
-    for f in listing:
-        if f.type == 'DIRECTORY':
-            subHdfsDirectory = posixpath.join(hdfsDirectory, f.pathSuffix)
-            subLocalDirectory = os.path.join(localDirectory, f.pathSuffix)
-            copyHdfsDirectoryToLocal(subHdfsDirectory, subLocalDirectory, hdfsClient)
-        elif f.type == 'FILE':
-            hdfsFilePath = posixpath.join(hdfsDirectory, f.pathSuffix)
-            localFilePath = os.path.join(localDirectory, f.pathSuffix)
-            copyHdfsFileToLocal(hdfsFilePath, localFilePath, hdfsClient)
-        else:
-            raise AssertionError('unexpected type {}'.format(f.type))
 
 def copyHdfsFileToLocal(hdfsFilePath, localFilePath, hdfsClient, override=True):
     '''Copy file from HDFS to local'''
@@ -48,30 +139,83 @@ def copyHdfsFileToLocal(hdfsFilePath, localFilePath, hdfsClient, override=True):
         raise exception
     nni_log(LogType.Info, 'Successfully copied hdfs file {0} to {1}, {2} bytes'.format(hdfsFilePath, localFilePath, file_status.length))
 
-def copyDirectoryToHdfs(localDirectory, hdfsDirectory, hdfsClient):
-    '''Copy directory from local to HDFS'''
+def copyDirectoryToHdfs(localDirectory, hdfsDirectory, hdfsClient, max_workers=MAX_TRANSFER_WORKERS):
+    '''Copy directory from local to HDFS, files with the same size and modification time are skipped'''
     if not os.path.exists(localDirectory):
         raise Exception('Local Directory does not exist!')
-    hdfsClient.mkdirs(hdfsDirectory)
-    result = True
-    for file in os.listdir(localDirectory):
-        file_path = os.path.join(localDirectory, file)
-        if os.path.isdir(file_path):
-            hdfs_directory = os.path.join(hdfsDirectory, file)
-            try:
-                result = result and copyDirectoryToHdfs(file_path, hdfs_directory, hdfsClient)
-            except Exception as exception:
-                nni_log(LogType.Error,
-                        'Copy local directory {0} to hdfs directory {1} error: {2}'.format(file_path, hdfs_directory, str(exception)))
-                result = False
+    stats = TransferStats()
+    hdfs_files = {}
+    if hdfsClient.exists(hdfsDirectory):
+        hdfs_files = _list_hdfs_files(hdfsDirectory, hdfsClient)
+
+    transfers = []
+    for root, _, files in os.walk(localDirectory):
+        relative_directory = os.path.relpath(root, localDirectory).replace(os.sep, '/')
+        relative_directory = '' if relative_directory == '.' else relative_directory
+        hdfsClient.mkdirs(posixpath.join(hdfsDirectory, relative_directory))
+        for file in files:
+            relative_path = posixpath.join(relative_directory, file)
+            if relative_path.endswith(PARTIAL_UPLOAD_SUFFIX):
+                continue
+            file_path = os.path.join(root, file)
+            local_stat = os.stat(file_path)
+            if relative_path in hdfs_files and _is_unchanged(local_stat, hdfs_files[relative_path]):
+                stats.skipped_files += 1
+                continue
+            transfers.append(lambda src=file_path, dst=posixpath.join(hdfsDirectory, relative_path), path=relative_path:
+                             _upload_file(src, dst, hdfs_files, path, hdfsClient, stats))
+
+    errors = _run_transfers(transfers, max_workers)
+    stats.log(localDirectory, hdfsDirectory)
+    return not errors
+
+
+def _upload_file(localFilePath, hdfsFilePath, hdfs_files, relative_path, hdfsClient, stats):
+    local_stat = os.stat(localFilePath)
+    modification_time = local_stat.st_mtime_ns // 1000000
+    try:
+        if local_stat.st_size <= UPLOAD_CHUNK_SIZE:
+            with open(localFilePath, 'rb') as local_file:
+                hdfsClient.create(hdfsFilePath, local_file, overwrite=True)
         else:
-            hdfs_file_path = os.path.join(hdfsDirectory, file)
-            try:
-                result = result and copyFileToHdfs(file_path, hdfs_file_path, hdfsClient)
-            except Exception as exception:
-                nni_log(LogType.Error, 'Copy local file {0} to hdfs {1} error: {2}'.format(file_path, hdfs_file_path, str(exception)))
-                result = False
-    return result
+            _upload_file_in_chunks(localFilePath, hdfsFilePath, local_stat.st_size, modification_time,
+                                   hdfs_files, relative_path, hdfsClient)
+        hdfsClient.set_times(hdfsFilePath, modificationtime=modification_time)
+    except Exception as exception:
+        nni_log(LogType.Error, 'Copy local file {0} to hdfs file {1} error: {2}'.format(localFilePath, hdfsFilePath, str(exception)))
+        raise exception
+    stats.add(local_stat.st_size)
+
+
+def _upload_file_in_chunks(localFilePath, hdfsFilePath, size, modification_time, hdfs_files, relative_path, hdfsClient):
+    # the partial file is named after size and modification time, so that only the same content is resumed
+    partial_suffix = '.{0}-{1}{2}'.format(size, modification_time, PARTIAL_UPLOAD_SUFFIX)
+    partial_path = hdfsFilePath + partial_suffix
+    partial_pattern = re.compile(re.escape(relative_path) + r'\.\d+-\d+' + re.escape(PARTIAL_UPLOAD_SUFFIX) + '$')
+    offset = 0
+    for path, file_status in hdfs_files.items():
+        if partial_pattern.match(path):
+            if path == relative_path + partial_suffix and \
+                    (file_status.length % UPLOAD_CHUNK_SIZE == 0 or file_status.length == size):
+                offset = file_status.length
+            else:
+                # left by an upload of another version, or interrupted in the middle of a chunk
+                hdfsClient.delete(posixpath.join(posixpath.dirname(hdfsFilePath), posixpath.basename(path)))
+    if offset > 0:
+        nni_log(LogType.Info, 'Resume uploading {0} from {1} bytes'.format(localFilePath, offset))
+
+    with open(localFilePath, 'rb') as local_file:
+        local_file.seek(offset)
+        while offset < size:
+            chunk = local_file.read(UPLOAD_CHUNK_SIZE)
+            if offset == 0:
+                hdfsClient.create(partial_path, chunk, overwrite=True)
+            else:
+                hdfsClient.append(partial_path, chunk)
+            offset += len(chunk)
+    if relative_path in hdfs_files:
+        hdfsClient.delete(hdfsFilePath)
+    hdfsClient.rename(partial_path, hdfsFilePath)
 
 def copyFileToHdfs(localFilePath, hdfsFilePath, hdfsClient, override=True):
     '''Copy a local file to HDFS directory'''
@@ -4,18 +4,19 @@
 import os
 import sys
 import json
+import base64
+import gzip
 import logging
 import logging.handlers
 import time
 import threading
 import re
 
+from collections import deque
 from datetime import datetime
 from enum import Enum, unique
 from logging import StreamHandler
 
-from queue import Queue
-
 from .rest_utils import rest_post
 from .url_utils import gen_send_stdout_url
 from .commands import CommandType
@@ -43,6 +44,218 @@ def nni_log(log_type, log_message):
     print('[{0}] {1} {2}'.format(dt, log_type.value, log_message), flush=True)
 
 
+METRICS_PATTERN = re.compile(r'NNISDK_MEb\'.*\'$')
+# seconds to wait for the log shipper to ship the remaining lines when flushing or closing
+FLUSH_TIMEOUT = 10
+# the read of a pipe is completed if no lines are read for this number of seconds after the process exits
+READ_COMPLETED_SECONDS = 5
+
+
+class LogShipper(threading.Thread):
+    """
+    Ship log lines in the background. Lines are batched by size or time into one message,
+    large batches are compressed, and lines are sampled or dropped when the queue is backed up,
+    so that putting a line never blocks. Metrics lines are never dropped, and are shipped alone and
+    uncompressed, because NNI manager matches one metric per message before decoding it.
+    """
+
+    def __init__(self, send_func, max_batch_bytes=64 * 1024, flush_interval=1.0, max_queue_lines=10000,
+                 sample_watermark=0.8, sample_rate=10, compress_threshold=8 * 1024):
+        """
+        Parameters
+        ----------
+        send_func : function
+            function to send a message, with the message text and the encoding ('gzip+base64' or None) as parameters
+        max_batch_bytes : int
+            a batch is shipped when it reaches this size
+        flush_interval : float
+            a batch is shipped when its oldest line has waited for this number of seconds
+        max_queue_lines : int
+            lines are dropped when this number of lines are waiting to be shipped
+        sample_watermark : float
+            one of every `sample_rate` lines is kept when the queue is filled over this ratio
+        sample_rate : int
+            sampling rate under backpressure
+        compress_threshold : int
+            batches larger than this size are gzip compressed, except metrics lines
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.send_func = send_func
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        self.max_queue_lines = max_queue_lines
+        self.sample_lines = int(max_queue_lines * sample_watermark)
+        self.sample_rate = sample_rate
+        self.compress_threshold = compress_threshold
+        self.orig_stderr = sys.__stderr__
+
+        self._cond = threading.Condition()
+        # pending lines, each item is (line, is_metrics)
+        self._lines = deque()
+        self._pending_bytes = 0
+        self._pending_metrics = 0
+        self._oldest_time = None
+        self._put_count = 0
+        self._done_count = 0
+        self._sample_counter = 0
+        self._flush_requested = False
+        self._closed = False
+        self._reported_dropped = 0
+        self._reported_sampled = 0
+        self.stats = {'sent_lines': 0, 'sent_batches': 0, 'sent_bytes': 0, 'failed_batches': 0,
+                      'dropped_lines': 0, 'sampled_out_lines': 0}
+        self.start()
+
+    def put(self, line):
+        """
+        Queue a log line to ship, never blocks.
+        """
+        is_metrics = METRICS_PATTERN.search(line) is not None
+        with self._cond:
+            if self._closed:
+                return
+            if not is_metrics:
+                if len(self._lines) >= self.max_queue_lines:
+                    self.stats['dropped_lines'] += 1
+                    return
+                if len(self._lines) >= self.sample_lines:
+                    self._sample_counter += 1
+                    if self._sample_counter % self.sample_rate != 0:
+                        self.stats['sampled_out_lines'] += 1
+                        return
+            self._lines.append((line, is_metrics))
+            self._pending_bytes += len(line) + 1
+            self._pending_metrics += is_metrics
+            self._put_count += 1
+            if self._oldest_time is None:
+                self._oldest_time = time.time()
+            # wake up the thread to start the flush timer, or to ship the batch
+            if len(self._lines) == 1 or is_metrics or self._pending_bytes >= self.max_batch_bytes:
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until the lines queued before are shipped.
+
+        Returns
+        -------
+        bool
+            whether the lines are shipped before timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            target = self._put_count
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._done_count < target and self.is_alive():
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return self._done_count >= target
+
+    def is_idle(self):
+        """
+        Whether all the queued lines are shipped.
+        """
+        with self._cond:
+            return self._done_count >= self._put_count
+
+    def close(self, timeout=10):
+        """
+        Ship the remaining lines and stop the thread.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.join(timeout)
+
+    def _take_batch(self):
+        """
+        Wait until a batch is ready, and take it from the queue.
+
+        Returns
+        -------
+        list
+            the lines of the batch, each item is (line, is_metrics), None if the shipper is closed and
+            all lines are shipped
+        str
+            notice of the lines dropped under backpressure since last batch, None if no lines are dropped
+        """
+        with self._cond:
+            while True:
+                if self._lines:
+                    ready = self._closed or self._flush_requested or self._pending_metrics > 0 \
+                        or self._pending_bytes >= self.max_batch_bytes \
+                        or time.time() - self._oldest_time >= self.flush_interval
+                    if ready:
+                        break
+                    self._cond.wait(self._oldest_time + self.flush_interval - time.time())
+                elif self._closed:
+                    return None, None
+                else:
+                    self._flush_requested = False
+                    self._cond.wait()
+            batch = []
+            size = 0
+            while self._lines and (not batch or size + len(self._lines[0][0]) < self.max_batch_bytes):
+                line, is_metrics = self._lines.popleft()
+                batch.append((line, is_metrics))
+                size += len(line) + 1
+                self._pending_metrics -= is_metrics
+            self._pending_bytes -= size
+            self._oldest_time = time.time() if self._lines else None
+            if not self._lines:
+                self._flush_requested = False
+            dropped = self.stats['dropped_lines'] - self._reported_dropped
+            sampled = self.stats['sampled_out_lines'] - self._reported_sampled
+            self._reported_dropped += dropped
+            self._reported_sampled += sampled
+        notice = None
+        if dropped or sampled:
+            notice = '[LogShipper] {0} log lines dropped and {1} log lines sampled out under backpressure'.format(
+                dropped, sampled)
+        return batch, notice
+
+    def _send(self, text, line_count, compress=True):
+        encoding = None
+        data = text
+        if compress and len(text) >= self.compress_threshold:
+            data = base64.b64encode(gzip.compress(text.encode('utf8'))).decode('ascii')
+            encoding = 'gzip+base64'
+        try:
+            self.send_func(data, encoding)
+            self.stats['sent_lines'] += line_count
+            self.stats['sent_batches'] += 1
+            self.stats['sent_bytes'] += len(data)
+        except Exception as e:
+            self.stats['failed_batches'] += 1
+            self.orig_stderr.write(str(e) + '\n')
+            self.orig_stderr.flush()
+
+    def run(self):
+        while True:
+            batch, notice = self._take_batch()
+            if batch is None:
+                break
+            lines = [] if notice is None else [notice]
+            for line, is_metrics in batch:
+                if is_metrics:
+                    # keep the order of lines, and send the metrics alone
+                    if lines:
+                        self._send('\n'.join(lines), len(lines))
+                        lines = []
+                    self._send(line, 1, compress=False)
+                else:
+                    lines.append(line)
+            if lines:
+                self._send('\n'.join(lines), len(lines))
+            with self._cond:
+                self._done_count += len(batch)
+                self._cond.notify_all()
+
+
 class NNIRestLogHanlder(StreamHandler):
     def __init__(self, host, port, tag, trial_id, channel, std_output_type=StdOutputType.Stdout):
         StreamHandler.__init__(self)
@@ -54,24 +267,37 @@ class NNIRestLogHanlder(StreamHandler):
         self.channel = channel
         self.orig_stdout = sys.__stdout__
         self.orig_stderr = sys.__stderr__
+        self.shipper = LogShipper(self._send)
 
-    def emit(self, record):
+    def _send(self, msg, encoding):
         log_entry = {}
         log_entry['tag'] = self.tag
         log_entry['stdOutputType'] = self.std_output_type.name
-        log_entry['msg'] = self.format(record)
+        log_entry['msg'] = msg
+        if encoding is not None:
+            log_entry['msgEncoding'] = encoding
+
+        if self.channel is None:
+            rest_post(gen_send_stdout_url(self.host, self.port), json.dumps(log_entry), 10, True)
+        else:
+            if self.trial_id is not None:
+                log_entry["trial"] = self.trial_id
+            self.channel.send(CommandType.StdOut, log_entry)
 
+    def emit(self, record):
         try:
-            if self.channel is None:
-                rest_post(gen_send_stdout_url(self.host, self.port), json.dumps(log_entry), 10, True)
-            else:
-                if self.trial_id is not None:
-                    log_entry["trial"] = self.trial_id
-                self.channel.send(CommandType.StdOut, log_entry)
+            self.shipper.put(self.format(record))
         except Exception as e:
             self.orig_stderr.write(str(e) + '\n')
             self.orig_stderr.flush()
 
+    def flush(self):
+        self.shipper.flush(FLUSH_TIMEOUT)
+
+    def close(self):
+        self.shipper.close(FLUSH_TIMEOUT)
+        StreamHandler.close(self)
+
 
 class RemoteLogger(object):
     """
@@ -94,11 +320,11 @@ class RemoteLogger(object):
             self.orig_stdout = sys.__stderr__
         self.log_collection = log_collection
 
-    def get_pipelog_reader(self):
+    def get_pipelog_reader(self, on_completed=None):
         '''
         Get pipe for remote logger
         '''
-        self.pipeReader = PipeLogReader(self.logger, self.log_collection, logging.INFO)
+        self.pipeReader = PipeLogReader(self.logger, self.log_collection, logging.INFO, self.handler.shipper, on_completed)
         return self.pipeReader
 
     def flush(self):
@@ -112,11 +338,14 @@ class RemoteLogger(object):
         '''
         Write buffer data into logger/stdout
         '''
-        for line in buf.rstrip().splitlines():
-            self.orig_stdout.write(line.rstrip() + '\n')
-            self.orig_stdout.flush()
+        lines = [line.rstrip() for line in buf.rstrip().splitlines()]
+        if not lines:
+            return
+        self.orig_stdout.write('\n'.join(lines) + '\n')
+        self.orig_stdout.flush()
+        for line in lines:
             try:
-                self.logger.log(self.log_level, line.rstrip())
+                self.logger.log(self.log_level, line)
             except Exception:
                 pass
 
@@ -136,45 +365,25 @@ class PipeLogReader(threading.Thread):
     The reader thread reads log data from pipe
     """
 
-    def __init__(self, logger, log_collection, log_level=logging.INFO):
+    def __init__(self, logger, log_collection, log_level=logging.INFO, shipper=None, on_completed=None):
         """Setup the object with a logger and a loglevel
-        and start the thread
+        and start the thread. on_completed is called once all data is read and shipped.
         """
         threading.Thread.__init__(self)
-        self.queue = Queue()
         self.logger = logger
         self.daemon = False
         self.log_level = log_level
         self.fdRead, self.fdWrite = os.pipe()
         self.pipeReader = os.fdopen(self.fdRead)
         self.orig_stdout = sys.__stdout__
-        self._is_read_completed = False
         self.process_exit = False
         self.log_collection = log_collection
-        self.log_pattern = re.compile(r'NNISDK_MEb\'.*\'$')
-
-        def _populateQueue(stream, queue):
-            '''
-            Collect lines from 'stream' and put them in 'quque'.
-            '''
-            time.sleep(1)
-            while True:
-                cur_process_exit = self.process_exit
-                try:
-                    line = self.queue.get(True, 5)
-                    try:
-                        self.logger.log(self.log_level, line.rstrip())
-                    except Exception:
-                        pass
-                except Exception:
-                    if cur_process_exit == True:
-                        self._is_read_completed = True
-                        break
-
-        self.pip_log_reader_thread = threading.Thread(target=_populateQueue, args=(self.pipeReader, self.queue))
-        self.pip_log_reader_thread.daemon = True
+        self.log_pattern = METRICS_PATTERN
+        self.shipper = shipper
+        self.on_completed = on_completed
+        self._last_read_time = time.time()
+        self._eof = False
         self.start()
-        self.pip_log_reader_thread.start()
 
     def fileno(self):
         """Return the write file descriptor of the pipe
@@ -183,32 +392,50 @@ class PipeLogReader(threading.Thread):
 
     def run(self):
         """Run the thread, logging everything.
-           If the log_collection is 'none', the log content will not be enqueued
+           If the log_collection is 'none', only the metrics are logged.
+           Logging never blocks, the lines are shipped in the background by the log shipper.
         """
         for line in iter(self.pipeReader.readline, ''):
+            self._last_read_time = time.time()
             self.orig_stdout.write(line.rstrip() + '\n')
             self.orig_stdout.flush()
 
             if self.log_collection == 'none':
                 search_result = self.log_pattern.search(line)
-                if search_result:
-                    metrics = search_result.group(0)
-                    self.queue.put(metrics+'\n')
-            else:
-                self.queue.put(line)
+                if not search_result:
+                    continue
+                line = search_result.group(0)
+            try:
+                self.logger.log(self.log_level, line.rstrip())
+            except Exception:
+                pass
 
         self.pipeReader.close()
+        # the end of file is reached only if the write end is closed, and the process and its children exit.
+        if self.shipper is not None:
+            self.shipper.flush(FLUSH_TIMEOUT)
+        self._eof = True
+        if self.on_completed is not None:
+            self.on_completed()
 
     def close(self):
-        """Close the write end of the pipe.
+        """Close the write end of the pipe. It can be called once the pipe is passed to the process,
+        so that the end of file is read as soon as the process exits.
         """
-        os.close(self.fdWrite)
+        if self.fdWrite is not None:
+            os.close(self.fdWrite)
+            self.fdWrite = None
 
     @property
     def is_read_completed(self):
-        """Return if read is completed
+        """Return if read is completed, i.e. the process exits, the end of file is read or no more lines have
+           been read for a while, and the lines read are shipped
         """
-        return self._is_read_completed
+        if not self.process_exit:
+            return False
+        if not self._eof and time.time() - self._last_read_time < READ_COMPLETED_SECONDS:
+            return False
+        return self.shipper is None or self.shipper.is_idle()
 
     def set_process_exit(self):
         self.process_exit = True
@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from tools.nni_trial_tool.code_cache import collect_garbage, prepare_code
+
+
+class CodeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.root, "code-cache")
+        self.archive = self.make_archive("archive.tar.gz", {"main.py": "print('hello')", "lib/util.py": "x = 1"})
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def make_archive(self, name, files):
+        source_dir = os.path.join(self.root, name + ".src")
+        for file_name, content in files.items():
+            path = os.path.join(source_dir, file_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+        archive = os.path.join(self.root, name)
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(source_dir, arcname=".")
+        return archive
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_prepare_code(self):
+        code1 = os.path.join(self.root, "trials", "1", "code")
+        code2 = os.path.join(self.root, "trials", "2", "code")
+        method = prepare_code(self.archive, self.cache_dir, code1)
+        self.assertIn(method, ["reflink", "copy"])
+        prepare_code(self.archive, self.cache_dir, code2)
+
+        # extracted only once
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        for code_dir in [code1, code2]:
+            self.assertEqual(self.read(os.path.join(code_dir, "main.py")), "print('hello')")
+            self.assertEqual(self.read(os.path.join(code_dir, "lib", "util.py")), "x = 1")
+        # new files of a trial don't go to the cache
+        with open(os.path.join(code1, "lib", "output.txt"), "w") as f:
+            f.write("output")
+        self.assertFalse(os.path.exists(os.path.join(code2, "lib", "output.txt")))
+
+    def test_change_trial_code(self):
+        code1 = os.path.join(self.root, "trials", "1", "code")
+        code2 = os.path.join(self.root, "trials", "2", "code")
+        prepare_code(self.archive, self.cache_dir, code1)
+        prepare_code(self.archive, self.cache_dir, code2)
+        with open(os.path.join(code1, "main.py"), "w") as f:
+            f.write("print('changed')")
+        with open(os.path.join(code1, "lib", "util.py"), "a") as f:
+            f.write("\ny = 2")
+
+        self.assertEqual(self.read(os.path.join(code2, "main.py")), "print('hello')")
+        self.assertEqual(self.read(os.path.join(code2, "lib", "util.py")), "x = 1")
+        entry_dir = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        self.assertEqual(self.read(os.path.join(entry_dir, "main.py")), "print('hello')")
+        self.assertEqual(self.read(os.path.join(entry_dir, "lib", "util.py")), "x = 1")
+        # a trial built later still gets the original code
+        code3 = os.path.join(self.root, "trials", "3", "code")
+        prepare_code(self.archive, self.cache_dir, code3)
+        self.assertEqual(self.read(os.path.join(code3, "main.py")), "print('hello')")
+
+    def test_allow_hardlink(self):
+        code_dir = os.path.join(self.root, "trials", "1", "code")
+        self.assertIn(prepare_code(self.archive, self.cache_dir, code_dir, allow_hardlink=True), ["reflink", "hardlink"])
+        self.assertEqual(self.read(os.path.join(code_dir, "main.py")), "print('hello')")
+
+    def test_collect_garbage(self):
+        for i in range(6):
+            archive = self.make_archive("archive%d.tar.gz" % i, {"main.py": str(i)})
+            prepare_code(archive, self.cache_dir, os.path.join(self.root, "trials", str(i), "code"))
+        entries = os.listdir(self.cache_dir)
+        self.assertEqual(len(entries), 4)
+        os.makedirs(os.path.join(self.cache_dir, "0" * 64 + ".tmp-1"))
+        os.utime(os.path.join(self.cache_dir, "0" * 64 + ".tmp-1"), (0, 0))
+        collect_garbage(self.cache_dir, max_entries=1)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        # trial code is kept after its cache entry is removed
+        self.assertEqual(self.read(os.path.join(self.root, "trials", "0", "code", "main.py")), "0")
+
+
+if __name__ == '__main__':
+    unittest.main()
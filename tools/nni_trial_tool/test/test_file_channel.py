@@ -7,14 +7,16 @@ import random
 import shutil
 import string
 import sys
+import threading
 import time
 import unittest
 from argparse import Namespace
 from datetime import datetime
+from unittest import mock
 
-from tools.nni_trial_tool.base_channel import CommandType
-from tools.nni_trial_tool.file_channel import (FileChannel, command_path,
-                                               manager_commands_file_name)
+from tools.nni_trial_tool.base_channel import INTERVAL_SECONDS, CommandType
+from tools.nni_trial_tool.file_channel import (MAX_FALLBACK_POLL_SECONDS, DirectoryWatcher, FileChannel,
+                                               command_path, manager_commands_file_name)
 
 sys.path.append("..")
 
@@ -108,6 +110,113 @@ class FileChannelTest(unittest.TestCase):
             if manager_file is not None:
                 manager_file.close()
 
+    def test_open_send_batch(self):
+        fc = None
+        try:
+            self.args.runner_id = "runner"
+            self.args.exp_id = "exp"
+            fc = FileChannel(self.args)
+            fc.open()
+            for i in range(10):
+                fc.send(CommandType.StdOut, {"index": i})
+
+            self.check_timeout(2, lambda: fc.sent() and os.path.exists(runner_file_name))
+            fc.close()
+            with open(runner_file_name, "rb") as runner:
+                lines = runner.readlines()
+            self.assertEqual(len(lines), 11)
+            self.assertTrue(lines[0].startswith(CommandType.Initialized.value))
+            for i, line in enumerate(lines[1:]):
+                self.assertTrue(line.startswith(CommandType.StdOut.value))
+                self.assertEqual(json.loads(line[16:])["index"], i)
+        finally:
+            if fc is not None:
+                fc.close()
+
+    def test_open_receive(self):
+        fc = None
+        try:
+            os.mkdir(command_path)
+            self.args.runner_id = "runner"
+            self.args.exp_id = "exp"
+            fc = FileChannel(self.args)
+            fc.open()
+            # wait the channel to be idle, so that the wait is extended.
+            time.sleep(1)
+            with open(manager_file_name, "ab") as manager_file:
+                manager_file.write(b'TR00000000000009"manager"\nTR000000000')
+            with open(manager_file_name, "ab") as manager_file:
+                manager_file.write(b'00010"manager2"\n')
+
+            self.check_timeout(2, lambda: fc.receive_queue.qsize() == 2)
+            self.assertEqual(fc.receive(), (CommandType.NewTrialJob, "manager"))
+            self.assertEqual(fc.receive(), (CommandType.NewTrialJob, "manager2"))
+        finally:
+            if fc is not None:
+                fc.close()
+
+    def test_sent_in_flight(self):
+        fc = None
+        sending = threading.Event()
+        release = threading.Event()
+
+        def blocked_send(message):
+            sending.set()
+            release.wait(5)
+
+        try:
+            self.args.runner_id = "runner"
+            self.args.exp_id = "exp"
+            fc = FileChannel(self.args)
+            with mock.patch.object(fc, "_inner_send", side_effect=blocked_send):
+                fc.open()
+                self.assertTrue(sending.wait(5))
+                # the batch is dequeued, but not written yet
+                self.assertEqual(fc.send_queue.qsize(), 0)
+                self.assertFalse(fc.sent())
+                release.set()
+                self.check_timeout(2, fc.sent)
+                self.assertTrue(fc.sent())
+        finally:
+            release.set()
+            if fc is not None:
+                fc.close()
+
+    def test_fallback_poll_backoff(self):
+        fc = FileChannel(self.args)
+        timeouts = []
+
+        def record_wait(timeout):
+            timeouts.append(timeout)
+            if len(timeouts) == 8:
+                fc.is_running = False
+
+        # without inotify, each wait is a poll of the manager commands file
+        fc.watcher = False
+        fc.is_running = True
+        with mock.patch.object(fc, "_wait_for_change", side_effect=record_wait):
+            fc._receive_loop()
+        self.assertEqual(timeouts[0], INTERVAL_SECONDS)
+        self.assertListEqual(timeouts, sorted(timeouts))
+        self.assertGreater(timeouts[-1], INTERVAL_SECONDS)
+        self.assertEqual(timeouts[-1], MAX_FALLBACK_POLL_SECONDS)
+
+    @unittest.skipUnless(DirectoryWatcher.is_supported(), "inotify is only available on Linux")
+    def test_watch_manager_commands(self):
+        os.mkdir(command_path)
+        watcher = DirectoryWatcher(command_path, manager_commands_file_name)
+        try:
+            # the runner writes its commands in the same folder
+            with open(runner_file_name, "ab") as runner:
+                runner.write(b'GI00000000000010"command1"\n')
+            self.assertFalse(watcher.wait(0.2))
+            with open(manager_file_name, "ab") as manager_file:
+                manager_file.write(b'TR00000000000009"manager"\n')
+            self.assertTrue(watcher.wait(1))
+            self.assertFalse(watcher.wait(0.1))
+        finally:
+            watcher.close()
+
     def check_timeout(self, timeout, callback):
         interval = 0.01
         start = datetime.now().timestamp()
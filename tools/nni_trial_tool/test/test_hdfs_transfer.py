@@ -0,0 +1,141 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import os
+import shutil
+import tempfile
+import unittest
+from argparse import Namespace
+from collections import Counter
+
+from tools.nni_trial_tool import hdfsClientUtility
+from tools.nni_trial_tool.hdfsClientUtility import copyDirectoryToHdfs, copyHdfsDirectoryToLocal
+
+
+class FakeHdfsClient:
+    '''WebHDFS client of pyhdfs, backed by a local folder'''
+    def __init__(self, root):
+        self.root = root
+        self.calls = Counter()
+        self.fail_append_after = None
+
+    def _local(self, path):
+        return os.path.join(self.root, *[part for part in path.split('/') if part])
+
+    def _status(self, path, suffix):
+        stat = os.stat(path)
+        return Namespace(pathSuffix=suffix, type='DIRECTORY' if os.path.isdir(path) else 'FILE',
+                         length=0 if os.path.isdir(path) else stat.st_size, modificationTime=stat.st_mtime_ns // 1000000)
+
+    def exists(self, path):
+        self.calls['exists'] += 1
+        return os.path.exists(self._local(path))
+
+    def list_status(self, path):
+        self.calls['list_status'] += 1
+        local = self._local(path)
+        return [self._status(os.path.join(local, name), name) for name in sorted(os.listdir(local))]
+
+    def mkdirs(self, path):
+        self.calls['mkdirs'] += 1
+        os.makedirs(self._local(path), exist_ok=True)
+
+    def create(self, path, data, overwrite=False):
+        self.calls['create'] += 1
+        with open(self._local(path), 'wb') as f:
+            f.write(data if isinstance(data, bytes) else data.read())
+
+    def append(self, path, data):
+        self.calls['append'] += 1
+        if self.fail_append_after is not None:
+            if self.fail_append_after == 0:
+                raise IOError('connection lost')
+            self.fail_append_after -= 1
+        with open(self._local(path), 'ab') as f:
+            f.write(data)
+
+    def set_times(self, path, modificationtime):
+        self.calls['set_times'] += 1
+        os.utime(self._local(path), ns=(modificationtime * 1000000, modificationtime * 1000000))
+
+    def rename(self, path, destination):
+        self.calls['rename'] += 1
+        os.rename(self._local(path), self._local(destination))
+        return True
+
+    def delete(self, path):
+        self.calls['delete'] += 1
+        os.remove(self._local(path))
+        return True
+
+    def copy_to_local(self, src, localdest):
+        self.calls['copy_to_local'] += 1
+        shutil.copyfile(self._local(src), localdest)
+
+
+class HdfsTransferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.client = FakeHdfsClient(os.path.join(self.root, 'hdfs'))
+        os.makedirs(self.client.root)
+        self.local_dir = os.path.join(self.root, 'local')
+        for i in range(10):
+            self.write(os.path.join(self.local_dir, 'sub%d' % (i % 3), 'file%d' % i), b'content %d' % i)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_round_trip(self):
+        self.assertTrue(copyDirectoryToHdfs(self.local_dir, '/exp/output', self.client))
+        self.assertEqual(self.client.calls['create'], 10)
+        self.assertEqual(self.read(os.path.join(self.client.root, 'exp', 'output', 'sub1', 'file4')), b'content 4')
+
+        download_dir = os.path.join(self.root, 'download')
+        copyHdfsDirectoryToLocal('/exp/output', download_dir, self.client)
+        self.assertEqual(self.client.calls['copy_to_local'], 10)
+        # one listing call per directory, no status call per file
+        self.assertEqual(self.client.calls['list_status'], 4)
+        self.assertEqual(self.read(os.path.join(download_dir, 'sub0', 'file9')), b'content 9')
+
+        # unchanged files are skipped
+        self.write(os.path.join(self.local_dir, 'sub0', 'file0'), b'changed')
+        self.assertTrue(copyDirectoryToHdfs(self.local_dir, '/exp/output', self.client))
+        self.assertEqual(self.client.calls['create'], 11)
+        copyHdfsDirectoryToLocal('/exp/output', download_dir, self.client)
+        self.assertEqual(self.client.calls['copy_to_local'], 11)
+        self.assertEqual(self.read(os.path.join(download_dir, 'sub0', 'file0')), b'changed')
+
+    def test_resume_chunked_upload(self):
+        chunk_size = hdfsClientUtility.UPLOAD_CHUNK_SIZE
+        hdfsClientUtility.UPLOAD_CHUNK_SIZE = 10
+        try:
+            content = bytes(range(95))
+            self.write(os.path.join(self.local_dir, 'checkpoint'), content)
+            self.client.fail_append_after = 3
+            self.assertFalse(copyDirectoryToHdfs(self.local_dir, '/exp/output', self.client))
+            self.assertFalse(os.path.exists(os.path.join(self.client.root, 'exp', 'output', 'checkpoint')))
+
+            self.client.fail_append_after = None
+            self.client.calls.clear()
+            self.assertTrue(copyDirectoryToHdfs(self.local_dir, '/exp/output', self.client))
+            # 4 chunks were uploaded before the failure, the remaining 6 chunks are appended
+            self.assertEqual(self.client.calls['append'], 6)
+            self.assertEqual(self.read(os.path.join(self.client.root, 'exp', 'output', 'checkpoint')), content)
+            self.assertListEqual(sorted(os.listdir(os.path.join(self.client.root, 'exp', 'output'))),
+                                 ['checkpoint', 'sub0', 'sub1', 'sub2'])
+        finally:
+            hdfsClientUtility.UPLOAD_CHUNK_SIZE = chunk_size
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import base64
+import gzip
+import logging
+import sys
+import threading
+import time
+import unittest
+from subprocess import Popen
+
+from tools.nni_trial_tool.log_utils import LogShipper, PipeLogReader
+
+
+class LogShipperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = []
+
+    def send(self, msg, encoding):
+        if encoding == 'gzip+base64':
+            msg = gzip.decompress(base64.b64decode(msg)).decode('utf8')
+        self.messages.append((msg, encoding))
+
+    def test_batch(self):
+        shipper = LogShipper(self.send, flush_interval=60)
+        try:
+            for i in range(100):
+                shipper.put('line %d' % i)
+            self.assertTrue(shipper.flush(5))
+            self.assertEqual(len(self.messages), 1)
+            self.assertEqual(self.messages[0][0], '\n'.join('line %d' % i for i in range(100)))
+            self.assertEqual(shipper.stats['sent_lines'], 100)
+        finally:
+            shipper.close()
+
+    def test_flush_interval(self):
+        shipper = LogShipper(self.send, flush_interval=0.1)
+        try:
+            shipper.put('line')
+            time.sleep(1)
+            self.assertTrue(shipper.is_idle())
+            self.assertEqual(self.messages, [('line', None)])
+        finally:
+            shipper.close()
+
+    def test_metrics_alone(self):
+        shipper = LogShipper(self.send, flush_interval=60)
+        try:
+            shipper.put('line 1')
+            shipper.put("NNISDK_MEb'{\"value\": 1}'")
+            shipper.put('line 2')
+            self.assertTrue(shipper.flush(5))
+            self.assertListEqual([msg for msg, _ in self.messages], ['line 1', "NNISDK_MEb'{\"value\": 1}'", 'line 2'])
+        finally:
+            shipper.close()
+
+    def test_compress(self):
+        shipper = LogShipper(self.send, flush_interval=60, compress_threshold=100)
+        try:
+            lines = ['line %d' % i for i in range(100)]
+            for line in lines:
+                shipper.put(line)
+            shipper.close()
+            self.assertEqual(self.messages, [('\n'.join(lines), 'gzip+base64')])
+        finally:
+            shipper.close()
+
+    def test_large_metrics_uncompressed(self):
+        shipper = LogShipper(self.send, flush_interval=60)
+        try:
+            metrics = "NNISDK_MEb'{\"value\": \"%s\"}'" % ('x' * 10 * 1024)
+            self.assertGreater(len(metrics), shipper.compress_threshold)
+            shipper.put(metrics)
+            self.assertTrue(shipper.flush(5))
+            # NNI manager matches the metrics pattern on the message before decoding it
+            self.assertEqual(self.messages, [(metrics, None)])
+        finally:
+            shipper.close()
+
+    def test_backpressure(self):
+        blocked = threading.Event()
+
+        def send(msg, encoding):
+            blocked.wait()
+            self.send(msg, encoding)
+
+        shipper = LogShipper(send, flush_interval=0, max_queue_lines=100, sample_watermark=0.5, sample_rate=10)
+        try:
+            shipper.put('first')
+            time.sleep(0.5)
+            start = time.time()
+            for i in range(1000):
+                shipper.put('line %d' % i)
+            shipper.put("NNISDK_MEb'{\"value\": 1}'")
+            # putting lines never blocks
+            self.assertLess(time.time() - start, 1)
+            self.assertGreater(shipper.stats['dropped_lines'], 0)
+            self.assertGreater(shipper.stats['sampled_out_lines'], 0)
+            blocked.set()
+            self.assertTrue(shipper.flush(5))
+            messages = [msg for msg, _ in self.messages]
+            self.assertIn("NNISDK_MEb'{\"value\": 1}'", messages)
+            self.assertTrue(any(msg.startswith('[LogShipper]') for msg in messages))
+        finally:
+            blocked.set()
+            shipper.close()
+
+
+class PipeLogReaderTest(unittest.TestCase):
+
+    def test_read_completed_at_end_of_output(self):
+        shipper = LogShipper(lambda msg, encoding: None, flush_interval=60)
+        completed = threading.Event()
+        try:
+            reader = PipeLogReader(logging.getLogger('test_pipe_log_reader'), 'none', shipper=shipper,
+                                   on_completed=completed.set)
+            process = Popen([sys.executable, '-c', 'print("hello")'], stdout=reader, stderr=reader)
+            reader.close()
+            process.wait()
+            self.assertTrue(completed.wait(5))
+            self.assertTrue(reader.set_process_exit())
+            # no need to wait for the output to be quiet
+            self.assertTrue(reader.is_read_completed)
+        finally:
+            shipper.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import asyncio
+import gc
+import logging
+import threading
+import time
+import unittest
+from argparse import Namespace
+
+import websockets
+
+from tools.nni_trial_tool.base_channel import CommandType
+from tools.nni_trial_tool.web_channel import WebChannel
+
+port = 18765
+
+
+class WebChannelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.frames = []
+        self.clients = []
+        self.server_loop = asyncio.new_event_loop()
+        self.server_started = threading.Event()
+        self.server_thread = threading.Thread(target=self.run_server, daemon=True)
+        self.server_thread.start()
+        self.server_started.wait(5)
+
+        self.args = Namespace()
+        self.args.node_count = 1
+        self.args.node_id = None
+        self.args.nnimanager_ip = '127.0.0.1'
+        self.args.nnimanager_port = port
+        self.args.runner_id = 'runner'
+        self.args.exp_id = 'exp'
+
+    def tearDown(self):
+        self.server_loop.call_soon_threadsafe(self.server_stop.set_result, None)
+        self.server_thread.join(5)
+
+    def run_server(self):
+        async def handler(client, *args):
+            self.clients.append(client)
+            try:
+                async for frame in client:
+                    self.frames.append((len(self.clients), frame))
+            except Exception:
+                pass
+
+        async def serve():
+            self.server_stop = asyncio.Future()
+            server = await websockets.serve(handler, '127.0.0.1', port)
+            self.server_started.set()
+            await self.server_stop
+            server.close()
+            await server.wait_closed()
+
+        asyncio.set_event_loop(self.server_loop)
+        self.server_loop.run_until_complete(serve())
+
+    def run_in_server(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.server_loop).result(5)
+
+    def check_timeout(self, timeout, callback):
+        interval = 0.01
+        while timeout > 0:
+            if callback():
+                break
+            timeout -= interval
+            time.sleep(interval)
+
+    def test_send_batch(self):
+        wc = WebChannel(self.args)
+        try:
+            wc.open()
+            for i in range(10):
+                wc.send(CommandType.StdOut, {"index": i})
+            self.check_timeout(5, lambda: sum(frame.count(b'\n') + 1 for _, frame in self.frames) == 11)
+            messages = b'\n'.join(frame for _, frame in self.frames).split(b'\n')
+            self.assertEqual(len(messages), 11)
+            self.assertTrue(messages[0].startswith(CommandType.Initialized.value))
+            self.assertLess(len(self.frames), 11)
+            self.check_timeout(5, wc.sent)
+            self.assertTrue(wc.sent())
+        finally:
+            wc.close()
+
+    def test_sent_in_flight(self):
+        # no server is listening, so the dequeued messages wait for the connection
+        self.args.nnimanager_port = port + 1
+        wc = WebChannel(self.args)
+        try:
+            wc.open()
+            wc.send(CommandType.StdOut, {"index": 0})
+            self.check_timeout(5, lambda: wc.send_queue.qsize() == 0)
+            self.assertEqual(wc.send_queue.qsize(), 0)
+            self.assertFalse(wc.sent())
+        finally:
+            wc.close()
+
+    def test_close_with_pending_send(self):
+        # no server is listening, so the send thread is waiting for the connection when the channel is closed
+        self.args.nnimanager_port = port + 1
+        wc = WebChannel(self.args)
+        errors = []
+        handler = logging.Handler()
+        handler.emit = errors.append
+        loggers = [logging.getLogger('asyncio'), logging.getLogger('concurrent.futures')]
+        for logger in loggers:
+            logger.addHandler(handler)
+        try:
+            wc.open()
+            wc.send(CommandType.StdOut, {"index": 0})
+            self.check_timeout(5, lambda: wc.send_queue.qsize() == 0)
+            wc.close()
+            wc.receive_thread.join(5)
+            wc.send_thread.join(5)
+            gc.collect()
+        finally:
+            for logger in loggers:
+                logger.removeHandler(handler)
+        self.assertFalse(wc.receive_thread.is_alive())
+        self.assertFalse(wc.send_thread.is_alive())
+        self.assertTrue(wc._event_loop.is_closed())
+        self.assertListEqual([record.getMessage() for record in errors], [])
+
+    def test_receive(self):
+        wc = WebChannel(self.args)
+        try:
+            wc.open()
+            self.check_timeout(5, lambda: len(self.clients) > 0)
+            self.run_in_server(self.clients[0].send('KI00000000000006"test"'))
+            command = None
+            data = None
+            self.check_timeout(1, lambda: wc.received())
+            command, data = wc.receive()
+            self.assertEqual(command, CommandType.KillTrialJob)
+            self.assertEqual(data, "test")
+        finally:
+            wc.close()
+
+    def test_reconnect(self):
+        wc = WebChannel(self.args)
+        try:
+            wc.open()
+            self.check_timeout(5, lambda: len(self.frames) > 0)
+            self.run_in_server(self.clients[0].close())
+            self.check_timeout(5, lambda: len(self.clients) > 1)
+            wc.send(CommandType.StdOut, {"after": "reconnect"})
+            self.check_timeout(5, lambda: len([frame for client, frame in self.frames if client == 2]) == 2)
+            frames = [frame for client, frame in self.frames if client == 2]
+            # the initialized message is resent on the new connection
+            self.assertTrue(frames[0].startswith(CommandType.Initialized.value))
+            self.assertTrue(frames[1].startswith(CommandType.StdOut.value))
+        finally:
+            wc.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
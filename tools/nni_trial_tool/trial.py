@@ -4,17 +4,21 @@
 import ctypes
 import os
 import shlex
+import shutil
 import tarfile
+import threading
 import time
 from datetime import datetime
 from subprocess import Popen
 
 import psutil
 
+from .code_cache import prepare_code
 from .log_utils import LogType, RemoteLogger, StdOutputType, nni_log
 from .commands import CommandType
 
 trial_output_path_name = ".nni"
+code_cache_path_name = "code-cache"
 
 
 class Trial:
@@ -24,6 +28,8 @@ class Trial:
         self.args = args
         self.command_channel = args.command_channel
         self.trial_syslogger_stdout = None
+        # set when the trial process exits or its output is read completely, so that the runner wakes up.
+        self.wakeup_event = getattr(args, "wakeup_event", None)
 
         global NNI_TRIAL_JOB_ID
         self.id = data["trialId"]
@@ -66,8 +72,17 @@ class Trial:
             os.makedirs(trial_nnioutput_dir, exist_ok=True)
             # prepare code
             os.makedirs(trial_code_dir, exist_ok=True)
-            with tarfile.open(os.path.join("..", "nni-code.tar.gz"), "r:gz") as tar:
-                tar.extractall(trial_code_dir)
+            code_archive = os.path.join("..", "nni-code.tar.gz")
+            try:
+                start = time.time()
+                method = prepare_code(code_archive, os.path.join(os.curdir, "..", "..", code_cache_path_name), trial_code_dir)
+                nni_log(LogType.Info, "%s: prepared code by %s in %.2f seconds" % (self.name, method, time.time() - start))
+            except Exception as identifier:
+                nni_log(LogType.Warning, "%s: failed to prepare code from cache, extract it directly: %s" % (self.name, identifier))
+                shutil.rmtree(trial_code_dir, ignore_errors=True)
+                os.makedirs(trial_code_dir, exist_ok=True)
+                with tarfile.open(code_archive, "r:gz") as tar:
+                    tar.extractall(trial_code_dir)
 
             # save parameters
             nni_log(LogType.Info, '%s: saving parameter %s' % (self.name, self.data["parameter"]["value"]))
@@ -86,11 +101,22 @@ class Trial:
                     break
                 time.sleep(0.1)
 
-        self.log_pipe_stdout = self.trial_syslogger_stdout.get_pipelog_reader()
+        self.log_pipe_stdout = self.trial_syslogger_stdout.get_pipelog_reader(on_completed=self._wakeup)
         self.process = Popen(self.args.trial_command, shell=True, stdout=self.log_pipe_stdout,
                              stderr=self.log_pipe_stdout, cwd=trial_code_dir, env=dict(environ))
+        # the process holds the pipe now, the end of output is read once it exits.
+        self.log_pipe_stdout.close()
         nni_log(LogType.Info, '{0}: spawns a subprocess (pid {1}) to run command: {2}'.
                 format(self.name, self.process.pid, shlex.split(self.args.trial_command)))
+        threading.Thread(target=self._wait_process, args=(self.process,), daemon=True).start()
+
+    def _wakeup(self):
+        if self.wakeup_event is not None:
+            self.wakeup_event.set()
+
+    def _wait_process(self, process):
+        process.wait()
+        self._wakeup()
 
     def save_parameter_file(self, command_data):
         parameters = command_data["parameters"]
@@ -20,7 +20,7 @@ from .constants import (LOG_DIR, MULTI_PHASE, NNI_EXP_ID, NNI_PLATFORM,
                         NNI_SYS_DIR, NNI_TRIAL_JOB_ID)
 from .hdfsClientUtility import (copyDirectoryToHdfs, copyHdfsDirectoryToLocal,
                                 copyHdfsFileToLocal)
-from .log_utils import LogType, RemoteLogger, StdOutputType, nni_log
+from .log_utils import READ_COMPLETED_SECONDS, LogType, RemoteLogger, StdOutputType, nni_log
 from .rest_utils import rest_get, rest_post
 from .url_utils import gen_parameter_meta_url, gen_send_version_url
 
@@ -91,14 +91,19 @@ def main_loop(args):
     # Notice: We don't appoint env, which means subprocess wil inherit current environment and that is expected behavior
     log_pipe_stdout = trial_syslogger_stdout.get_pipelog_reader()
     process = Popen(args.trial_command, shell=True, stdout=log_pipe_stdout, stderr=log_pipe_stdout)
+    # the process holds the pipe now, the end of output is read once it exits.
+    log_pipe_stdout.close()
     nni_log(LogType.Info, 'Trial keeper spawns a subprocess (pid {0}) to run command: {1}'.format(process.pid,
                                                                                                   shlex.split(
                                                                                                       args.trial_command)))
 
     while True:
-        retCode = process.poll()
+        # block until the process exits, and the reader thread ends at the end of output.
+        retCode = process.wait()
+        log_pipe_stdout.set_process_exit()
+        log_pipe_stdout.join(READ_COMPLETED_SECONDS)
         # child worker process exits and all stdout data is read
-        if retCode is not None and log_pipe_stdout.set_process_exit() and log_pipe_stdout.is_read_completed == True:
+        if log_pipe_stdout.is_read_completed == True:
             # In Windows, the retCode -1 is 4294967295. It's larger than c_long, and raise OverflowError.
             # So covert it to int32.
             retCode = ctypes.c_long(retCode).value
@@ -121,8 +126,6 @@ def main_loop(args):
             exit(retCode)
             break
 
-        time.sleep(2)
-
 
 def trial_keeper_help_info(*args):
     print('please run --help to see guidance')
@@ -7,16 +7,19 @@ import os
 import random
 import re
 import sys
+import threading
 import time
 import traceback
-from datetime import datetime, timedelta
+from datetime import datetime
 
 import pkg_resources
 
-from .gpu import collect_gpu_usage
+from .gpu import GpuCollector
 
 idle_timeout_seconds = 10 * 60
 gpu_refressh_interval_seconds = 5
+# max seconds to wait before checking trials again
+max_wait_seconds = 1
 regular = re.compile('v?(?P<version>[0-9](\.[0-9]){0,1}).*')
 trial_runner_syslogger = None
 
@@ -24,38 +27,47 @@ trial_runner_syslogger = None
 def main_loop(args):
     '''main loop logic for trial runner'''
     idle_last_time = datetime.now()
-    gpu_refresh_last_time = datetime.now() - timedelta(minutes=1)
+    wakeup_event = args.wakeup_event
+    gpu_collector = None
 
     try:
         trials = dict()
 
         command_channel = args.command_channel
-        # command loop
+        if args.enable_gpu_collect:
+            # collect gpu information in its own thread
+            gpu_collector = GpuCollector(args.node_id, lambda gpu_info: command_channel.send(CommandType.ReportGpuInfo, gpu_info),
+                                         gpu_refressh_interval_seconds)
+            gpu_collector.start()
+        # command loop, it wakes up when a command is received, or a trial exits.
         while True:
-            command_type, command_data = command_channel.receive()
-            if command_type == CommandType.NewTrialJob:
-                trial_id = command_data["trialId"]
-                if trial_id in trials.keys():
-                    trial = trials[trial_id]
-                    if trial.is_running():
-                        raise Exception('trial %s is running already, cannot start a new one' % trial.id)
-                    else:
-                        del trials[trial_id]
-                trial = Trial(args, command_data)
-                trial.run()
-                trials[trial_id] = trial
-            elif command_type == CommandType.KillTrialJob:
-                trial_id = command_data
-                if trial_id in trials.keys():
-                    trial = trials[trial_id]
-                    trial.kill(command_data)
-            elif command_type == CommandType.SendTrialJobParameter:
-                trial_id = command_data["trialId"]
-                if trial_id in trials.keys():
-                    trial = trials[trial_id]
-                    trial.save_parameter_file(command_data)
-            elif command_type is not None:
-                raise Exception("unknown command %s" % command_type)
+            # clear before handling, so that any later event wakes up the next wait.
+            wakeup_event.clear()
+            while command_channel.received():
+                command_type, command_data = command_channel.receive()
+                if command_type == CommandType.NewTrialJob:
+                    trial_id = command_data["trialId"]
+                    if trial_id in trials.keys():
+                        trial = trials[trial_id]
+                        if trial.is_running():
+                            raise Exception('trial %s is running already, cannot start a new one' % trial.id)
+                        else:
+                            del trials[trial_id]
+                    trial = Trial(args, command_data)
+                    trial.run()
+                    trials[trial_id] = trial
+                elif command_type == CommandType.KillTrialJob:
+                    trial_id = command_data
+                    if trial_id in trials.keys():
+                        trial = trials[trial_id]
+                        trial.kill(command_data)
+                elif command_type == CommandType.SendTrialJobParameter:
+                    trial_id = command_data["trialId"]
+                    if trial_id in trials.keys():
+                        trial = trials[trial_id]
+                        trial.save_parameter_file(command_data)
+                elif command_type is not None:
+                    raise Exception("unknown command %s" % command_type)
 
             trial_list = list(trials.values())
             for trial in trial_list:
@@ -64,23 +76,26 @@ def main_loop(args):
                 else:
                     del trials[trial.id]
 
-            if (datetime.now() - idle_last_time).seconds > idle_timeout_seconds:
+            idle_seconds = (datetime.now() - idle_last_time).total_seconds()
+            if idle_seconds > idle_timeout_seconds:
                 nni_log(LogType.Info, "trial runner is idle more than {0} seconds, so exit.".format(
                     idle_timeout_seconds))
                 break
 
-            if args.enable_gpu_collect and (datetime.now() - gpu_refresh_last_time).seconds > gpu_refressh_interval_seconds:
-                # collect gpu information
-                gpu_info = collect_gpu_usage(args.node_id)
-                command_channel.send(CommandType.ReportGpuInfo, gpu_info)
-                gpu_refresh_last_time = datetime.now()
-            time.sleep(0.5)
+            # the wait is bounded, since output of a trial may be kept open by its children after it exits.
+            if trials:
+                timeout = max_wait_seconds
+            else:
+                timeout = idle_timeout_seconds - idle_seconds
+            wakeup_event.wait(max(timeout, 0))
     except Exception as ex:
         traceback.print_exc()
         raise ex
     finally:
         nni_log(LogType.Info, "main_loop exits.")
 
+        if gpu_collector is not None:
+            gpu_collector.stop()
         trial_list = list(trials.values())
         for trial in trial_list:
             trial.kill()
@@ -205,6 +220,8 @@ if __name__ == '__main__':
     else:
         # node id is unique in the runner
         args.node_id = None
+    # the main loop waits on it, it's set by the command channel and trials.
+    args.wakeup_event = threading.Event()
 
     # init command channel
     command_channel = None
@@ -2,14 +2,25 @@
 # Licensed under the MIT license.
 
 import asyncio
+import concurrent.futures
 
 import websockets
 
-from .base_channel import BaseChannel
+from .base_channel import BaseChannel, INTERVAL_SECONDS
+from .commands import CommandType
 from .log_utils import LogType, nni_log
 
+# seconds to wait before reconnecting, doubled on each failure
+INITIAL_RECONNECT_SECONDS = 0.5
+MAX_RECONNECT_SECONDS = 30
+
 
 class WebChannel(BaseChannel):
+    """
+    Command channel over websocket. One asyncio event loop, run by the receive thread, keeps the connection:
+    received messages are pushed into the receive queue as soon as they arrive, queued messages are drained
+    by the send thread and sent in batches, and the connection is re-established with backoff when it is lost.
+    """
 
     def __init__(self, args):
         self.node_id = args.node_id
@@ -19,35 +30,146 @@ class WebChannel(BaseChannel):
 
         super(WebChannel, self).__init__(args)
 
-        self._event_loop = None
+        self._event_loop = asyncio.new_event_loop()
+        self._connection_task = None
+        self._connected_event = None
+        self._init_message = None
 
-    def _inner_open(self):
-        url = "ws://{}:{}".format(self.args.nnimanager_ip, self.args.nnimanager_port)
-        nni_log(LogType.Info, 'WebChannel: connected with info %s' % url)
+    @property
+    def _connected(self):
+        # created in the event loop, so that it is bound to the loop in all python versions
+        if self._connected_event is None:
+            self._connected_event = asyncio.Event()
+        return self._connected_event
 
-        connect = websockets.connect(url)
-        self._event_loop = asyncio.get_event_loop()
-        client = self._event_loop.run_until_complete(connect)
-        self.client = client
+    @property
+    def url(self):
+        return "ws://{}:{}".format(self.args.nnimanager_ip, self.args.nnimanager_port)
+
+    def _inner_open(self):
+        # the connection is established by the event loop in the receive thread
+        nni_log(LogType.Info, 'WebChannel: connecting with info %s' % self.url)
 
     def _inner_close(self):
-        if self.client is not None:
-            self.client.close()
-            if self._event_loop.is_running():
-                self._event_loop.close()
-            self.client = None
-            self._event_loop = None
+        if not self._event_loop.is_closed():
+            self._event_loop.call_soon_threadsafe(self._cancel_connection)
+
+    def _cancel_connection(self):
+        if self._connection_task is not None:
+            self._connection_task.cancel()
 
     def _inner_send(self, message):
-        loop = asyncio.new_event_loop()
-        loop.run_until_complete(self.client.send(message))
+        coroutine = self._send_messages([message])
+        try:
+            future = asyncio.run_coroutine_threadsafe(coroutine, self._event_loop)
+        except RuntimeError:
+            # the event loop is closed with the channel
+            coroutine.close()
+            return
+        while True:
+            try:
+                future.result(INTERVAL_SECONDS)
+                return
+            except concurrent.futures.CancelledError:
+                return
+            except concurrent.futures.TimeoutError:
+                if not self.is_running:
+                    # pending sends are cancelled by the receive thread before the loop is closed
+                    if not self._event_loop.is_closed():
+                        future.cancel()
+                    return
 
     def _inner_receive(self):
-        messages = []
-        if self.client is not None:
-            received = self._event_loop.run_until_complete(self.client.recv())
-            # receive message is string, to get consistent result, encode it here.
-            self.in_cache += received.encode("utf8")
-            messages, self.in_cache = self._fetch_message(self.in_cache)
-
-        return messages
+        # messages are pushed into the receive queue by the event loop
+        return []
+
+    def _receive_loop(self):
+        asyncio.set_event_loop(self._event_loop)
+        self._connection_task = self._event_loop.create_task(self._connection_loop())
+        try:
+            self._event_loop.run_until_complete(self._connection_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._cancel_pending_tasks()
+            self._event_loop.close()
+
+    def _cancel_pending_tasks(self):
+        # send tasks scheduled by the send thread may still be waiting for the connection
+        all_tasks = asyncio.all_tasks if hasattr(asyncio, 'all_tasks') else asyncio.Task.all_tasks
+        while True:
+            tasks = [task for task in all_tasks(self._event_loop) if not task.done()]
+            if not tasks:
+                return
+            for task in tasks:
+                task.cancel()
+            self._event_loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+    async def _connection_loop(self):
+        """
+        Keep the connection and push the received messages into the receive queue, until the channel is closed.
+        """
+        backoff = INITIAL_RECONNECT_SECONDS
+        reconnecting = False
+        while self.is_running:
+            try:
+                self.client = await websockets.connect(self.url)
+                nni_log(LogType.Info, 'WebChannel: connected with info %s' % self.url)
+                backoff = INITIAL_RECONNECT_SECONDS
+                if reconnecting and self._init_message is not None:
+                    # NNI manager identifies a new connection by the initialized message
+                    await self.client.send(self._init_message)
+                reconnecting = True
+                self._connected.set()
+                while self.is_running:
+                    received = await self.client.recv()
+                    # receive message is string, to get consistent result, encode it here.
+                    if isinstance(received, str):
+                        received = received.encode("utf8")
+                    self.in_cache += received
+                    messages, self.in_cache = self._fetch_message(self.in_cache)
+                    for message in messages:
+                        self._put_received(message)
+            except Exception as identifier:
+                if self.is_running:
+                    nni_log(LogType.Warning, 'WebChannel: connection lost (%s), reconnect in %s seconds'
+                            % (identifier, backoff))
+            finally:
+                self._connected.clear()
+                if self.client is not None:
+                    await self.client.close()
+                    self.client = None
+                self.in_cache = b""
+            if self.is_running:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_RECONNECT_SECONDS)
+
+    async def _send_messages(self, messages):
+        """
+        Send messages in one frame, wait for the connection and resend if the connection is lost.
+        """
+        frame = b'\n'.join(messages)
+        while True:
+            await self._connected.wait()
+            try:
+                await self.client.send(frame)
+                return
+            except Exception as identifier:
+                nni_log(LogType.Warning, 'WebChannel: failed to send message (%s), wait for reconnection' % identifier)
+                self._connected.clear()
+
+    def _send_loop(self):
+        while self.is_running:
+            # no sleep, since it's a block call with INTERVAL_SECONDS second timeout
+            messages = self._get_send_batch()
+            if not messages:
+                continue
+            for message in messages:
+                if message.startswith(CommandType.Initialized.value):
+                    self._init_message = message
+            try:
+                self._inner_send(b'\n'.join(messages))
+            except Exception as identifier:
+                nni_log(LogType.Error, 'WebChannel: failed to send messages: %s' % identifier)
+            finally:
+                self._mark_sent(len(messages))